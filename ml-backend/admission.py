@@ -0,0 +1,293 @@
+"""
+Admission control: bounded work in flight per worker process, excess load shed early.
+
+Every request except the exempt ones (health checks, metrics) is admitted
+by an ASGI middleware before its body is read. Its cost is estimated from
+the Content-Length and the endpoint: parsing a JSON transaction list peaks at
+roughly ML_ADMISSION_MEMORY_FACTOR times the body size, and analysis time
+grows with the rows in it. A request is admitted while fewer than
+ML_ADMISSION_CONCURRENCY requests run and the estimated memory of the
+running ones stays within ML_ADMISSION_MEMORY_MB; a request larger than the
+whole budget still runs, alone. Otherwise it waits in a FIFO queue:
+
+- 429 when ML_ADMISSION_QUEUE requests are already waiting;
+- 503 when its expected wait, from the work ahead of it and the measured
+  seconds per row, exceeds ML_ADMISSION_MAX_WAIT (shed before queueing),
+  or when it has waited that long without being admitted.
+
+Both carry Retry-After with the expected time for the backlog to drain, so
+clients back off instead of piling more work on. Queue waits are bounded, so
+admitted requests see a predictable latency under overload instead of every
+request timing out.
+
+Configuration (environment variables):
+    ML_ADMISSION                '0' disables admission control (default: enabled)
+    ML_ADMISSION_CONCURRENCY    requests running at once (default: 2 per available core)
+    ML_ADMISSION_MEMORY_MB      estimated memory of running requests (default: 1024)
+    ML_ADMISSION_MEMORY_FACTOR  peak memory per request body byte (default: 9)
+    ML_ADMISSION_QUEUE          requests waiting before 429 (default: 64)
+    ML_ADMISSION_MAX_WAIT       longest wait in the queue, in seconds, before 503 (default: 10)
+    ML_ADMISSION_EXEMPT         comma-separated paths never queued (default: /health,/metrics,/)
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+from executors import available_cores
+from metrics import route_template, stage
+
+# JSON body bytes per transaction (a synthetic record is 170-190 bytes)
+BYTES_PER_ROW = 180
+
+# Assumed body size of requests without a Content-Length (pull mode, chunked streaming uploads)
+DEFAULT_BODY_BYTES = 2 * 1024 * 1024
+
+# Fixed per-request work, in rows: validation, response encoding, scheduling
+BASE_ROWS = 2500
+
+# Analysis time relative to /analyze/expenses for the same rows; unlisted endpoints weigh 1
+ENDPOINT_WEIGHTS = {
+    '/analyze/spending-pattern': 0.6,
+    '/predict/tax-savings': 0.65,
+    '/analyze/investment-performance': 0.75,
+    '/dashboard': 1.05,
+    '/tax/calculate': 0.1,
+    '/users/{user_id}/analyze/spending-pattern': 0.6,
+    '/users/{user_id}/predict/tax-savings': 0.65,
+    '/users/{user_id}/analyze/investment-performance': 0.75,
+    '/users/{user_id}/dashboard': 1.05,
+}
+
+# Weight of each completed request in the seconds-per-row average
+_EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; carries the status and Retry-After seconds"""
+
+    def __init__(self, status: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class Ticket:
+    __slots__ = ('cost', 'memory', 'admitted', 'admitted_at', 'future')
+
+    def __init__(self, cost: float, memory: int):
+        self.cost = cost
+        self.memory = memory
+        self.admitted = False
+        self.admitted_at = 0.0
+        self.future: Optional[asyncio.Future] = None
+
+
+class AdmissionController:
+    """Concurrency and memory budgets of one worker process, with a bounded FIFO queue in front"""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        memory_budget: int = 1024 * 2**20,
+        memory_factor: float = 9.0,
+        queue_size: int = 64,
+        max_wait: float = 10.0,
+        exempt: Sequence[str] = ('/health', '/metrics', '/'),
+        enabled: bool = True,
+    ):
+        self.concurrency = concurrency or 2 * available_cores()
+        self.memory_budget = memory_budget
+        self.memory_factor = memory_factor
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.exempt = frozenset(exempt)
+        self.enabled = enabled
+        self.in_flight = 0
+        self.memory_in_flight = 0
+        self.cost_in_flight = 0.0
+        self.admitted_total = 0
+        self.rejected: Dict[int, int] = {429: 0, 503: 0}
+        self.seconds_per_row: Optional[float] = None
+        self._queue: Deque[Ticket] = deque()
+        self._queued_cost = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        concurrency = os.environ.get('ML_ADMISSION_CONCURRENCY')
+        exempt = os.environ.get('ML_ADMISSION_EXEMPT', '/health,/metrics,/')
+        return cls(
+            concurrency=int(concurrency) if concurrency else None,
+            memory_budget=int(float(os.environ.get('ML_ADMISSION_MEMORY_MB', 1024)) * 2**20),
+            memory_factor=float(os.environ.get('ML_ADMISSION_MEMORY_FACTOR', 9)),
+            queue_size=int(os.environ.get('ML_ADMISSION_QUEUE', 64)),
+            max_wait=float(os.environ.get('ML_ADMISSION_MAX_WAIT', 10)),
+            exempt=[path.strip() for path in exempt.split(',') if path.strip()],
+            enabled=os.environ.get('ML_ADMISSION', '1') != '0',
+        )
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def estimate(self, endpoint: str, body_bytes: Optional[int]) -> Tuple[float, int]:
+        """(cost in row-equivalents, peak memory in bytes) of a request to an endpoint with a body of this size"""
+        body_bytes = DEFAULT_BODY_BYTES if body_bytes is None else body_bytes
+        rows = body_bytes / BYTES_PER_ROW
+        return ENDPOINT_WEIGHTS.get(endpoint, 1.0) * (rows + BASE_ROWS), int(body_bytes * self.memory_factor)
+
+    def _fits(self, ticket: Ticket) -> bool:
+        if self.in_flight >= self.concurrency:
+            return False
+        return self.in_flight == 0 or self.memory_in_flight + ticket.memory <= self.memory_budget
+
+    def _admit(self, ticket: Ticket) -> None:
+        ticket.admitted = True
+        ticket.admitted_at = time.perf_counter()
+        self.in_flight += 1
+        self.memory_in_flight += ticket.memory
+        self.cost_in_flight += ticket.cost
+        self.admitted_total += 1
+
+    def _dispatch(self) -> None:
+        """Admit queued requests in arrival order while the head fits"""
+        while self._queue and self._fits(self._queue[0]):
+            ticket = self._queue.popleft()
+            self._queued_cost -= ticket.cost
+            if ticket.future.done():  # cancelled while waiting
+                continue
+            self._admit(ticket)
+            ticket.future.set_result(None)
+
+    def expected_wait(self, cost_ahead: float) -> Optional[float]:
+        """Seconds until work of this cost queued ahead plus the running work drains, None before any measurement"""
+        if self.seconds_per_row is None:
+            return None
+        return (self.cost_in_flight + cost_ahead) * self.seconds_per_row / self.concurrency
+
+    def _retry_after(self) -> int:
+        wait = self.expected_wait(self._queued_cost)
+        return max(1, math.ceil(wait if wait is not None else self.max_wait))
+
+    def _reject(self, status: int, detail: str) -> Rejected:
+        self.rejected[status] += 1
+        return Rejected(status, self._retry_after(), detail)
+
+    async def acquire(self, cost: float, memory: int) -> Ticket:
+        """Wait for admission; raises Rejected when the request is shed"""
+        ticket = Ticket(cost, memory)
+        if not self._queue and self._fits(ticket):
+            self._admit(ticket)
+            return ticket
+        if len(self._queue) >= self.queue_size:
+            raise self._reject(429, "Too many requests waiting for analysis capacity")
+        wait = self.expected_wait(self._queued_cost)
+        if wait is not None and wait > self.max_wait:
+            raise self._reject(503, f"Server overloaded: expected wait {wait:.1f}s exceeds {self.max_wait:g}s")
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        self._queued_cost += cost
+        try:
+            await asyncio.wait_for(ticket.future, self.max_wait)
+        except asyncio.TimeoutError:
+            if not ticket.admitted:
+                self._remove(ticket)
+                raise self._reject(503, f"Server overloaded: not admitted within {self.max_wait:g}s")
+        except asyncio.CancelledError:
+            # The client went away while queued, or right after being admitted
+            if ticket.admitted:
+                self.release(ticket, measure=False)
+            else:
+                self._remove(ticket)
+            raise
+        return ticket
+
+    def _remove(self, ticket: Ticket) -> None:
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            return
+        self._queued_cost -= ticket.cost
+        # The head may have been waiting behind this ticket only
+        self._dispatch()
+
+    def release(self, ticket: Ticket, measure: bool = True) -> None:
+        """Return an admitted request's budget and admit whatever now fits; `measure` feeds its time into the estimates"""
+        self.in_flight -= 1
+        self.memory_in_flight -= ticket.memory
+        self.cost_in_flight -= ticket.cost
+        if measure:
+            per_row = (time.perf_counter() - ticket.admitted_at) / max(ticket.cost, 1.0)
+            self.seconds_per_row = per_row if self.seconds_per_row is None else (
+                (1 - _EWMA_ALPHA) * self.seconds_per_row + _EWMA_ALPHA * per_row
+            )
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'inFlight': self.in_flight,
+            'queued': self.queued,
+            'concurrency': self.concurrency,
+            'queueSize': self.queue_size,
+            'memoryInFlightMb': self.memory_in_flight / 2**20,
+            'memoryBudgetMb': self.memory_budget / 2**20,
+            'maxWaitSeconds': self.max_wait,
+            'admitted': self.admitted_total,
+            'rejected': {str(status): count for status, count in self.rejected.items()},
+            'secondsPer1kRows': self.seconds_per_row * 1000 if self.seconds_per_row is not None else None,
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests through an AdmissionController before the app reads their body"""
+
+    def __init__(self, app, router, controller: AdmissionController):
+        self.app = app
+        self.router = router
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if (scope['type'] != 'http' or not controller.enabled
+                or scope['path'] in controller.exempt or scope['method'] == 'OPTIONS'):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = None
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                content_length = int(value) if value.isdigit() else None
+        cost, memory = controller.estimate(route_template(self.router.routes, scope), content_length)
+
+        try:
+            with stage('admission'):
+                ticket = await controller.acquire(cost, memory)
+        except Rejected as e:
+            # Discard the unread body: closing with it pending resets the connection before the client reads the answer
+            message = {'more_body': scope['method'] not in ('GET', 'HEAD')}
+            while message.get('more_body'):
+                message = await receive()
+            body = json.dumps({'detail': e.detail}).encode()
+            await send({
+                'type': 'http.response.start',
+                'status': e.status,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                    (b'retry-after', str(e.retry_after).encode()),
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(ticket)
@@ -0,0 +1,321 @@
+"""
+Incremental per-user aggregate store.
+
+Clients append new or changed transactions instead of resending their full
+history. For every user the store keeps running per-category sums and counts,
+a quantile sketch per category for anomaly thresholds, and monthly buckets,
+so analyses cost O(categories) rather than O(history).
+
+The store lives in the worker process. With several uvicorn workers, route a
+user's requests to the same worker, or have clients fall back to the full
+endpoints when the store answers 404 (unknown user) or reports a
+transactionCount that does not match their own.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis import expense_analysis_from_stats, spending_pattern_from_stats
+from anomalies import MEDIAN_HIGH_THRESHOLD, MEDIAN_THRESHOLD, PERCENTILE_HIGH_THRESHOLD, PERCENTILE_THRESHOLD
+from forecasting import parse_dates, spending_trends
+from schemas import ExpenseAnalysisResponse
+
+INCREMENTAL_ANOMALY_METHODS = ('median', 'percentile')
+
+# Anomalies kept per user for analyses served from the store
+RECENT_ANOMALIES = 100
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style) with removable values.
+
+    Quantiles are within `relative_accuracy` of the exact value. Unlike
+    t-digest or P², bucket counts can be decremented, which lets edited and
+    deleted transactions be taken back out.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0  # values <= 0
+        self.count = 0
+
+    def _indices(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def update(self, values: np.ndarray, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) a batch of values"""
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.zero_count += sign * int(values.size - positive.size)
+        self.count += sign * int(values.size)
+        if positive.size:
+            indices, counts = np.unique(self._indices(positive), return_counts=True)
+            for index, count in zip(indices.tolist(), counts.tolist()):
+                remaining = self.buckets.get(index, 0) + sign * count
+                if remaining > 0:
+                    self.buckets[index] = remaining
+                else:
+                    self.buckets.pop(index, None)
+
+    def quantile(self, q: float) -> float:
+        if self.count <= 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class CategoryAggregate:
+    __slots__ = ('total', 'count', 'sketch')
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.sketch = QuantileSketch()
+
+
+class UserAggregate:
+    """Running aggregates for one user"""
+
+    def __init__(self):
+        self.categories: 'OrderedDict[str, CategoryAggregate]' = OrderedDict()  # expense categories, first-seen order
+        self.income_total = 0.0
+        self.income_count = 0
+        self.monthly: Dict[Tuple[str, str], float] = {}  # (YYYY-MM, category) -> expense total
+        self.transactions: Dict[str, Tuple[str, str, float, Optional[str]]] = {}  # id -> (type, category, amount, month)
+        self.recent_anomalies: Deque[Dict[str, Any]] = deque(maxlen=RECENT_ANOMALIES)
+        self.updated_at = time.time()
+
+    @property
+    def transaction_count(self) -> int:
+        return self.income_count + sum(aggregate.count for aggregate in self.categories.values())
+
+    def _apply(self, types: np.ndarray, categories: np.ndarray, amounts: np.ndarray, months: np.ndarray, sign: int) -> None:
+        is_income = types == 'INCOME'
+        self.income_total += sign * float(amounts[is_income].sum())
+        self.income_count += sign * int(is_income.sum())
+
+        is_expense = types == 'EXPENSE'
+        frame = pd.DataFrame({
+            'category': categories[is_expense],
+            'amount': amounts[is_expense],
+            'month': months[is_expense],
+        })
+        for category, group in frame.groupby('category', sort=False):
+            aggregate = self.categories.get(category)
+            if aggregate is None:
+                aggregate = self.categories[category] = CategoryAggregate()
+            group_amounts = group['amount'].to_numpy()
+            aggregate.total += sign * float(group_amounts.sum())
+            aggregate.count += sign * group_amounts.size
+            aggregate.sketch.update(group_amounts, sign)
+            if aggregate.count <= 0:
+                del self.categories[category]
+
+        monthly = frame.dropna(subset=['month']).groupby(['month', 'category'], sort=False)['amount'].sum()
+        for key, amount in monthly.items():
+            remaining = self.monthly.get(key, 0.0) + sign * amount
+            if sign > 0 or abs(remaining) > 1e-9:
+                self.monthly[key] = remaining
+            else:
+                self.monthly.pop(key, None)
+
+    def apply(self, delta_df: pd.DataFrame, deleted_ids: List[str]) -> None:
+        """Fold a batch of new/changed transactions and deletions into the aggregates"""
+        # Take previous versions of edited or deleted transactions back out first
+        replaced = [tid for tid in delta_df['id'].dropna().tolist() if tid in self.transactions]
+        removed = [self.transactions.pop(tid) for tid in [*replaced, *deleted_ids] if tid in self.transactions]
+        if removed:
+            types, categories, amounts, months = (np.array(column, dtype=object) for column in zip(*removed))
+            self._apply(types, categories, amounts.astype(float), months, -1)
+            touched = {*replaced, *deleted_ids}
+            self.recent_anomalies = deque(
+                (anomaly for anomaly in self.recent_anomalies if anomaly['transaction_id'] not in touched),
+                maxlen=RECENT_ANOMALIES
+            )
+
+        if not delta_df.empty:
+            dates = parse_dates(delta_df['date'])
+            months = dates.dt.strftime('%Y-%m').to_numpy(dtype=object)
+            types = delta_df['type'].to_numpy(dtype=object)
+            categories = delta_df['category'].to_numpy(dtype=object)
+            amounts = delta_df['amount'].to_numpy(dtype=float)
+            self._apply(types, categories, amounts, months, 1)
+
+            ids = delta_df['id'].to_numpy(dtype=object)
+            for tid, record in zip(ids, zip(types, categories, amounts.tolist(), months)):
+                if isinstance(tid, str):
+                    self.transactions[tid] = record
+
+        self.updated_at = time.time()
+
+    def detect_anomalies(self, delta_df: pd.DataFrame, method: str = 'median') -> List[Dict[str, Any]]:
+        """Check newly appended expenses against the updated category sketches"""
+        expenses_df = delta_df[(delta_df['type'] == 'EXPENSE').to_numpy()]
+        anomalies = []
+        for transaction_id, amount, category, description, date in zip(
+            expenses_df['id'].tolist(),
+            expenses_df['amount'].tolist(),
+            expenses_df['category'].tolist(),
+            expenses_df['description'].tolist(),
+            expenses_df['date'].tolist(),
+        ):
+            sketch = self.categories[category].sketch
+            if method == 'percentile':
+                flagged = amount > sketch.quantile(PERCENTILE_THRESHOLD)
+                high = amount > sketch.quantile(PERCENTILE_HIGH_THRESHOLD)
+                reason = f"Amount is above the {int(PERCENTILE_THRESHOLD * 100)}th percentile for this category"
+            else:
+                median = sketch.quantile(0.5)
+                flagged = amount > median * MEDIAN_THRESHOLD
+                high = amount > median * MEDIAN_HIGH_THRESHOLD
+                ratio = amount / median if median else math.inf
+                reason = f"Amount is {ratio:.1f}x higher than usual for this category"
+            if flagged:
+                anomalies.append({
+                    'transaction_id': transaction_id if isinstance(transaction_id, str) else 'unknown',
+                    'amount': amount,
+                    'category': category,
+                    'description': description,
+                    'date': date,
+                    'reason': reason,
+                    'severity': 'HIGH' if high else 'MEDIUM'
+                })
+        self.recent_anomalies.extend(anomalies)
+        return anomalies
+
+    def snapshot(self) -> 'AggregateSnapshot':
+        """Copy of the state the analyses read, O(categories + months), so they can run without the store lock"""
+        return AggregateSnapshot(
+            [(category, aggregate.total, aggregate.count) for category, aggregate in self.categories.items()],
+            self.income_total,
+            dict(self.monthly),
+            list(self.recent_anomalies),
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'transactionCount': self.transaction_count,
+            'trackedTransactionIds': len(self.transactions),
+            'categories': len(self.categories),
+            'months': len({month for month, _ in self.monthly}),
+            'updatedAt': self.updated_at,
+        }
+
+
+class AggregateSnapshot:
+    """A user's aggregates at one point in time; analyses are computed from it outside the store lock"""
+
+    def __init__(
+        self,
+        categories: List[Tuple[str, float, int]],
+        income_total: float,
+        monthly: Dict[Tuple[str, str], float],
+        anomalies: List[Dict[str, Any]],
+    ):
+        self.categories = categories  # (category, total, count), first-seen order
+        self.income_total = income_total
+        self.monthly = monthly
+        self.anomalies = anomalies
+
+    def category_stats(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                'sum': [total for _, total, _ in self.categories],
+                'count': [count for _, _, count in self.categories],
+            },
+            index=pd.Index([category for category, _, _ in self.categories], name='category'),
+        )
+
+    def monthly_series(self) -> pd.Series:
+        """Expense totals indexed by (category, month)"""
+        if not self.monthly:
+            return pd.Series([], dtype=float, index=pd.MultiIndex.from_tuples([], names=['category', 'month']))
+        return pd.Series(
+            list(self.monthly.values()),
+            index=pd.MultiIndex.from_tuples([(category, month) for month, category in self.monthly], names=['category', 'month']),
+        )
+
+    def expense_analysis(self) -> ExpenseAnalysisResponse:
+        trends = spending_trends(self.monthly_series())['trend'].to_dict()
+        return expense_analysis_from_stats(
+            sorted(self.categories),
+            sum(total for _, total, _ in self.categories), self.income_total, self.anomalies, trends
+        )
+
+    def spending_pattern(self) -> dict:
+        result = spending_pattern_from_stats(self.category_stats(), self.monthly_series())
+        result['monthlySpending'] = [
+            {'month': month, 'category': category, 'amount': amount}
+            for (month, category), amount in sorted(self.monthly.items())
+        ]
+        return result
+
+
+class AggregateStore:
+    """Per-user aggregates with LRU eviction of idle users"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._users: 'OrderedDict[str, UserAggregate]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, user_id: str) -> UserAggregate:
+        aggregate = self._users.get(user_id)
+        if aggregate is None:
+            aggregate = self._users[user_id] = UserAggregate()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return aggregate
+
+    def append(
+        self,
+        user_id: str,
+        delta_df: pd.DataFrame,
+        deleted_ids: List[str],
+        anomaly_method: str = 'median',
+        reset: bool = False,
+    ) -> Dict[str, Any]:
+        """Apply a delta for one user and return the store summary plus anomalies in the delta"""
+        with self._lock:
+            if reset:
+                self._users.pop(user_id, None)
+            aggregate = self._get_or_create(user_id)
+            aggregate.apply(delta_df, deleted_ids)
+            anomalies = aggregate.detect_anomalies(delta_df, anomaly_method)
+            return {'userId': user_id, **aggregate.summary(), 'anomalies': anomalies}
+
+    def snapshot(self, user_id: str) -> Optional[AggregateSnapshot]:
+        with self._lock:
+            aggregate = self._users.get(user_id)
+            return aggregate.snapshot() if aggregate is not None else None
+
+    def expense_analysis(self, user_id: str) -> Optional[ExpenseAnalysisResponse]:
+        """Expense analysis from the user's aggregates; only the snapshot is taken under the lock"""
+        snapshot = self.snapshot(user_id)
+        return snapshot.expense_analysis() if snapshot is not None else None
+
+    def spending_pattern(self, user_id: str) -> Optional[dict]:
+        """Spending pattern from the user's aggregates; only the snapshot is taken under the lock"""
+        snapshot = self.snapshot(user_id)
+        return snapshot.spending_pattern() if snapshot is not None else None
+
+    def drop(self, user_id: str) -> bool:
+        with self._lock:
+            return self._users.pop(user_id, None) is not None
@@ -0,0 +1,591 @@
+"""
+Synchronous analysis routines behind the API endpoints.
+
+Each function takes an ingested transaction frame and returns the endpoint's
+response payload. They hold no request state, so they can run on the event
+loop, in a thread, or in a worker process.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from anomalies import flag_anomalies
+from categories import INVESTMENT_CLASSES, canonical_category, investment_codes
+from forecasting import expense_months, spending_trends
+from metrics import stage
+from projections import project_portfolio
+from schemas import (
+    ExpenseAnalysisResponse,
+    ExpenseInsight,
+    InvestmentProfile,
+    InvestmentSuggestion,
+    InvestmentSuggestionResponse,
+)
+from tax_engine import compute_tax, tax_table
+
+
+# Canonical categories behind each recommendation rule
+_DISCRETIONARY = {'🍕 Food & Dining', '🎬 Entertainment'}
+_ESSENTIAL = {'🏠 Housing & Rent', '⚡ Utilities'}
+_PROTECTIVE = {'📈 Investments', '🛡️ Insurance'}
+
+# Recommended budget per category: the average transaction plus 20% headroom
+BUDGET_HEADROOM = 1.2
+
+
+def _category_recommendation(category: str, total_spending: float) -> Tuple[str, float]:
+    """Recommendation text and potential savings for one spending category"""
+    canonical = canonical_category(category)
+    if canonical in _DISCRETIONARY:
+        return f"Consider reducing {category} spending by 15-20% to optimize savings", total_spending * 0.15
+    elif canonical in _ESSENTIAL:
+        return f"Essential category. Look for energy-efficient alternatives", total_spending * 0.05
+    elif canonical in _PROTECTIVE:
+        return f"Great! Keep investing in {category} for tax benefits", 0
+    else:
+        return f"Monitor {category} spending and look for optimization opportunities", total_spending * 0.10
+
+
+def expense_insight(category: str, total_spending: float, avg_spending: float, trend: str = 'STABLE') -> ExpenseInsight:
+    """Insight for one spending category from its total, average and monthly trend"""
+    recommendation, potential_savings = _category_recommendation(category, total_spending)
+
+    return ExpenseInsight(
+        category=category,
+        averageSpending=avg_spending,
+        trend=trend,
+        recommendation=recommendation,
+        potentialSavings=potential_savings
+    )
+
+
+def expense_analysis_from_stats(
+    categories: Iterable[Tuple[str, float, int]],
+    total_expenses: float,
+    total_income: float,
+    anomalies: List[dict],
+    trends: Optional[Dict[str, str]] = None,
+) -> ExpenseAnalysisResponse:
+    """
+    Expense-analysis response from one user's aggregates.
+
+    `categories` is (category, total, transaction count) in response order,
+    `trends` maps categories to their monthly trend (STABLE when missing) and
+    `anomalies` are the already flagged expenses.
+    """
+    trends = trends or {}
+    insights = []
+    budget_recommendations = {}
+    for category, total_spending, count in categories:
+        # Every caller averages the same way, so the batch, dashboard and stored analyses agree exactly
+        avg_spending = total_spending / count
+        insights.append(expense_insight(category, total_spending, avg_spending, trends.get(category, 'STABLE')))
+        budget_recommendations[category] = avg_spending * BUDGET_HEADROOM
+
+    return ExpenseAnalysisResponse(
+        insights=insights,
+        totalMonthlySpending=total_expenses,
+        savingsRate=max(0, (total_income - total_expenses) / total_income * 100) if total_income > 0 else 0,
+        budgetRecommendations=budget_recommendations,
+        anomalies=anomalies
+    )
+
+
+def analyze_expenses_by_user(
+    transactions_df: pd.DataFrame,
+    anomaly_method: str = 'median',
+    user_column: str = 'userId',
+    details: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> Dict[str, ExpenseAnalysisResponse]:
+    """Expense analysis for every user in the frame from one pass grouped on (user, category)"""
+    if transactions_df.empty:
+        return {}
+
+    users = transactions_df[user_column]
+
+    with stage('groupby'):
+        # Filter expenses only
+        is_expense = (transactions_df['type'] == 'EXPENSE').to_numpy()
+        expenses_df = transactions_df[is_expense]
+        income_df = transactions_df[(transactions_df['type'] == 'INCOME').to_numpy()]
+
+        # Calculate basic metrics
+        total_expenses = expenses_df.groupby(user_column, observed=True)['amount'].sum().to_dict()
+        total_income = income_df.groupby(user_column, observed=True)['amount'].sum().to_dict()
+        category_spending = expenses_df.groupby([user_column, 'category'], observed=True)['amount'].agg(['sum', 'count'])
+
+    # Monthly trend of every (user, category) at once; each user's series starts at their first month
+    trends: Dict[str, Dict[str, str]] = {}
+    months = expense_months(expenses_df)
+    if months is not None:
+        with stage('forecast'):
+            monthly = expenses_df['amount'].groupby(
+                [expenses_df[user_column], expenses_df['category'], months], sort=False, observed=True
+            ).sum()
+            for (user, category), trend in spending_trends(monthly, owner_levels=1)['trend'].items():
+                trends.setdefault(user, {})[category] = trend
+
+    categories = {user: [] for user in pd.unique(users)}
+    for (user, category), total_spending, count in zip(
+        category_spending.index, category_spending['sum'].tolist(), category_spending['count'].tolist()
+    ):
+        categories[user].append((category, total_spending, count))
+
+    # Anomaly detection (per-user, per-category robust thresholds)
+    with stage('anomalies'):
+        anomalies = {user: [] for user in categories}
+        rows, flagged = flag_anomalies(expenses_df, anomaly_method, by=(user_column, 'category'), details=details)
+        for user, anomaly in zip(expenses_df[user_column].to_numpy()[rows], flagged):
+            anomalies[user].append(anomaly)
+
+    with stage('insights'):
+        return {
+            user: expense_analysis_from_stats(
+                user_categories, total_expenses.get(user, 0), total_income.get(user, 0), anomalies[user],
+                trends.get(user)
+            )
+            for user, user_categories in categories.items()
+        }
+
+
+def analyze_expenses(
+    transactions_df: pd.DataFrame,
+    anomaly_method: str = 'median',
+    details: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> ExpenseAnalysisResponse:
+    """Analyze user expenses and provide insights"""
+    if transactions_df.empty:
+        return ExpenseAnalysisResponse(
+            insights=[],
+            totalMonthlySpending=0,
+            savingsRate=0,
+            budgetRecommendations={},
+            anomalies=[]
+        )
+
+    # Single-user requests go through the batch path so both endpoints stay identical
+    return analyze_expenses_by_user(transactions_df.assign(userId=''), anomaly_method, details=details)['']
+
+
+def suggest_investments(
+    profile: InvestmentProfile,
+    transactions_df: pd.DataFrame,
+    goal_targets: Optional[Dict[str, float]] = None,
+) -> InvestmentSuggestionResponse:
+    """Generate personalized investment suggestions with a Monte Carlo projection of the allocation"""
+    # Calculate available investment amount
+    expense_amounts = transactions_df.loc[transactions_df['type'] == 'EXPENSE', 'amount']
+    monthly_expenses = expense_amounts.sum() / max(1, len(expense_amounts))
+    available_investment = profile.monthlyInvestmentCapacity
+
+    suggestions = []
+    portfolio_allocation = {}
+
+    # Tax-saving investments (Section 80C)
+    if available_investment > 5000:  # Minimum for ELSS
+        elss_allocation = min(30, 150000 / 12 / available_investment * 100)  # Max 1.5L per year
+        suggestions.append(InvestmentSuggestion(
+            instrument="ELSS Mutual Fund",
+            allocation=elss_allocation,
+            expectedReturn=12.0,
+            riskLevel="MEDIUM",
+            taxBenefits="Section 80C - Up to ₹1.5L deduction",
+            reason="Tax-saving equity mutual fund with 3-year lock-in"
+        ))
+        portfolio_allocation["ELSS"] = elss_allocation
+
+    # PPF for conservative investors
+    if profile.riskTolerance in ['LOW', 'MEDIUM']:
+        ppf_allocation = min(20, 150000 / 12 / available_investment * 100)
+        suggestions.append(InvestmentSuggestion(
+            instrument="Public Provident Fund (PPF)",
+            allocation=ppf_allocation,
+            expectedReturn=7.5,
+            riskLevel="LOW",
+            taxBenefits="Section 80C + Tax-free returns",
+            reason="Conservative long-term wealth building with tax benefits"
+        ))
+        portfolio_allocation["PPF"] = ppf_allocation
+
+    # Equity investments based on risk tolerance
+    if profile.riskTolerance == 'HIGH' and profile.age < 50:
+        equity_allocation = 50
+        suggestions.append(InvestmentSuggestion(
+            instrument="Large Cap Mutual Fund",
+            allocation=equity_allocation,
+            expectedReturn=13.0,
+            riskLevel="MEDIUM",
+            taxBenefits="LTCG tax benefits after 1 year",
+            reason="Stable large-cap equity exposure for long-term growth"
+        ))
+        portfolio_allocation["Equity"] = equity_allocation
+    elif profile.riskTolerance == 'MEDIUM':
+        equity_allocation = 30
+        suggestions.append(InvestmentSuggestion(
+            instrument="Hybrid Mutual Fund",
+            allocation=equity_allocation,
+            expectedReturn=10.5,
+            riskLevel="MEDIUM",
+            taxBenefits="Balanced taxation",
+            reason="Balanced equity-debt mix for moderate risk"
+        ))
+        portfolio_allocation["Hybrid"] = equity_allocation
+
+    # Debt instruments
+    if profile.age > 35 or profile.riskTolerance == 'LOW':
+        debt_allocation = 25
+        suggestions.append(InvestmentSuggestion(
+            instrument="Debt Mutual Fund",
+            allocation=debt_allocation,
+            expectedReturn=7.0,
+            riskLevel="LOW",
+            taxBenefits="Indexation benefits after 3 years",
+            reason="Capital preservation with inflation beating returns"
+        ))
+        portfolio_allocation["Debt"] = debt_allocation
+
+    # Gold for diversification
+    if available_investment > 10000:
+        gold_allocation = 10
+        suggestions.append(InvestmentSuggestion(
+            instrument="Gold ETF",
+            allocation=gold_allocation,
+            expectedReturn=8.0,
+            riskLevel="MEDIUM",
+            taxBenefits="LTCG after 3 years",
+            reason="Portfolio diversification and inflation hedge"
+        ))
+        portfolio_allocation["Gold"] = gold_allocation
+
+    # Calculate expected returns
+    total_allocation = sum(portfolio_allocation.values())
+    if total_allocation > 0:
+        expected_annual_return = sum(
+            s.allocation * s.expectedReturn / 100 for s in suggestions
+        ) / total_allocation * 100
+    else:
+        expected_annual_return = 0
+
+    # Calculate tax savings
+    tax_savings = 0
+    for suggestion in suggestions:
+        if "80C" in suggestion.taxBenefits:
+            tax_savings += min(available_investment * suggestion.allocation / 100, 150000) * 0.3  # 30% tax bracket
+
+    with stage('simulation'):
+        projection = project_portfolio(portfolio_allocation, profile, goal_targets)
+
+    return InvestmentSuggestionResponse(
+        suggestions=suggestions,
+        portfolioAllocation=portfolio_allocation,
+        expectedAnnualReturn=expected_annual_return,
+        taxSavings=tax_savings,
+        projection=projection
+    )
+
+
+def _finite(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def spending_pattern_from_stats(
+    category_stats: pd.DataFrame,
+    monthly: Optional[pd.Series] = None,
+    trends: Optional[pd.DataFrame] = None,
+) -> dict:
+    """
+    Spending-pattern response from per-category 'sum' and 'count' (first-seen order) and monthly sums by (category, month).
+
+    `trends` is spending_trends(monthly) when the caller has already computed it.
+    """
+    if category_stats.empty:
+        return {"patterns": [], "predictions": {}, "forecasts": {}, "insights": []}
+
+    total_count = int(category_stats['count'].sum())
+    total_spending = category_stats['sum'].sum()
+    means = category_stats['sum'] / category_stats['count']
+
+    # Trends and next-month forecasts for every category at once; undated categories have neither
+    if trends is None and monthly is not None:
+        with stage('forecast'):
+            trends = spending_trends(monthly)
+    trends = trends.to_dict('index') if trends is not None else {}
+
+    patterns = [
+        {
+            'category': category,
+            'averageAmount': avg_amount,
+            'frequency': count / max(1, total_count) * 100,
+            'totalSpent': total_spent,
+            'trend': trends[category]['trend'].lower() if category in trends else 'stable'
+        }
+        for category, avg_amount, count, total_spent in zip(
+            category_stats.index, means.tolist(), category_stats['count'].tolist(), category_stats['sum'].tolist()
+        )
+    ]
+
+    # Next-month spending by category: the smoothed forecast, or the average transaction without a monthly history
+    predictions = {
+        category: float(trends[category]['forecast']) if category in trends else float(avg_amount)
+        for category, avg_amount in means.items()
+    }
+    forecasts = {
+        category: {
+            'forecast': float(trends[category]['forecast']),
+            'lower': float(trends[category]['lower']),
+            'upper': float(trends[category]['upper']),
+            'trend': trends[category]['trend'],
+            'monthlySlope': float(trends[category]['slope']),
+            'tStat': _finite(trends[category]['tStat']),
+            'months': int(trends[category]['months']),
+        }
+        for category in category_stats.index if category in trends
+    }
+
+    # Generate insights
+    insights = []
+
+    # Top spending categories
+    for category, amount in category_stats['sum'].nlargest(3).items():
+        percentage = float(amount / total_spending) * 100
+        insights.append({
+            'type': 'HIGH_SPENDING',
+            'category': category,
+            'message': f"{category} accounts for {percentage:.1f}% of your total expenses",
+            'amount': float(amount),
+            'actionable': percentage > 30
+        })
+
+    # Recurring expenses
+    recurring_categories = category_stats['count'].sort_values(ascending=False, kind='stable')
+    for category, count in recurring_categories.head(5).items():
+        if count >= 3:  # At least 3 transactions
+            insights.append({
+                'type': 'RECURRING_EXPENSE',
+                'category': category,
+                'message': f"You spend an average of ₹{means[category]:.0f} on {category} regularly",
+                'frequency': int(count),
+                'suggestion': "Consider setting up automatic investments for this recurring expense"
+            })
+
+    return {
+        "patterns": patterns,
+        "predictions": predictions,
+        "forecasts": forecasts,
+        "insights": insights,
+        "totalTransactions": total_count,
+        "analysisDate": datetime.now().isoformat()
+    }
+
+
+def category_month_stats(expenses_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Expense 'sum' and 'count' by (category, month), undated rows under a missing month, and the per-category totals"""
+    # Undated or unparseable rows still count toward their category, just not toward any month
+    months = expense_months(expenses_df)
+    monthly = expenses_df['amount'].groupby(
+        [expenses_df['category'], months], sort=False, observed=True, dropna=False
+    ).agg(['sum', 'count'])
+    # Category totals come from the monthly groups, not another pass over the rows
+    category_stats = monthly.groupby(level=0, sort=False, observed=True).sum()
+    return monthly, category_stats
+
+
+def dated_months(monthly: pd.DataFrame) -> pd.DataFrame:
+    """The (category, month) groups of category_month_stats that have a month"""
+    return monthly[monthly.index.get_level_values(1).notna()]
+
+
+def monthly_spending(dated: pd.Series) -> list:
+    """monthlySpending records, by month then category, from sums indexed by (category, month)"""
+    month_labels = np.datetime_as_string(
+        dated.index.get_level_values(1).to_numpy().astype('datetime64[M]'), unit='M'
+    ).tolist()
+    return [
+        {'month': month, 'category': category, 'amount': amount}
+        for month, category, amount in sorted(zip(
+            month_labels, dated.index.get_level_values(0).astype(str).tolist(), dated.tolist()
+        ))
+    ]
+
+
+def analyze_spending_pattern(transactions_df: pd.DataFrame) -> dict:
+    """Analyze spending patterns and predict future expenses from one (category, month) aggregation"""
+    expenses_df = transactions_df[(transactions_df['type'] == 'EXPENSE').to_numpy()]
+
+    with stage('groupby'):
+        monthly, category_stats = category_month_stats(expenses_df)
+
+    dated = dated_months(monthly)['sum']
+    result = spending_pattern_from_stats(category_stats, dated)
+    result['monthlySpending'] = monthly_spending(dated)
+    return result
+
+
+def predict_tax_savings(
+    transactions_df: pd.DataFrame,
+    annual_income: float,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+) -> dict:
+    """Predict potential tax savings based on spending patterns"""
+    # Calculate current tax-deductible investments
+    tax_deductible_amount = float(transactions_df.loc[
+        transactions_df['isTaxDeductible'] & (transactions_df['type'] == 'EXPENSE'),
+        'amount'
+    ].sum())
+    return tax_savings_from_deductions(tax_deductible_amount, annual_income, tax_regime, assessment_year)
+
+
+def tax_savings_from_deductions(
+    tax_deductible_amount: float,
+    annual_income: float,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+) -> dict:
+    """Tax-savings prediction from the tax-deductible expenses already made"""
+    # Maximum possible 80C deductions
+    max_80c_deduction = 150000
+    remaining_80c_capacity = max(0, max_80c_deduction - tax_deductible_amount)
+
+    # Instrument amounts for the remaining 80C capacity
+    instrument_amounts = [
+        min(remaining_80c_capacity, 50000),
+        min(remaining_80c_capacity, 150000),
+        min(remaining_80c_capacity, 100000),
+    ]
+
+    # Current tax, tax with maximum deductions and tax after each instrument, in one vectorized call
+    table = tax_table(tax_regime, assessment_year)
+    breakdown = compute_tax(
+        annual_income,
+        [tax_deductible_amount, max_80c_deduction, *(tax_deductible_amount + amount for amount in instrument_amounts)],
+        table.regime, table.assessment_year
+    )
+    current_tax, optimized_tax, *instrument_taxes = breakdown['totalTax'].tolist()
+    potential_savings = current_tax - optimized_tax
+    elss_saving, ppf_saving, fd_saving = (current_tax - tax for tax in instrument_taxes)
+
+    # Investment recommendations for tax savings
+    recommendations = []
+    if remaining_80c_capacity > 0:
+        recommendations.extend([
+            {
+                'instrument': 'ELSS Mutual Fund',
+                'amount': instrument_amounts[0],
+                'taxSaving': elss_saving,
+                'expectedReturn': 12.0,
+                'lockIn': '3 years'
+            },
+            {
+                'instrument': 'PPF',
+                'amount': instrument_amounts[1],
+                'taxSaving': ppf_saving,
+                'expectedReturn': 7.5,
+                'lockIn': '15 years'
+            },
+            {
+                'instrument': 'Tax Saver FD',
+                'amount': instrument_amounts[2],
+                'taxSaving': fd_saving,
+                'expectedReturn': 6.5,
+                'lockIn': '5 years'
+            }
+        ])
+
+    return {
+        'currentTaxLiability': current_tax,
+        'optimizedTaxLiability': optimized_tax,
+        'potentialTaxSavings': potential_savings,
+        'currentDeductions': tax_deductible_amount,
+        'remaining80CCapacity': remaining_80c_capacity,
+        'recommendations': recommendations,
+        'taxBracket': f"{breakdown['marginalRate'][0] * 100:.0f}%",
+        'taxRegime': table.regime,
+        'assessmentYear': table.assessment_year
+    }
+
+
+def analyze_investment_performance(
+    transactions_df: pd.DataFrame,
+    monthly_investment_capacity: Optional[float] = None,
+) -> dict:
+    """Analyze investment performance and portfolio health"""
+    with stage('classify'):
+        classes = investment_codes(transactions_df)
+    is_expense = (transactions_df['type'] == 'EXPENSE').to_numpy()
+    return investment_performance(
+        classes[is_expense], transactions_df['amount'].to_numpy(dtype=float)[is_expense],
+        len(transactions_df), monthly_investment_capacity
+    )
+
+
+def investment_performance(
+    classes: np.ndarray,
+    amounts: np.ndarray,
+    transaction_count: int,
+    monthly_investment_capacity: Optional[float] = None,
+) -> dict:
+    """Investment performance from the INVESTMENT_CLASSES code (-1 for none) and amount of every expense"""
+    is_investment = classes >= 0
+    investment_amounts = amounts[is_investment]
+
+    if investment_amounts.size == 0:
+        return {
+            'totalInvested': 0,
+            'portfolioHealth': 'NO_INVESTMENTS',
+            'diversification': {},
+            'recommendations': [
+                'Start investing in ELSS for tax benefits',
+                'Consider SIP in large-cap mutual funds',
+                'Build emergency fund before investing'
+            ]
+        }
+
+    total_invested = float(investment_amounts.sum())
+
+    # Portfolio diversification across investment classes (ELSS, PPF, Equity, ...)
+    class_totals = np.bincount(classes[is_investment], weights=investment_amounts, minlength=len(INVESTMENT_CLASSES))
+    investment_categories = {
+        name: float(amount) for name, amount in zip(INVESTMENT_CLASSES, class_totals) if amount
+    }
+
+    # Portfolio health score (simplified)
+    diversification_score = min(len(investment_categories) * 20, 100)  # Max 100 for 5+ categories
+    investment_frequency = investment_amounts.size / max(1, transaction_count) * 100
+
+    if diversification_score >= 80 and investment_frequency >= 15:
+        portfolio_health = 'EXCELLENT'
+    elif diversification_score >= 60 and investment_frequency >= 10:
+        portfolio_health = 'GOOD'
+    elif diversification_score >= 40 and investment_frequency >= 5:
+        portfolio_health = 'AVERAGE'
+    else:
+        portfolio_health = 'NEEDS_IMPROVEMENT'
+
+    # Generate recommendations
+    recommendations = []
+    if len(investment_categories) < 3:
+        recommendations.append('Diversify your portfolio across more asset classes')
+    if investment_frequency < 10:
+        recommendations.append('Increase your investment frequency with SIP')
+    if monthly_investment_capacity is not None and total_invested < monthly_investment_capacity * 6:
+        recommendations.append('Consider increasing your investment amount')
+
+    # Calculate diversification percentages
+    diversification = {
+        category: (amount / total_invested) * 100 
+        for category, amount in investment_categories.items()
+    }
+
+    return {
+        'totalInvested': total_invested,
+        'portfolioHealth': portfolio_health,
+        'diversificationScore': diversification_score,
+        'diversification': diversification,
+        'investmentFrequency': investment_frequency,
+        'recommendations': recommendations,
+        'monthlyAverage': total_invested / max(1, investment_amounts.size)
+    }
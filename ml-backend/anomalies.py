@@ -0,0 +1,154 @@
+"""
+Columnar anomaly detection for expense transactions.
+
+Per-category thresholds are computed with a single groupby pass and every
+comparison runs over whole columns; records are only built for flagged rows.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from anomaly_model import ANOMALY_MODEL_NAME, anomaly_features
+from model_registry import default_registry
+
+# Median rule (default): flag above 3x the category median, HIGH above 5x
+MEDIAN_THRESHOLD = 3.0
+MEDIAN_HIGH_THRESHOLD = 5.0
+
+# MAD rule: modified z-score (Iglewicz & Hoaglin); categories with a zero MAD fall back to the mean absolute deviation
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.253314
+MAD_THRESHOLD = 3.5
+MAD_HIGH_THRESHOLD = 5.0
+
+# Percentile rule: flag above the 95th category percentile, HIGH above the 99th
+PERCENTILE_THRESHOLD = 0.95
+PERCENTILE_HIGH_THRESHOLD = 0.99
+
+# IsolationForest: flag above-median expenses with a negative decision score, HIGH below -0.1
+ISOLATION_THRESHOLD = 0.0
+ISOLATION_HIGH_THRESHOLD = -0.1
+
+ANOMALY_METHODS = ('median', 'mad', 'percentile', 'isolation_forest')
+
+
+def _median_rule(amounts: np.ndarray, grouped, keys: list) -> tuple:
+    medians = grouped.transform('median').to_numpy(dtype=float)
+    flagged = amounts > medians * MEDIAN_THRESHOLD
+    high = amounts > medians * MEDIAN_HIGH_THRESHOLD
+    ratios = amounts / medians
+    reasons = [f"Amount is {ratio:.1f}x higher than usual for this category" for ratio in ratios[flagged]]
+    return flagged, high, reasons
+
+
+def _mad_rule(amounts: np.ndarray, grouped, keys: list) -> tuple:
+    medians = grouped.transform('median').to_numpy(dtype=float)
+    deviations = pd.Series(np.abs(amounts - medians), index=keys[0].index)
+    grouped_deviations = deviations.groupby(keys, sort=False, observed=True)
+    mads = grouped_deviations.transform('median').to_numpy(dtype=float)
+    # Mostly identical amounts (recurring bills) give a zero MAD; the mean deviation is only zero when all are equal
+    scales = np.where(
+        mads > 0, mads * MAD_SCALE, grouped_deviations.transform('mean').to_numpy(dtype=float) * MEAN_AD_SCALE
+    )
+    scores = np.divide(amounts - medians, scales, out=np.zeros_like(amounts), where=scales > 0)
+    flagged = scores > MAD_THRESHOLD
+    high = scores > MAD_HIGH_THRESHOLD
+    reasons = [f"Amount is {score:.1f} deviations above usual for this category" for score in scores[flagged]]
+    return flagged, high, reasons
+
+
+def _percentile_rule(amounts: np.ndarray, grouped, keys: list) -> tuple:
+    flag_cutoff = grouped.transform('quantile', PERCENTILE_THRESHOLD).to_numpy(dtype=float)
+    high_cutoff = grouped.transform('quantile', PERCENTILE_HIGH_THRESHOLD).to_numpy(dtype=float)
+    flagged = amounts > flag_cutoff
+    high = amounts > high_cutoff
+    percentile = int(PERCENTILE_THRESHOLD * 100)
+    reasons = [f"Amount is above the {percentile}th percentile for this category"] * int(flagged.sum())
+    return flagged, high, reasons
+
+
+def _isolation_rule(amounts: np.ndarray, grouped, keys: list, model: Any) -> tuple:
+    # Every row of the request, across all users, in one decision_function call
+    scores = model.decision_function(anomaly_features(amounts, keys))
+    above_median = amounts > grouped.transform('median').to_numpy(dtype=float)
+    flagged = above_median & (scores < ISOLATION_THRESHOLD)
+    high = above_median & (scores < ISOLATION_HIGH_THRESHOLD)
+    reasons = [f"Unusual amount for this category (anomaly score {score:.2f})" for score in scores[flagged]]
+    return flagged, high, reasons
+
+
+_RULES = {
+    'median': _median_rule,
+    'mad': _mad_rule,
+    'percentile': _percentile_rule,
+}
+
+
+def flag_anomalies(
+    expenses_df: pd.DataFrame,
+    method: str = 'median',
+    by: Sequence[str] = ('category',),
+    details: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Positions of flagged rows and their anomaly records, with baselines grouped by `by`.
+
+    `details` maps the flagged rows to a frame with their id, description and
+    date, for callers whose frame does not carry those columns.
+    """
+    if method not in ANOMALY_METHODS:
+        raise ValueError(f"Unknown anomaly method '{method}'. Expected one of {', '.join(ANOMALY_METHODS)}")
+    if expenses_df.empty:
+        return np.empty(0, dtype=np.intp), []
+
+    amounts = expenses_df['amount'].to_numpy(dtype=float)
+    keys = [expenses_df[column] for column in by]
+    grouped = expenses_df['amount'].groupby(keys, sort=False, observed=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        model = default_registry().current(ANOMALY_MODEL_NAME) if method == 'isolation_forest' else None
+        if model is not None:
+            flagged, high, reasons = _isolation_rule(amounts, grouped, keys, model)
+        else:
+            # The median rule is the fallback until an anomaly model has been trained
+            flagged, high, reasons = _RULES.get(method, _median_rule)(amounts, grouped, keys)
+
+    rows = np.flatnonzero(flagged)
+    if rows.size == 0:
+        return rows, []
+
+    flagged_df = expenses_df.iloc[rows]
+    details_df = flagged_df if details is None else details(flagged_df)
+    if 'id' in details_df.columns:
+        transaction_ids = details_df['id'].fillna('unknown').tolist()
+    else:
+        transaction_ids = ['unknown'] * rows.size
+
+    records = [
+        {
+            'transaction_id': transaction_id,
+            'amount': amount,
+            'category': category,
+            'description': description,
+            'date': date,
+            'reason': reason,
+            'severity': 'HIGH' if is_high else 'MEDIUM'
+        }
+        for transaction_id, amount, category, description, date, reason, is_high in zip(
+            transaction_ids,
+            amounts[rows].tolist(),
+            flagged_df['category'].tolist(),
+            details_df['description'].tolist(),
+            details_df['date'].tolist(),
+            reasons,
+            high[rows].tolist(),
+        )
+    ]
+    return rows, records
+
+
+def detect_anomalies(expenses_df: pd.DataFrame, method: str = 'median') -> List[Dict[str, Any]]:
+    """Flag unusually large expenses against their category baseline"""
+    return flag_anomalies(expenses_df, method)[1]
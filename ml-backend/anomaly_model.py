@@ -0,0 +1,320 @@
+"""
+IsolationForest anomaly model: features, pooled training data and retraining.
+
+Scoring builds one feature row per expense from columnar group statistics and
+scores a whole request (every user of a batch included) with a single
+decision_function call. Training data is a reservoir sample of expenses seen
+by the API; retraining runs in its own single-worker process, writes a new
+versioned artifact and points CURRENT at it, and every process picks the new
+version up through the model registry.
+
+Requests only queue their frames for the pool (a bounded queue, full means the
+frame is skipped); a background thread does the O(rows) reservoir update off
+the event loop. Only one uvicorn worker per model directory retrains: the
+first to take an exclusive lock on <name>/.retrain.lock keeps it for its
+lifetime and trains from its own pool, a uniform sample of its share of the
+traffic. The others retry the lock every period, so leadership moves on when
+the leader exits. Version ids are the timestamp plus pid and a random suffix.
+
+Configuration (environment variables):
+    ML_ANOMALY_RETRAIN_SECONDS  retraining period in seconds, 0 disables it (default: 3600)
+    ML_ANOMALY_POOL_ROWS        expenses kept for retraining (default: 100000)
+    ML_ANOMALY_MIN_ROWS         expenses needed before the first retrain (default: 1000)
+    ML_ANOMALY_QUEUE            request frames waiting for the pool before new ones are skipped (default: 16)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model_registry import ModelRegistry, save_model
+
+ANOMALY_MODEL_NAME = 'anomaly_detector'
+
+RETRAIN_LOCK = '.retrain.lock'
+
+FEATURES = (
+    'log_amount',
+    'log_ratio_to_group_median',
+    'log_ratio_to_user_median',
+    'log_group_count',
+    'group_share_of_user',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def anomaly_features(amounts: np.ndarray, keys: List[pd.Series]) -> np.ndarray:
+    """One feature row per expense from its amount and group keys ([user, ]category)"""
+    log_amounts = np.log1p(np.maximum(amounts, 0.0))
+    log_series = pd.Series(log_amounts, index=keys[0].index)
+
+    grouped = log_series.groupby(keys, sort=False, observed=True)
+    group_medians = grouped.transform('median').to_numpy(dtype=float)
+    group_counts = grouped.transform('size').to_numpy(dtype=float)
+
+    # The user is every key but the last; single-key grouping treats the frame as one user
+    if len(keys) > 1:
+        user_grouped = log_series.groupby(keys[:-1], sort=False, observed=True)
+        user_medians = user_grouped.transform('median').to_numpy(dtype=float)
+        user_counts = user_grouped.transform('size').to_numpy(dtype=float)
+    else:
+        user_medians = np.full(amounts.size, np.median(log_amounts) if amounts.size else 0.0)
+        user_counts = np.full(amounts.size, float(amounts.size))
+
+    return np.column_stack([
+        log_amounts,
+        log_amounts - group_medians,
+        log_amounts - user_medians,
+        np.log1p(group_counts),
+        group_counts / np.maximum(user_counts, 1.0),
+    ])
+
+
+def train_anomaly_model(
+    pool_df: pd.DataFrame,
+    directory: str,
+    version: str,
+    n_estimators: int = 200,
+    seed: int = 0,
+) -> str:
+    """Fit an IsolationForest on pooled expenses and publish it; runs in the retraining process"""
+    from sklearn.ensemble import IsolationForest
+
+    features = anomaly_features(pool_df['amount'].to_numpy(dtype=float), [pool_df['userId'], pool_df['category']])
+    model = IsolationForest(n_estimators=n_estimators, random_state=seed, n_jobs=1)
+    model.fit(features)
+    save_model(directory, ANOMALY_MODEL_NAME, version, model)
+    return version
+
+
+class TrainingPool:
+    """Fixed-size reservoir sample of expenses (Algorithm R, vectorized per batch)"""
+
+    def __init__(self, capacity: int = 100000, seed: Optional[int] = None, queue_size: int = 16):
+        self.capacity = capacity
+        self.seen = 0
+        self.skipped = 0
+        self._pending: 'queue.Queue' = queue.Queue(maxsize=max(queue_size, 1))
+        self._rng = np.random.default_rng(seed)
+        self._columns = {
+            'userId': np.empty(capacity, dtype=object),
+            'category': np.empty(capacity, dtype=object),
+            'amount': np.empty(capacity, dtype=float),
+        }
+        self._lock = threading.Lock()
+        # Threads do not survive fork, so each process that offers frames starts its own drain thread
+        self._drain_pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self.seen, self.capacity)
+
+    def add(self, transactions_df: pd.DataFrame, user_id: str = '') -> None:
+        """Offer the expenses of one request to the reservoir"""
+        if self.capacity <= 0:
+            return
+        is_expense = (transactions_df['type'] == 'EXPENSE').to_numpy()
+        n = int(is_expense.sum())
+        if n == 0:
+            return
+        users = (
+            transactions_df['userId'].to_numpy(dtype=object)[is_expense]
+            if 'userId' in transactions_df else np.full(n, user_id, dtype=object)
+        )
+        batch = {
+            'userId': users,
+            'category': transactions_df['category'].to_numpy(dtype=object)[is_expense],
+            'amount': transactions_df['amount'].to_numpy(dtype=float)[is_expense],
+        }
+
+        with self._lock:
+            # Row i of the batch is the (seen + i)-th item; it lands in slot j when j < capacity
+            positions = self.seen + np.arange(n)
+            slots = np.where(
+                positions < self.capacity,
+                positions,
+                self._rng.integers(0, positions + 1),
+            )
+            keep = slots < self.capacity
+            for column, values in batch.items():
+                self._columns[column][slots[keep]] = values[keep]
+            self.seen += n
+
+    def offer(self, transactions_df: pd.DataFrame, user_id: str = '') -> None:
+        """Queue a request's expenses for add() on the drain thread; cheap enough for the event loop"""
+        if self.capacity <= 0:
+            return
+        if self._drain_pid != os.getpid():
+            with self._start_lock:
+                if self._drain_pid != os.getpid():
+                    threading.Thread(target=self._drain, name='anomaly-pool', daemon=True).start()
+                    self._drain_pid = os.getpid()
+        try:
+            self._pending.put_nowait((transactions_df, user_id))
+        except queue.Full:
+            # A sample either way; dropping keeps memory bounded when adds fall behind
+            self.skipped += 1
+
+    def _drain(self) -> None:
+        while True:
+            transactions_df, user_id = self._pending.get()
+            try:
+                self.add(transactions_df, user_id)
+            except Exception:
+                logger.exception("Could not add expenses to the anomaly training pool")
+            finally:
+                self._pending.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued frame is in the reservoir"""
+        self._pending.join()
+
+    def snapshot(self) -> pd.DataFrame:
+        with self._lock:
+            size = len(self)
+            return pd.DataFrame({column: values[:size].copy() for column, values in self._columns.items()})
+
+
+class AnomalyRetrainer:
+    """Periodically retrains the anomaly model from the training pool in a separate process"""
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        pool: TrainingPool,
+        interval: float = 3600.0,
+        min_rows: int = 1000,
+    ):
+        self.registry = registry
+        self.pool = pool
+        self.interval = interval
+        self.min_rows = min_rows
+        self.last_trained_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = asyncio.Lock()
+        self.is_leader = False
+        self._lock_file = None
+
+    @classmethod
+    def from_env(cls, registry: ModelRegistry) -> 'AnomalyRetrainer':
+        return cls(
+            registry,
+            TrainingPool(
+                int(os.environ.get('ML_ANOMALY_POOL_ROWS', 100000)),
+                queue_size=int(os.environ.get('ML_ANOMALY_QUEUE', 16)),
+            ),
+            interval=float(os.environ.get('ML_ANOMALY_RETRAIN_SECONDS', 3600)),
+            min_rows=int(os.environ.get('ML_ANOMALY_MIN_ROWS', 1000)),
+        )
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._processes = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        return self._processes
+
+    def acquire_leadership(self) -> bool:
+        """Take the per-directory retraining lock without blocking; kept until stop() or process exit"""
+        if self.is_leader:
+            return True
+        try:
+            import fcntl
+        except ImportError:  # pragma: no cover - no flock (Windows): a single process is assumed
+            self.is_leader = True
+            return True
+        model_dir = os.path.join(self.registry.directory, ANOMALY_MODEL_NAME)
+        try:
+            os.makedirs(model_dir, exist_ok=True)
+            lock_file = open(os.path.join(model_dir, RETRAIN_LOCK), 'a')
+        except OSError:
+            logger.exception("Could not open the anomaly retraining lock")
+            return False
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.is_leader = True
+        return True
+
+    def release_leadership(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
+
+    @staticmethod
+    def new_version() -> str:
+        """Sortable by time and unique across processes"""
+        return f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def retrain(self) -> Optional[str]:
+        """Train and publish a new version; None when another process leads, a run is in progress or the pool is small"""
+        if self._running.locked():
+            return None
+        if not self.acquire_leadership():
+            self.last_error = 'another worker process is retraining this model'
+            return None
+        if len(self.pool) < self.min_rows:
+            return None
+        async with self._running:
+            loop = asyncio.get_running_loop()
+            version = self.new_version()
+            try:
+                pool_df = await loop.run_in_executor(None, self.pool.snapshot)
+                await loop.run_in_executor(
+                    self._process_pool(), train_anomaly_model, pool_df, self.registry.directory, version
+                )
+                # Swap it into this process now; other processes follow the CURRENT pointer
+                await loop.run_in_executor(None, self.registry.load, ANOMALY_MODEL_NAME, version)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Anomaly model retraining failed")
+                return None
+            self.last_trained_at = time.time()
+            self.last_error = None
+            return version
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.retrain()
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.release_leadership()
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+    def status(self) -> dict:
+        return {
+            'pooledRows': len(self.pool),
+            'seenRows': self.pool.seen,
+            'skippedRequests': self.pool.skipped,
+            'leader': self.is_leader,
+            'intervalSeconds': self.interval,
+            'lastTrainedAt': self.last_trained_at,
+            'lastError': self.last_error,
+        }
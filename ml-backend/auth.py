@@ -0,0 +1,302 @@
+"""
+Bearer-token verification shared with the Node backend.
+
+Tokens are the JWTs the Node backend signs for its users ({userId, email,
+iat, exp}, HS256 with JWT_SECRET by default); RS256 tokens are verified
+against PEM public keys or a local JWKS file. Each key is parsed once and
+pinned to its algorithm, so an RSA public key can never be used as an HMAC
+secret. Key files are re-read when they change on disk (checked at most every
+ML_JWT_KEY_CHECK_SECONDS), so keys rotate without a restart; a reload drops
+every cached token.
+
+Verified claims are cached under the SHA-256 of the token until the token
+expires (capped at ML_JWT_CACHE_TTL), so repeated requests with the same
+token skip signature checks and claim parsing. Failures are never cached.
+
+Operational endpoints (model reload, retraining) also need admin rights: a
+token whose `role`, `roles` or space-separated `scope` claim names
+ML_ADMIN_ROLE, or the ML_ADMIN_TOKEN shared secret in the X-Admin-Token
+header for service callers. Disabling auth does not grant admin rights
+unless ML_AUTH_DISABLED_ADMIN says so.
+
+Configuration (environment variables):
+    ML_JWT_SECRET              HS256 secret (default: JWT_SECRET)
+    ML_JWT_SECRET_FILE         file holding the HS256 secret, re-read on change
+    ML_JWT_PUBLIC_KEY_FILE     RS256 public key (PEM), re-read on change
+    ML_JWKS_FILE               JWK set ({"keys": [...]}), keys picked by `kid`, re-read on change
+    ML_JWT_AUDIENCE            required `aud` (default: not checked)
+    ML_JWT_ISSUER              required `iss` (default: not checked)
+    ML_JWT_LEEWAY              clock skew allowed on exp/nbf/iat, in seconds (default: 0)
+    ML_JWT_CACHE_SIZE          verified tokens kept (default: 10000)
+    ML_JWT_CACHE_TTL           longest a verified token is trusted without re-checking (default: 300)
+    ML_JWT_KEY_CHECK_SECONDS   how often key files are checked for changes (default: 10)
+    ML_ADMIN_ROLE              role or scope that grants admin rights (default: admin)
+    ML_ADMIN_TOKEN             shared secret accepted as X-Admin-Token for admin endpoints (default: none)
+    ML_AUTH_DISABLED           '1' accepts any bearer token, for local development only
+    ML_AUTH_DISABLED_ADMIN     '1' also grants every caller admin rights while auth is disabled (default: 0)
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from jose import JWTError, jwk, jwt
+from jose.exceptions import JOSEError
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTokenError(ValueError):
+    """Raised when a bearer token fails verification"""
+
+
+class AuthNotConfiguredError(RuntimeError):
+    """Raised when verification is on but no key is configured"""
+
+
+def _read(path: str) -> str:
+    with open(path) as f:
+        return f.read().strip()
+
+
+class KeyStore:
+    """Verification keys from the environment and key files, reloaded when the files change"""
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        secret_file: Optional[str] = None,
+        public_key_file: Optional[str] = None,
+        jwks_file: Optional[str] = None,
+        check_seconds: float = 10.0,
+    ):
+        self.secret = secret
+        self.files = {name: path for name, path in (
+            ('secret', secret_file), ('public_key', public_key_file), ('jwks', jwks_file)
+        ) if path}
+        self.check_seconds = check_seconds
+        self.generation = 0
+        self.reloads = 0
+        self._by_kid: Dict[str, Tuple[Any, str]] = {}
+        self._keys: List[Tuple[Any, str]] = []
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+        self._load()
+
+    def _mtime(self, path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> None:
+        """Parse every configured key into (jose key, algorithm) pairs"""
+        keys: List[Tuple[Any, str]] = []
+        by_kid: Dict[str, Tuple[Any, str]] = {}
+        mtimes = {name: self._mtime(path) for name, path in self.files.items()}
+
+        secret = self.secret
+        if 'secret' in self.files and mtimes['secret'] is not None:
+            secret = _read(self.files['secret'])
+        if secret:
+            keys.append((jwk.construct(secret, 'HS256'), 'HS256'))
+        if 'public_key' in self.files and mtimes['public_key'] is not None:
+            keys.append((jwk.construct(_read(self.files['public_key']), 'RS256'), 'RS256'))
+        if 'jwks' in self.files and mtimes['jwks'] is not None:
+            for entry in json.loads(_read(self.files['jwks'])).get('keys', []):
+                algorithm = entry.get('alg') or ('HS256' if entry.get('kty') == 'oct' else 'RS256')
+                if algorithm not in ('HS256', 'RS256'):
+                    continue
+                key = (jwk.construct(entry, algorithm), algorithm)
+                keys.append(key)
+                if 'kid' in entry:
+                    by_kid[entry['kid']] = key
+
+        self._keys, self._by_kid, self._mtimes = keys, by_kid, mtimes
+        self.generation += 1
+
+    def refresh(self) -> bool:
+        """Reload when a key file changed since the last load; True when the keys changed"""
+        if not self.files:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return False
+        with self._lock:
+            self._checked_at = now
+            if all(self._mtime(path) == self._mtimes.get(name) for name, path in self.files.items()):
+                return False
+            try:
+                self._load()
+            except (OSError, ValueError, JOSEError):
+                # A file caught mid-write or broken: keep serving the old keys and retry on the next check
+                logger.exception("Could not reload JWT keys")
+                return False
+            self.reloads += 1
+            return True
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._keys)
+
+    def candidates(self, kid: Optional[str]) -> List[Tuple[Any, str]]:
+        """Keys a token with this `kid` may be signed with"""
+        if kid is not None and kid in self._by_kid:
+            return [self._by_kid[kid]]
+        return self._keys
+
+
+class TokenVerifier:
+    """Verifies bearer tokens and caches their claims until they expire"""
+
+    def __init__(
+        self,
+        keys: KeyStore,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        leeway: float = 0.0,
+        cache_size: int = 10000,
+        cache_ttl: float = 300.0,
+        enabled: bool = True,
+        admin_role: str = 'admin',
+        admin_token: Optional[str] = None,
+        admin_when_disabled: bool = False,
+    ):
+        self.keys = keys
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.enabled = enabled
+        self.admin_role = admin_role
+        self.admin_token = admin_token
+        self.admin_when_disabled = admin_when_disabled
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        # token digest -> (expires at, claims)
+        self._cache: 'OrderedDict[bytes, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._generation = keys.generation
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TokenVerifier':
+        keys = KeyStore(
+            secret=os.environ.get('ML_JWT_SECRET') or os.environ.get('JWT_SECRET'),
+            secret_file=os.environ.get('ML_JWT_SECRET_FILE'),
+            public_key_file=os.environ.get('ML_JWT_PUBLIC_KEY_FILE'),
+            jwks_file=os.environ.get('ML_JWKS_FILE'),
+            check_seconds=float(os.environ.get('ML_JWT_KEY_CHECK_SECONDS', 10)),
+        )
+        return cls(
+            keys,
+            audience=os.environ.get('ML_JWT_AUDIENCE'),
+            issuer=os.environ.get('ML_JWT_ISSUER'),
+            leeway=float(os.environ.get('ML_JWT_LEEWAY', 0)),
+            cache_size=int(os.environ.get('ML_JWT_CACHE_SIZE', 10000)),
+            cache_ttl=float(os.environ.get('ML_JWT_CACHE_TTL', 300)),
+            enabled=os.environ.get('ML_AUTH_DISABLED', '0') != '1',
+            admin_role=os.environ.get('ML_ADMIN_ROLE', 'admin'),
+            admin_token=os.environ.get('ML_ADMIN_TOKEN') or None,
+            admin_when_disabled=os.environ.get('ML_AUTH_DISABLED_ADMIN', '0') == '1',
+        )
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+        options = {'leeway': self.leeway, 'verify_aud': self.audience is not None}
+        error: Optional[Exception] = None
+        for key, algorithm in self.keys.candidates(header.get('kid')):
+            if algorithm != header.get('alg'):
+                continue
+            try:
+                return jwt.decode(token, key, algorithms=[algorithm], options=options,
+                                  audience=self.audience, issuer=self.issuer)
+            except JWTError as e:
+                error = e
+        raise InvalidTokenError(str(error) if error else f"No key for algorithm {header.get('alg')!r}")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token plus its `userId` (from `userId`, else `sub`); raises InvalidTokenError"""
+        if not self.enabled:
+            return {'userId': None}
+        if self.keys.refresh() or self._generation != self.keys.generation:
+            with self._lock:
+                self._cache.clear()
+                self._generation = self.keys.generation
+        if not self.keys.configured:
+            raise AuthNotConfiguredError("No JWT secret or public key configured")
+
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self._cache.move_to_end(digest)
+                    self.hits += 1
+                    return entry[1]
+                del self._cache[digest]
+            self.misses += 1
+
+        try:
+            claims = self._decode(token)
+        except InvalidTokenError:
+            self._failed()
+            raise
+        user_id = claims.get('userId', claims.get('sub'))
+        if not isinstance(user_id, str) or not user_id:
+            self._failed()
+            raise InvalidTokenError('Token has no userId or sub claim')
+        claims = {**claims, 'userId': user_id}
+
+        expires_at = now + self.cache_ttl
+        if isinstance(claims.get('exp'), (int, float)):
+            expires_at = min(expires_at, claims['exp'] + self.leeway)
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[digest] = (expires_at, claims)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return claims
+
+    def _failed(self) -> None:
+        # Verification runs in the threadpool; counted under the cache lock like hits and misses
+        with self._lock:
+            self.failures += 1
+
+    def is_admin(self, claims: Dict[str, Any], admin_token: Optional[str] = None) -> bool:
+        """Whether verified claims, or the shared admin token, grant admin rights"""
+        if not self.enabled and self.admin_when_disabled:
+            return True
+        if self.admin_token and admin_token and hmac.compare_digest(admin_token.encode(), self.admin_token.encode()):
+            return True
+        roles = claims.get('roles')
+        scope = claims.get('scope')
+        granted = {
+            claims.get('role'),
+            *(roles if isinstance(roles, list) else ()),
+            *(scope.split() if isinstance(scope, str) else ()),
+        }
+        return self.admin_role in granted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'keys': len(self.keys.candidates(None)),
+            'keyReloads': self.keys.reloads,
+            'cachedTokens': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'failures': self.failures,
+        }
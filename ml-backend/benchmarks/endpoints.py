@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Endpoint benchmark suite for the ML backend.
+
+Drives every analysis endpoint in-process through the ASGI interface (no
+sockets, no HTTP client) with seeded synthetic transactions at each size, and
+records latency percentiles, throughput and peak RSS (this process plus the
+analysis worker processes, prepared payloads included). Payloads are built
+before the clock starts, so timings cover request parsing, analysis and
+response encoding.
+
+    python benchmarks/endpoints.py                                  # 1k / 100k / 1M rows, every case
+    python benchmarks/endpoints.py --sizes 1000 --cases 'expenses*'
+    python benchmarks/endpoints.py --output head.json               # save the results
+    python benchmarks/endpoints.py --baseline base.json             # fail on regressions against them
+    python benchmarks/endpoints.py --compare main HEAD              # run both commits, flag regressions
+
+The result cache is disabled (ML_CACHE_BACKEND=none) so repeated requests
+measure the analysis rather than cache hits, and the task timeout is raised
+so 1M-row cases are not cut off; both can be overridden from the environment.
+Pull-mode cases (pull/*) read the transactions from a temporary SQLite
+stand-in database (ML_DATA_SOURCE=sqlite) seeded before the clock starts.
+Requests carry HS256 tokens minted with ML_JWT_SECRET / JWT_SECRET (a fixed
+benchmark secret when neither is set), so token verification is measured too.
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import functools
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Transactions per user in the batch payloads
+ROWS_PER_USER = 2000
+
+# Metrics compared against a baseline, and whether lower is better
+COMPARED_METRICS = {'p50_ms': True, 'p95_ms': True, 'peak_rss_mb': True}
+
+# HS256 secret the app verifies benchmark tokens with, unless the environment configures one
+BENCHMARK_JWT_SECRET = 'benchmark-secret'
+
+
+@dataclass
+class Payload:
+    method: str
+    path: str
+    body: Iterable[bytes] = ()
+    content_type: str = 'application/json'
+    rows: int = 0
+    user: str = 'user-0'  # the token's user; per-user endpoints only serve their own user
+
+
+@functools.lru_cache(maxsize=None)
+def auth_headers(user: str) -> List[Tuple[bytes, bytes]]:
+    """Authorization header with a token minted like the Node backend's ({userId, email}, HS256, 7 days)"""
+    from jose import jwt
+
+    now = int(time.time())
+    claims = {'userId': user, 'email': f'{user}@example.com', 'iat': now, 'exp': now + 7 * 86400}
+    token = jwt.encode(claims, os.environ.get('ML_JWT_SECRET') or os.environ['JWT_SECRET'], algorithm='HS256')
+    return [(b'authorization', f'Bearer {token}'.encode())]
+
+
+@dataclass
+class Case:
+    name: str
+    build: Callable[[Any, int], List[Payload]]  # (transactions frame, rows) -> requests run in order
+    scales: bool = True  # False: the payload does not depend on the size, run once
+
+
+def _json(method: str, path: str, payload: Any, rows: int) -> Payload:
+    from synthetic import to_json
+    return Payload(method, path, [to_json(payload)], rows=rows)
+
+
+def _cases() -> List[Case]:
+    from synthetic import PROFILE, generate_incomes, to_arrow, to_ndjson, to_records
+
+    def records(df, batch=False):
+        return to_records(df, user_id=batch)
+
+    seeded = set()
+
+    def pulled(df, n, path):
+        """Seed the stand-in database with the rows as one user's; the request is just that user's path"""
+        user = f'pull-{n}'
+        if n not in seeded:
+            try:
+                from sources import write_sqlite
+            except ImportError:
+                pass  # backends without pull mode answer 404
+            else:
+                write_sqlite(os.environ['ML_SQLITE_PATH'], df.assign(userId=user, id=f'{user}-' + df['id']))
+            seeded.add(n)
+        return Payload('GET', f'/users/{user}{path}', rows=n, user=user)
+
+    return [
+        Case('expenses', lambda df, n: [
+            _json('POST', '/analyze/expenses', {'userId': 'user-0', 'transactions': records(df)}, n)]),
+        Case('expenses[ndjson]', lambda df, n: [
+            Payload('POST', '/analyze/expenses', list(to_ndjson(df)), 'application/x-ndjson', n)]),
+        Case('expenses[arrow]', lambda df, n: [
+            Payload('POST', '/analyze/expenses', [to_arrow(df)], 'application/vnd.apache.arrow.stream', n)]),
+        Case('expenses[mad]', lambda df, n: [
+            _json('POST', '/analyze/expenses', {'userId': 'user-0', 'anomalyMethod': 'mad', 'transactions': records(df)}, n)]),
+        Case('expenses/batch', lambda df, n: [
+            _json('POST', '/analyze/expenses/batch', {'transactions': records(df, batch=True)}, n)]),
+        Case('expenses/batch[ndjson]', lambda df, n: [
+            Payload('POST', '/analyze/expenses/batch', list(to_ndjson(df, user_id=True)), 'application/x-ndjson', n)]),
+        Case('suggestions/investments', lambda df, n: [
+            _json('POST', '/suggestions/investments', {'userId': 'user-0', 'profile': PROFILE, 'transactions': records(df)}, n)]),
+        Case('spending-pattern', lambda df, n: [
+            _json('POST', '/analyze/spending-pattern', records(df), n)]),
+        Case('tax-savings', lambda df, n: [
+            _json('POST', '/predict/tax-savings?annual_income=1800000', records(df), n)]),
+        Case('investment-performance', lambda df, n: [
+            _json('POST', f"/analyze/investment-performance?monthly_investment_capacity={PROFILE['monthlyInvestmentCapacity']}", records(df), n)]),
+        Case('dashboard', lambda df, n: [
+            _json('POST', '/dashboard', {
+                'userId': 'user-0', 'annualIncome': 1800000,
+                'monthlyInvestmentCapacity': PROFILE['monthlyInvestmentCapacity'], 'transactions': records(df)
+            }, n)]),
+        Case('pull/expenses', lambda df, n: [pulled(df, n, '/analyze/expenses')]),
+        Case('pull/spending-pattern', lambda df, n: [pulled(df, n, '/analyze/spending-pattern')]),
+        Case('pull/tax-savings', lambda df, n: [pulled(df, n, '/predict/tax-savings?annual_income=1800000')]),
+        Case('pull/investment-performance', lambda df, n: [pulled(df, n, '/analyze/investment-performance')]),
+        Case('pull/dashboard', lambda df, n: [pulled(df, n, '/dashboard?annual_income=1800000')]),
+        Case('tax/calculate', lambda df, n: [
+            _json('POST', '/tax/calculate', {'incomes': generate_incomes(n), 'regime': 'OLD_REGIME'}, n)]),
+        Case('tax/optimize', lambda df, n: [
+            _json('POST', '/tax/optimize', {'annualIncome': 1800000, 'hraExemption': 120000}, 0)], scales=False),
+        Case('aggregates', lambda df, n: [
+            _json('POST', '/aggregates/user-0/transactions', {'reset': True, 'transactions': records(df)}, n),
+            Payload('GET', '/aggregates/user-0/analyze/expenses'),
+            Payload('GET', '/aggregates/user-0/analyze/spending-pattern'),
+        ]),
+    ]
+
+
+async def call(app, payload: Payload) -> Tuple[int, int]:
+    """Send one request through the ASGI app; (status, response bytes)"""
+    path, _, query = payload.path.partition('?')
+    chunks = list(payload.body) or [b'']
+    # A single-chunk body has a Content-Length (admission control sizes requests by it); streams are chunked
+    length = [(b'content-length', str(len(chunks[0])).encode())] if len(chunks) == 1 else []
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': payload.method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'content-type', payload.content_type.encode()), *length, *auth_headers(payload.user)],
+        'client': ('127.0.0.1', 50000),
+        'server': ('127.0.0.1', 8001),
+    }
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    response = {'status': 0, 'bytes': 0}
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['bytes'] += len(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return response['status'], response['bytes']
+
+
+def _process_tree_rss(pid: int) -> int:
+    """Resident bytes of a process and its descendants (Linux /proc)"""
+    total = 0
+    pending = [pid]
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class RssSampler:
+    """Peak resident memory of this process tree while a case runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> int:
+        if os.path.exists('/proc/self/statm'):
+            return _process_tree_rss(os.getpid())
+        import resource
+        # Lifetime peaks only: ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) * scale
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._sample())
+
+    def __enter__(self) -> 'RssSampler':
+        self.peak = self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._sample())
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+async def run_case(app, payloads: List[Payload], repeat: int, concurrency: int, max_seconds: float) -> Dict[str, Any]:
+    """Warm up once, then time `repeat` rounds of the case's requests"""
+    statuses = [status for status, _ in [await call(app, payload) for payload in payloads]]
+    if any(status >= 400 for status in statuses):
+        return {'status': max(statuses)}
+
+    latencies: List[float] = []
+    response_bytes = 0
+
+    async def one_round():
+        nonlocal response_bytes
+        started = time.perf_counter()
+        for payload in payloads:
+            status, size = await call(app, payload)
+            if status >= 400:
+                raise RuntimeError(f"{payload.method} {payload.path} returned {status}")
+            response_bytes += size
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        while len(latencies) < repeat:
+            await asyncio.gather(*[one_round() for _ in range(min(concurrency, repeat - len(latencies)))])
+            if time.perf_counter() - started > max_seconds:
+                break
+        elapsed = time.perf_counter() - started
+
+    rows = sum(payload.rows for payload in payloads)
+    return {
+        'status': 200,
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.fmean(latencies),
+        'requests_per_s': len(latencies) / elapsed,
+        'rows_per_s': rows * len(latencies) / elapsed,
+        'response_kb': response_bytes / len(latencies) / 1024,
+        'peak_rss_mb': rss.peak / 2**20,
+    }
+
+
+async def run_suite(args) -> Dict[str, Dict[str, Any]]:
+    from synthetic import generate_transactions
+
+    import main
+
+    cases = [case for case in _cases() if any(case.name == pattern or fnmatch.fnmatchcase(case.name, pattern) for pattern in args.cases)]
+    results: Dict[str, Dict[str, Any]] = {}
+    async with main.app.router.lifespan_context(main.app):
+        for i, rows in enumerate(args.sizes):
+            transactions_df = generate_transactions(rows, seed=args.seed, users=max(1, rows // ROWS_PER_USER))
+            for case in cases:
+                if not case.scales and i > 0:
+                    continue
+                key = f'{case.name}@{rows}' if case.scales else case.name
+                result = await run_case(main.app, case.build(transactions_df, rows), args.repeat, args.concurrency, args.max_seconds)
+                results[key] = result
+                print(_format(key, result), flush=True)
+    return results
+
+
+def _format(key: str, result: Dict[str, Any]) -> str:
+    if result['status'] != 200:
+        return f"{key:<34} HTTP {result['status']}"
+    return (
+        f"{key:<34} p50 {result['p50_ms']:9.1f} ms  p95 {result['p95_ms']:9.1f} ms  p99 {result['p99_ms']:9.1f} ms  "
+        f"{result['requests_per_s']:8.1f} req/s  {result['rows_per_s']:11.0f} rows/s  RSS {result['peak_rss_mb']:7.0f} MB"
+    )
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    """Regressions of results against a baseline beyond the tolerance"""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if before['status'] == 200 and result['status'] != 200:
+            regressions.append(f"{key} now fails with HTTP {result['status']}")
+            continue
+        if result['status'] != 200 or before['status'] != 200:
+            continue
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            change = result[metric] / before[metric] - 1 if before[metric] else 0.0
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(f"{key} {metric} {before[metric]:.1f} -> {result[metric]:.1f} ({change:+.0%})")
+    return regressions
+
+
+def run_at_commit(revision: str, argv: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Run this suite (the current version of it) against another commit's backend in a temporary worktree"""
+    repo = subprocess.run(
+        ['git', 'rev-parse', '--show-toplevel'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    backend = os.path.relpath(BACKEND_DIR, repo)
+    worktree = tempfile.mkdtemp(prefix='ml-bench-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', worktree, revision], cwd=repo, check=True, capture_output=True)
+    try:
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            print(f"== {revision}", flush=True)
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *argv, '--app-dir', os.path.join(worktree, backend),
+                 '--output', output.name],
+                check=True,
+            )
+            return json.load(open(output.name))
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=repo, capture_output=True)
+        shutil.rmtree(worktree, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--cases', nargs='+', default=['*'], help='case names or glob patterns over them')
+    parser.add_argument('--repeat', type=int, default=5, help='timed rounds per case')
+    parser.add_argument('--concurrency', type=int, default=1, help='rounds in flight at once')
+    parser.add_argument('--max-seconds', type=float, default=60.0, help='stop repeating a case after this long')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to a JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='benchmark two commits and compare them')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown or memory growth')
+    parser.add_argument('--app-dir', default=BACKEND_DIR, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        argv = [
+            '--sizes', *map(str, args.sizes), '--cases', *args.cases, '--repeat', str(args.repeat),
+            '--concurrency', str(args.concurrency), '--max-seconds', str(args.max_seconds), '--seed', str(args.seed),
+        ]
+        baseline, results = (run_at_commit(revision, argv) for revision in args.compare)
+    else:
+        os.environ.setdefault('ML_CACHE_BACKEND', 'none')
+        os.environ.setdefault('ML_TASK_TIMEOUT', '600')
+        os.environ.setdefault('ML_ANOMALY_RETRAIN_SECONDS', '0')
+        os.environ.setdefault('ML_DATA_SOURCE', 'sqlite')
+        if not (os.environ.get('ML_JWT_SECRET') or os.environ.get('JWT_SECRET')):
+            os.environ['ML_JWT_SECRET'] = BENCHMARK_JWT_SECRET
+        os.chdir(args.app_dir)
+        sys.path[:0] = [args.app_dir, BENCHMARK_DIR]
+        with tempfile.TemporaryDirectory(prefix='ml-bench-db-') as database_dir:
+            os.environ.setdefault('ML_SQLITE_PATH', os.path.join(database_dir, 'transactions.db'))
+            results = asyncio.run(run_suite(args))
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Overload test for the ML backend's admission control.
+
+Starts the app under uvicorn (one worker process) for each mode and drives it
+over real sockets with an open-loop Poisson arrival stream: requests are
+sent at the given rate whether or not earlier ones have finished, as a burst
+from the Node backend would be. The mix mostly holds small analyses with a
+share of 100k-row payloads, so the offered load is well above what one
+worker can serve. /health is probed throughout.
+
+For each mode it reports, per response class, the count and latency
+percentiles, the /health latency, and the server's peak RSS (workers
+included). With admission control on, excess requests are answered early
+with 429/503 and admitted ones keep a bounded p99; with it off, every request
+is accepted, memory grows and latency climbs until requests time out.
+
+    python benchmarks/load.py                           # admission on, then off
+    python benchmarks/load.py --modes on --rate 12 --duration 60
+    python benchmarks/load.py --output load.json
+
+Payloads are built before the server starts; the result cache is disabled
+(ML_CACHE_BACKEND=none) so every request is analysed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path[:0] = [BACKEND_DIR, BENCHMARK_DIR]
+
+from endpoints import BENCHMARK_JWT_SECRET, _process_tree_rss, auth_headers, percentile  # noqa: E402
+
+# (label, path, payload size, whether the body is a {transactions} envelope, share of requests)
+MIX = (
+    ('expenses/small', '/analyze/expenses', 'small', True, 0.45),
+    ('tax-savings/small', '/predict/tax-savings?annual_income=1800000', 'small', False, 0.25),
+    ('expenses/large', '/analyze/expenses', 'large', True, 0.15),
+    ('spending-pattern/large', '/analyze/spending-pattern', 'large', False, 0.15),
+)
+
+HEALTH_INTERVAL = 0.25
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_payloads(small_rows: int, large_rows: int, seed: int) -> Dict[str, Tuple[str, bytes]]:
+    from synthetic import generate_transactions, to_json, to_records
+
+    records = {
+        size: to_records(generate_transactions(rows, seed=seed))
+        for size, rows in (('small', small_rows), ('large', large_rows))
+    }
+    return {
+        label: (path, to_json({'userId': 'user-0', 'transactions': records[size]} if envelope else records[size]))
+        for label, path, size, envelope, _ in MIX
+    }
+
+
+async def request(port: int, method: str, path: str, body: bytes, timeout: float) -> Tuple[str, float]:
+    """One request on its own connection; (status or 'timeout' / 'error', seconds)"""
+    headers = ''.join(f'{name.decode()}: {value.decode()}\r\n' for name, value in auth_headers('user-0'))
+    head = (
+        f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n{headers}\r\n'
+    ).encode()
+    started = time.perf_counter()
+    writer = None
+    try:
+        async def upload() -> None:
+            try:
+                writer.write(head + body)
+                await writer.drain()
+            except OSError:
+                pass  # answered (429/503) and closed before the body was read
+
+        async def exchange() -> str:
+            nonlocal writer
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            uploading = asyncio.create_task(upload())
+            status = (await reader.readline()).split()[1].decode()
+            await reader.read()
+            await uploading
+            return status
+
+        status = await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        status = 'timeout'
+    except (OSError, IndexError):
+        status = 'error'
+    finally:
+        if writer is not None:
+            writer.close()
+    return status, time.perf_counter() - started
+
+
+def _summary(samples: List[Tuple[str, float]]) -> Dict[str, Any]:
+    latencies = [seconds * 1000 for _, seconds in samples]
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies),
+    }
+
+
+async def drive(port: int, server_pid: int, payloads: Dict[str, Tuple[str, bytes]], args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    labels = [label for label, *_ in MIX]
+    shares = [share for *_, share in MIX]
+    results: List[Tuple[str, str, float]] = []
+    health: List[Tuple[str, float]] = []
+    peak_rss = 0
+    stop = asyncio.Event()
+
+    async def send(label: str) -> None:
+        path, body = payloads[label]
+        status, seconds = await request(port, 'POST', path, body, args.timeout)
+        results.append((label, status, seconds))
+
+    async def probe() -> None:
+        nonlocal peak_rss
+        while not stop.is_set():
+            health.append(await request(port, 'GET', '/health', b'', args.timeout))
+            peak_rss = max(peak_rss, _process_tree_rss(server_pid))
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    prober = asyncio.create_task(probe())
+    tasks = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    next_at = started
+    while next_at < deadline:
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        tasks.append(asyncio.create_task(send(rng.choices(labels, shares)[0])))
+        next_at += rng.expovariate(args.rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+
+    statuses = Counter(status for _, status, _ in results)
+    by_status = {
+        status: _summary([(status, seconds) for _, s, seconds in results if s == status]) for status in sorted(statuses)
+    }
+    ok = [(label, seconds) for label, status, seconds in results if status == '200']
+    return {
+        'requests': len(results),
+        'offered_per_s': len(results) / args.duration,
+        'served_per_s': len(ok) / elapsed,
+        'statuses': dict(statuses),
+        'by_status': by_status,
+        'ok_by_label': {label: _summary([s for s in ok if s[0] == label]) for label in labels if any(s[0] == label for s in ok)},
+        'health': _summary(health),
+        'peak_rss_mb': peak_rss / 2**20,
+    }
+
+
+def run_mode(mode: str, payloads: Dict[str, Tuple[str, bytes]], args) -> Dict[str, Any]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        'ML_ADMISSION': '1' if mode == 'on' else '0',
+        'ML_CACHE_BACKEND': os.environ.get('ML_CACHE_BACKEND', 'none'),
+        'ML_ANOMALY_RETRAIN_SECONDS': os.environ.get('ML_ANOMALY_RETRAIN_SECONDS', '0'),
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        ready_by = time.time() + 60
+        while asyncio.run(request(port, 'GET', '/health', b'', 1.0))[0] != '200':
+            if server.poll() is not None or time.time() > ready_by:
+                raise RuntimeError(f"Server did not start (mode {mode})")
+            time.sleep(0.2)
+        return asyncio.run(drive(port, server.pid, payloads, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _print(mode: str, result: Dict[str, Any]) -> None:
+    print(f"== admission {mode}: {result['requests']} requests, {result['offered_per_s']:.1f}/s offered, "
+          f"{result['served_per_s']:.1f}/s served, peak RSS {result['peak_rss_mb']:.0f} MB")
+    for status, summary in result['by_status'].items():
+        print(f"   {status:<8} {summary['count']:5d}  p50 {summary['p50_ms']:8.0f} ms  p95 {summary['p95_ms']:8.0f} ms  "
+              f"p99 {summary['p99_ms']:8.0f} ms  max {summary['max_ms']:8.0f} ms")
+    for label, summary in result['ok_by_label'].items():
+        print(f"   200 {label:<24} {summary['count']:5d}  p50 {summary['p50_ms']:8.0f} ms  p99 {summary['p99_ms']:8.0f} ms")
+    health = result['health']
+    print(f"   /health {health['count']:5d}  p50 {health['p50_ms']:8.1f} ms  p99 {health['p99_ms']:8.1f} ms  "
+          f"max {health['max_ms']:8.1f} ms", flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=('on', 'off'), default=['on', 'off'])
+    parser.add_argument('--rate', type=float, default=8.0, help='offered requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of arrivals')
+    parser.add_argument('--small-rows', type=int, default=1000)
+    parser.add_argument('--large-rows', type=int, default=100000)
+    parser.add_argument('--timeout', type=float, default=60.0, help='client timeout per request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to a JSON file')
+    args = parser.parse_args()
+
+    if not (os.environ.get('ML_JWT_SECRET') or os.environ.get('JWT_SECRET')):
+        os.environ['ML_JWT_SECRET'] = BENCHMARK_JWT_SECRET
+    payloads = build_payloads(args.small_rows, args.large_rows, args.seed)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = run_mode(mode, payloads, args)
+        _print(mode, results[mode])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the ML backend.
+
+Every measurement runs in a fresh interpreter:
+    import_ms          `import main`
+    startup_ms         `import main` plus the app's startup hooks (pools, models)
+    worker_ready_ms    startup hooks in a worker forked from a preloaded parent,
+                       as run.py --prod does (POSIX only)
+
+The run fails (exit status 1) when a median exceeds its budget, or exceeds a
+saved baseline by more than the tolerance.
+
+    python benchmarks/startup.py                                  # check against the default budgets
+    python benchmarks/startup.py --save-baseline startup.json     # record a baseline
+    python benchmarks/startup.py --baseline startup.json          # fail on regressions against it
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median budgets in milliseconds
+DEFAULT_BUDGETS = {
+    'import_ms': 1500.0,
+    'startup_ms': 2500.0,
+    'worker_ready_ms': 250.0,
+}
+
+_IMPORT = """
+import json, time
+started = time.perf_counter()
+import main
+print(json.dumps({'import_ms': (time.perf_counter() - started) * 1000}))
+"""
+
+_STARTUP = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        return (time.perf_counter() - started) * 1000
+print(json.dumps({'startup_ms': asyncio.run(lifespan())}))
+"""
+
+_WORKER_READY = """
+import asyncio, json, os, time
+import run
+run.preload()
+read_fd, write_fd = os.pipe()
+started = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    import main
+    async def lifespan():
+        async with main.app.router.lifespan_context(main.app):
+            return (time.perf_counter() - started) * 1000
+    os.write(write_fd, json.dumps({'worker_ready_ms': asyncio.run(lifespan())}).encode())
+    os._exit(0)
+os.close(write_fd)
+result = os.read(read_fd, 4096).decode()
+os.waitpid(pid, 0)
+print(result)
+"""
+
+
+def measure(script: str, runs: int) -> float:
+    """Median of one metric over fresh interpreters"""
+    samples = []
+    env = {**os.environ, 'ML_ANOMALY_RETRAIN_SECONDS': '0'}
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmark subprocess failed:\n{completed.stderr}")
+        samples.extend(json.loads(completed.stdout.strip().splitlines()[-1]).values())
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help='JSON file with previous medians to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    parser.add_argument('--save-baseline', help='write the medians of this run to a JSON file')
+    for metric, budget in DEFAULT_BUDGETS.items():
+        parser.add_argument(f"--{metric.replace('_', '-')}-budget", type=float, default=budget, dest=f'{metric}_budget')
+    args = parser.parse_args()
+
+    scripts = {'import_ms': _IMPORT, 'startup_ms': _STARTUP}
+    if hasattr(os, 'fork'):
+        scripts['worker_ready_ms'] = _WORKER_READY
+    results = {metric: measure(script, args.runs) for metric, script in scripts.items()}
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    for metric, value in results.items():
+        budget = getattr(args, f'{metric}_budget')
+        line = f"{metric:>16}: {value:8.1f} ms (budget {budget:.0f} ms"
+        if value > budget:
+            failures.append(f"{metric} {value:.1f} ms is over its {budget:.0f} ms budget")
+        if metric in baseline:
+            limit = baseline[metric] * (1 + args.tolerance)
+            line += f", baseline {baseline[metric]:.1f} ms"
+            if value > limit:
+                failures.append(
+                    f"{metric} {value:.1f} ms regressed more than {args.tolerance:.0%} from {baseline[metric]:.1f} ms"
+                )
+        print(line + ")")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Seeded synthetic transactions for an Indian household.
+
+Categories match the app's tracker screen and the ones analyze_expenses gives
+specific advice for. Amounts are log-normal around typical monthly rupee
+figures per category, roughly 1% of expenses are inflated 5-20x so the
+anomaly detectors have something to find, and dates are spread uniformly
+over several financial years. The same (rows, seed, users) always produces
+the same frame.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# category: (weight, median amount in INR, log-normal sigma, tax section, merchants)
+EXPENSE_CATEGORIES = {
+    '🍕 Food & Dining': (0.22, 450, 0.8, None, ('Swiggy', 'Zomato', 'BigBasket', 'Local kirana', 'Cafe Coffee Day')),
+    '🚗 Transportation': (0.12, 300, 0.9, None, ('Uber', 'Ola', 'Indian Oil', 'Metro card recharge', 'FASTag')),
+    '🏠 Housing & Rent': (0.04, 25000, 0.3, None, ('Monthly rent', 'Society maintenance')),
+    '🛒 Shopping': (0.10, 1200, 1.0, None, ('Amazon', 'Flipkart', 'Myntra', 'DMart')),
+    '⚡ Utilities': (0.08, 1500, 0.5, None, ('BESCOM electricity', 'Airtel broadband', 'Jio recharge', 'Piped gas')),
+    '🏥 Healthcare': (0.04, 800, 1.0, None, ('Apollo Pharmacy', 'Clinic visit', 'Diagnostic lab')),
+    '🎬 Entertainment': (0.07, 600, 0.7, None, ('BookMyShow', 'Netflix', 'Spotify', 'PVR')),
+    '🎓 Education': (0.02, 8000, 0.8, '80C', ('School fees', 'Coursera', 'Tuition')),
+    '✈️ Travel': (0.02, 9000, 1.0, None, ('IRCTC', 'MakeMyTrip', 'IndiGo')),
+    '📱 Technology': (0.02, 3000, 1.1, None, ('Croma', 'Apple Store', 'Reliance Digital')),
+    '👕 Clothing': (0.04, 1500, 0.8, None, ('Westside', 'Max Fashion', 'Zara')),
+    '🔧 Maintenance': (0.02, 1200, 0.9, None, ('Urban Company', 'Car service', 'Plumber')),
+    '🏦 EMI & Loans': (0.03, 18000, 0.4, None, ('Home loan EMI', 'Car loan EMI')),
+    '🛡️ Insurance': (0.02, 2500, 0.6, '80D', ('LIC premium', 'Star Health premium')),
+    '📈 Investments': (0.04, 5000, 0.6, '80C', ('ELSS SIP', 'PPF deposit', 'NPS contribution')),
+    '🎁 Gifts & Donations': (0.02, 1500, 1.0, None, ('Wedding gift', 'Temple donation', 'GiveIndia')),
+    '💰 Other': (0.05, 700, 1.2, None, ('UPI transfer', 'ATM withdrawal')),
+}
+
+INCOME_CATEGORIES = {
+    '💼 Salary': (0.55, 90000, 0.5, None, ('Salary credit',)),
+    '💰 Business': (0.08, 40000, 1.0, None, ('Client payment',)),
+    '📈 Investments': (0.10, 3000, 1.2, None, ('Dividend', 'FD interest')),
+    '🎯 Freelance': (0.10, 15000, 0.9, None, ('Upwork payout', 'Consulting invoice')),
+    '🏆 Bonus': (0.03, 60000, 0.6, None, ('Annual bonus',)),
+    '🎁 Gift': (0.04, 5000, 1.0, None, ('Gift from family',)),
+    '🔄 Rental': (0.07, 18000, 0.3, None, ('Flat rent received',)),
+    '💎 Other': (0.03, 2000, 1.2, None, ('Cashback', 'Refund')),
+}
+
+# Share of transactions that are income
+INCOME_SHARE = 0.08
+
+# Share of expenses inflated into outliers, and how much
+OUTLIER_SHARE = 0.01
+OUTLIER_FACTOR = (5.0, 20.0)
+
+# Start of the first financial year covered
+START_DATE = '2022-04-01'
+
+PROFILE = {
+    'age': 34,
+    'income': 1800000,
+    'riskTolerance': 'MEDIUM',
+    'investmentGoals': ['RETIREMENT', 'TAX_SAVING'],
+    'timeHorizon': 15,
+    'currentSavings': 600000,
+    'monthlyInvestmentCapacity': 30000,
+}
+
+
+def _draw(rng: np.random.Generator, categories: Dict[str, tuple], n: int) -> Dict[str, np.ndarray]:
+    """Category, amount, description and tax section for n transactions of one type"""
+    names = list(categories)
+    specs = list(categories.values())
+    weights = np.array([spec[0] for spec in specs])
+    codes = rng.choice(len(names), size=n, p=weights / weights.sum())
+
+    medians = np.array([spec[1] for spec in specs], dtype=float)[codes]
+    sigmas = np.array([spec[2] for spec in specs])[codes]
+    amounts = medians * np.exp(sigmas * rng.standard_normal(n))
+
+    descriptions = np.empty(n, dtype=object)
+    sections = np.empty(n, dtype=object)
+    for code, (_, _, _, section, merchants) in enumerate(specs):
+        rows = np.flatnonzero(codes == code)
+        descriptions[rows] = np.asarray(merchants, dtype=object)[rng.integers(0, len(merchants), rows.size)]
+        sections[rows] = section
+
+    return {
+        'category': np.asarray(names, dtype=object)[codes],
+        'amount': amounts,
+        'description': descriptions,
+        'taxSection': sections,
+    }
+
+
+def generate_transactions(
+    rows: int,
+    seed: int = 0,
+    users: int = 1,
+    years: int = 3,
+    start: str = START_DATE,
+) -> pd.DataFrame:
+    """Frame of `rows` transactions with the API's fields plus userId, sorted by date"""
+    rng = np.random.default_rng(seed)
+    is_income = rng.random(rows) < INCOME_SHARE
+    n_income = int(is_income.sum())
+
+    columns: Dict[str, np.ndarray] = {
+        'category': np.empty(rows, dtype=object),
+        'amount': np.empty(rows, dtype=float),
+        'description': np.empty(rows, dtype=object),
+        'taxSection': np.empty(rows, dtype=object),
+    }
+    for mask, categories, n in ((~is_income, EXPENSE_CATEGORIES, rows - n_income), (is_income, INCOME_CATEGORIES, n_income)):
+        for column, values in _draw(rng, categories, n).items():
+            columns[column][mask] = values
+
+    outliers = ~is_income & (rng.random(rows) < OUTLIER_SHARE)
+    columns['amount'][outliers] *= rng.uniform(*OUTLIER_FACTOR, int(outliers.sum()))
+
+    first = np.datetime64(start, 'D')
+    days = int((np.datetime64(f'{int(start[:4]) + years}{start[4:]}', 'D') - first).astype(int))
+    dates = np.sort(first + rng.integers(0, days, rows).astype('timedelta64[D]'))
+
+    return pd.DataFrame({
+        'id': np.char.add('txn-', np.arange(rows).astype(str)).astype(object),
+        'userId': np.char.add('user-', rng.integers(0, max(users, 1), rows).astype(str)).astype(object),
+        'amount': np.round(columns['amount'], 2),
+        'category': columns['category'],
+        'type': np.where(is_income, 'INCOME', 'EXPENSE').astype(object),
+        'description': columns['description'],
+        'date': np.datetime_as_string(dates, unit='D').astype(object),
+        'isTaxDeductible': pd.notna(columns['taxSection']),
+        'taxSection': columns['taxSection'],
+    })
+
+
+def generate_incomes(rows: int, seed: int = 0) -> List[float]:
+    """Annual incomes for the vectorized tax endpoints, log-normal around 12 lakh"""
+    rng = np.random.default_rng(seed)
+    return np.round(1200000 * np.exp(0.7 * rng.standard_normal(rows)), -2).tolist()
+
+
+def to_records(transactions_df: pd.DataFrame, user_id: bool = False) -> List[Dict[str, Any]]:
+    """JSON-ready transaction dicts; userId is only kept for batch payloads"""
+    columns = transactions_df.columns if user_id else transactions_df.columns.drop('userId')
+    frame = transactions_df[columns].astype(object).where(transactions_df[columns].notna(), None)
+    return frame.to_dict('records')
+
+
+def to_json(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+
+def to_ndjson(transactions_df: pd.DataFrame, user_id: bool = False, chunk_rows: int = 10000) -> Iterator[bytes]:
+    """NDJSON body in chunks of chunk_rows records"""
+    for offset in range(0, len(transactions_df), chunk_rows):
+        records = to_records(transactions_df.iloc[offset:offset + chunk_rows], user_id)
+        yield ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode()
+
+
+def to_arrow(transactions_df: pd.DataFrame, user_id: bool = False, batch_rows: Optional[int] = 65536) -> bytes:
+    """Arrow IPC stream body (needs pyarrow)"""
+    import pyarrow as pa
+
+    columns = transactions_df.columns if user_id else transactions_df.columns.drop('userId')
+    table = pa.Table.from_pandas(transactions_df[columns], preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=batch_rows)
+    return sink.getvalue().to_pybytes()
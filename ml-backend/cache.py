@@ -0,0 +1,293 @@
+"""
+Content-addressed result cache for analysis endpoints.
+
+Keys are a SHA-256 over (endpoint, ingested transaction frame, parameters),
+so the same transactions hash the same way regardless of JSON formatting or
+key order. Values are stored pickled, which gives exact size accounting and
+means callers can never mutate a cached result in place. An entry that cannot
+be read back (truncated, corrupt, removed mid-read) is dropped and counted as
+a miss.
+
+Configuration (environment variables):
+    ML_CACHE_BACKEND        'memory' (default), 'disk' or 'none'
+    ML_CACHE_TTL            entry lifetime in seconds (default: 300)
+    ML_CACHE_MAX_ENTRIES    entry bound (default: 1024)
+    ML_CACHE_MAX_BYTES      size bound in bytes (default: 64 MiB)
+    ML_CACHE_DIR            directory for the disk backend (default: .ml-cache)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from pydantic import BaseModel
+
+# Bump in every change to an endpoint's output so persisted entries from older code are ignored
+CACHE_VERSION = '7'
+
+
+class CacheBackend:
+    """Storage interface for pickled cache entries with absolute expiry times"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class DiskBackend(CacheBackend):
+    """One file per entry under a directory; uvicorn workers on a host can share it"""
+
+    _HEADER = struct.Struct('<d')  # expiry timestamp
+
+    def __init__(self, directory: str, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            (expires_at,) = self._HEADER.unpack_from(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, struct.error):
+            # Truncated or unreadable: drop it so the next request recomputes
+            self._unlink(path)
+            return None
+        if expires_at <= time.time():
+            self._unlink(path)
+            self.expirations += 1
+            return None
+        try:
+            # mtime doubles as the LRU clock
+            os.utime(path)
+        except OSError:
+            # Evicted by another worker since the read
+            return None
+        return data[self._HEADER.size:]
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._HEADER.pack(expires_at))
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # A full disk costs a cache entry, not the request
+            self._unlink(tmp_path)
+            return
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        self._unlink(self._path(key))
+
+    def _unlink(self, path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._unlink(path)
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            self._unlink(path)
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+def _hash_part(digest, value: Any) -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(zip(value.columns, map(str, value.dtypes)))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, BaseModel):
+        digest.update(json.dumps(value.model_dump(), sort_keys=True, default=str).encode())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    digest.update(b'\x00')
+
+
+class ResultCache:
+    """TTL + LRU cache of analysis results with hit/miss counters"""
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = 300.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        kind = os.environ.get('ML_CACHE_BACKEND', 'memory')
+        max_entries = int(os.environ.get('ML_CACHE_MAX_ENTRIES', 1024))
+        max_bytes = int(os.environ.get('ML_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        if kind == 'none':
+            backend = None
+        elif kind == 'disk':
+            backend = DiskBackend(os.environ.get('ML_CACHE_DIR', '.ml-cache'), max_entries, max_bytes)
+        elif kind == 'memory':
+            backend = MemoryBackend(max_entries, max_bytes)
+        else:
+            raise ValueError(f"Unknown ML_CACHE_BACKEND '{kind}'")
+        return cls(backend, ttl=float(os.environ.get('ML_CACHE_TTL', 300)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def key(endpoint: str, *parts: Any) -> str:
+        """Stable content hash of an endpoint call"""
+        digest = hashlib.sha256()
+        _hash_part(digest, [CACHE_VERSION, endpoint])
+        for part in parts:
+            _hash_part(digest, part)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(key)
+        if value is not None:
+            try:
+                result = pickle.loads(value)
+            except Exception:
+                # Corrupt entry, or pickled by code whose classes have since changed
+                self.backend.delete(key)
+            else:
+                self.hits += 1
+                return result
+        self.misses += 1
+        return None
+
+    def set(self, key: str, result: Any) -> None:
+        if self.backend is None:
+            return
+        self.backend.set(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), time.time() + self.ttl)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            **(self.backend.stats() if self.backend is not None else {}),
+        }
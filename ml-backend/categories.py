@@ -0,0 +1,155 @@
+"""
+Category classification shared by the analyses.
+
+Clients send the app's category names ('🍕 Food & Dining') but also bare or
+free-form ones ('Food', 'groceries', 'Mutual Fund SIP'), and descriptions
+('ELSS SIP', 'LIC premium'). Strings are normalized (case folded, emoji and
+punctuation dropped) and matched against one compiled pattern holding every
+keyword as a named alternative; when several keywords match, the class listed
+first in the table wins. Results are memoized per distinct string, and columns
+are classified through their distinct values and mapped back to integer codes,
+so the cost scales with distinct strings rather than rows.
+
+Configuration (environment variables):
+    ML_CLASSIFIER_CACHE   distinct strings memoized per table (default: 65536)
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Canonical categories (the app's names) and the keywords that identify them, most specific first.
+# Keywords are whole words; everyday words with an investment sense are avoided ('shares', not 'share')
+CATEGORY_KEYWORDS = (
+    ('📈 Investments', ('investment', 'invest', 'mutual fund', 'sip', 'elss', 'ppf', 'nps', 'equity', 'debt fund',
+                       'stock', 'shares', 'share market', 'demat', 'fixed deposit', 'fd')),
+    ('🛡️ Insurance', ('insurance', 'premium', 'lic', 'policy')),
+    ('🏦 EMI & Loans', ('emi', 'loan', 'credit card bill', 'mortgage')),
+    ('🍕 Food & Dining', ('food', 'dining', 'restaurant', 'grocery', 'groceries', 'swiggy', 'zomato', 'cafe', 'meal')),
+    ('🚗 Transportation', ('transportation', 'transport', 'fuel', 'petrol', 'diesel', 'uber', 'ola', 'metro', 'taxi',
+                          'cab', 'bus', 'parking', 'fastag')),
+    ('🏠 Housing & Rent', ('housing', 'rent', 'maintenance charge', 'society')),
+    ('🛒 Shopping', ('shopping', 'amazon', 'flipkart', 'myntra')),
+    ('⚡ Utilities', ('utility', 'utilities', 'electricity', 'water bill', 'gas', 'broadband', 'internet', 'recharge')),
+    ('🏥 Healthcare', ('healthcare', 'health', 'medical', 'medicine', 'pharmacy', 'hospital', 'doctor', 'clinic')),
+    ('🎬 Entertainment', ('entertainment', 'movie', 'netflix', 'spotify', 'streaming', 'concert')),
+    ('🎓 Education', ('education', 'school', 'college', 'tuition', 'course', 'books')),
+    ('✈️ Travel', ('travel', 'flight', 'hotel', 'vacation', 'holiday', 'trip')),
+    ('📱 Technology', ('technology', 'tech', 'gadget', 'electronics', 'software', 'mobile', 'laptop')),
+    ('👕 Clothing', ('clothing', 'clothes', 'apparel', 'fashion', 'shoes')),
+    ('🔧 Maintenance', ('maintenance', 'repair', 'service', 'plumber', 'electrician')),
+    ('🎁 Gifts & Donations', ('gifts', 'gift', 'donation', 'charity')),
+    ('💼 Salary', ('salary', 'payroll', 'wages')),
+    ('💰 Business', ('business',)),
+    ('🎯 Freelance', ('freelance', 'consulting')),
+    ('🏆 Bonus', ('bonus',)),
+    ('🔄 Rental', ('rental',)),
+)
+
+# Investment classes (projections.ASSET_ASSUMPTIONS names where they exist), most specific first
+INVESTMENT_KEYWORDS = (
+    ('ELSS', ('elss', 'tax saver fund', 'tax saving fund')),
+    ('PPF', ('ppf', 'public provident fund')),
+    ('NPS', ('nps', 'national pension')),
+    ('Gold', ('gold', 'sgb')),
+    ('Fixed Deposit', ('fixed deposit', 'fd', 'recurring deposit')),
+    ('Debt', ('debt', 'bond', 'liquid fund', 'gilt')),
+    ('Hybrid', ('hybrid', 'balanced')),
+    ('Equity', ('equity', 'stock', 'shares', 'share market', 'mutual fund', 'sip', 'index fund', 'etf', 'demat')),
+)
+
+INVESTMENT_CATEGORY = '📈 Investments'
+
+# Investment rows whose category and description name no class
+OTHER_INVESTMENTS = 'Other'
+
+CATEGORIES = tuple(name for name, _ in CATEGORY_KEYWORDS)
+INVESTMENT_CLASSES = tuple(name for name, _ in INVESTMENT_KEYWORDS) + (OTHER_INVESTMENTS,)
+
+_CACHE_SIZE = int(os.environ.get('ML_CLASSIFIER_CACHE', 65536))
+
+
+def normalize(text: str) -> str:
+    """Case-folded words of a category or description, without emoji or punctuation"""
+    return ' '.join(re.findall(r'[^\W_]+', str(text).casefold()))
+
+
+def _compile(table: Sequence[Tuple[str, Sequence[str]]]) -> 're.Pattern':
+    """One pattern with a named group per class; keywords match whole words, plurals included"""
+    return re.compile('|'.join(
+        f"(?P<c{index}>\\b(?:{'|'.join(re.escape(normalize(keyword)) for keyword in keywords)})s?\\b)"
+        for index, (_, keywords) in enumerate(table)
+    ))
+
+
+_CATEGORY_PATTERN = _compile(CATEGORY_KEYWORDS)
+_INVESTMENT_PATTERN = _compile(INVESTMENT_KEYWORDS)
+
+
+def _first_class(pattern: 're.Pattern', text: str) -> int:
+    """Index of the highest-priority class with a keyword in the text, -1 if none"""
+    return min((int(match.lastgroup[1:]) for match in pattern.finditer(normalize(text))), default=-1)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def category_code(raw: str) -> int:
+    """Index into CATEGORIES of a raw category name, -1 if unrecognized"""
+    return _first_class(_CATEGORY_PATTERN, raw)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def investment_code(raw: str) -> int:
+    """Index into INVESTMENT_CLASSES of a category or description, -1 if it names no investment"""
+    return _first_class(_INVESTMENT_PATTERN, raw)
+
+
+def canonical_category(raw: str) -> Optional[str]:
+    """Canonical category of a raw category name, None if unrecognized"""
+    code = category_code(raw)
+    return CATEGORIES[code] if code >= 0 else None
+
+
+def _distinct_codes(values: pd.Series, classify) -> np.ndarray:
+    """classify() of every row, called once per distinct value; missing values get -1"""
+    codes, uniques = pd.factorize(values, sort=False)
+    lookup = np.array([classify(value) for value in uniques] + [-1], dtype=np.int64)
+    return lookup[codes]  # factorize codes missing values as -1, the last lookup entry
+
+
+def category_codes(categories: pd.Series) -> np.ndarray:
+    """Index into CATEGORIES of every row (-1 unrecognized)"""
+    return _distinct_codes(categories, category_code)
+
+
+def investment_codes(transactions_df: pd.DataFrame) -> np.ndarray:
+    """
+    Index into INVESTMENT_CLASSES of every row, -1 for rows that are not investments.
+
+    A row is an investment when its category is the investment category or
+    names an instrument. The class comes from the category, else from the
+    description ('📈 Investments' / 'ELSS SIP' is ELSS), else OTHER_INVESTMENTS.
+    """
+    from_category = _distinct_codes(transactions_df['category'], investment_code)
+    is_investment = (from_category >= 0) | (category_codes(transactions_df['category']) == CATEGORIES.index(INVESTMENT_CATEGORY))
+    codes = np.where(is_investment, from_category, -1)
+
+    unnamed = is_investment & (from_category < 0)
+    if unnamed.any():
+        if 'description' in transactions_df:
+            from_description = _distinct_codes(transactions_df['description'][unnamed], investment_code)
+        else:
+            from_description = np.full(int(unnamed.sum()), -1)
+        codes[unnamed] = np.where(from_description >= 0, from_description, INVESTMENT_CLASSES.index(OTHER_INVESTMENTS))
+    return codes
+
+
+def classifier_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Memoization counters of this process, per table"""
+    return {
+        name: {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize, 'maxEntries': info.maxsize}
+        for name, info in (('categories', category_code.cache_info()), ('investments', investment_code.cache_info()))
+    }
@@ -0,0 +1,174 @@
+"""
+Combined dashboard: the Home and Tracker analyses from one transaction frame.
+
+The screens show expense analysis, spending patterns, tax savings and
+investment performance of the same transactions. Asked for separately, every
+call parses the list again, filters expenses again and repeats the
+(category, month) groupby and the trend fits. Here each section names the
+shared stages it is derived from; the planner orders the stages the requested
+sections need, dependencies first, and runs each once. Sections are then
+built from the shared results with the same routines as the individual
+endpoints, so every section matches its endpoint's response.
+
+Shared stages:
+    isExpense          expense row mask
+    expenses           expense rows
+    totals             income, expense and tax-deductible expense totals
+    categoryMonths     expense sum and count by (category, month)
+    categoryStats      expense sum, count and mean by category
+    trends             trend and forecast of every category's monthly sums
+    investmentClasses  investment class of every row
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis import (
+    category_month_stats,
+    dated_months,
+    expense_analysis_from_stats,
+    investment_performance,
+    monthly_spending,
+    spending_pattern_from_stats,
+    tax_savings_from_deductions,
+)
+from anomalies import flag_anomalies
+from categories import investment_codes
+from forecasting import spending_trends
+from metrics import stage
+from schemas import ExpenseAnalysisResponse
+
+SECTIONS = ('expenses', 'spendingPattern', 'taxSavings', 'investmentPerformance')
+
+
+def _is_expense(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> np.ndarray:
+    return (transactions_df['type'] == 'EXPENSE').to_numpy()
+
+
+def _expenses(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> pd.DataFrame:
+    return transactions_df[shared['isExpense']]
+
+
+def _totals(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> Dict[str, float]:
+    by_type = transactions_df['amount'].groupby(transactions_df['type'], observed=True).sum()
+    deductible = shared['isExpense'] & transactions_df['isTaxDeductible'].to_numpy(dtype=bool)
+    return {
+        'income': float(by_type.get('INCOME', 0)),
+        'expenses': float(by_type.get('EXPENSE', 0)),
+        'taxDeductible': float(transactions_df['amount'][deductible].sum()),
+    }
+
+
+def _category_months(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    return category_month_stats(shared['expenses'])
+
+
+def _category_stats(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> pd.DataFrame:
+    return shared['categoryMonths'][1]
+
+
+def _trends(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> pd.DataFrame:
+    return spending_trends(dated_months(shared['categoryMonths'][0])['sum'])
+
+
+def _investment_classes(transactions_df: pd.DataFrame, shared: Dict[str, Any]) -> np.ndarray:
+    return investment_codes(transactions_df)
+
+
+# Shared stage: (stages it reads, function of the frame and the results so far)
+STAGES: Dict[str, Tuple[Tuple[str, ...], Callable[[pd.DataFrame, Dict[str, Any]], Any]]] = {
+    'isExpense': ((), _is_expense),
+    'expenses': (('isExpense',), _expenses),
+    'totals': (('isExpense',), _totals),
+    'categoryMonths': (('expenses',), _category_months),
+    'categoryStats': (('categoryMonths',), _category_stats),
+    'trends': (('categoryMonths',), _trends),
+    'investmentClasses': ((), _investment_classes),
+}
+
+# Section: shared stages it is built from
+SECTION_STAGES = {
+    'expenses': ('expenses', 'totals', 'categoryStats', 'trends'),
+    'spendingPattern': ('categoryMonths', 'categoryStats', 'trends'),
+    'taxSavings': ('totals',),
+    'investmentPerformance': ('isExpense', 'investmentClasses'),
+}
+
+
+def plan(sections: Sequence[str]) -> List[str]:
+    """Shared stages the sections need, each once, dependencies first"""
+    ordered: List[str] = []
+
+    def visit(name: str) -> None:
+        if name not in ordered:
+            for dependency in STAGES[name][0]:
+                visit(dependency)
+            ordered.append(name)
+
+    for section in sections:
+        for name in SECTION_STAGES[section]:
+            visit(name)
+    return ordered
+
+
+def _expense_section(shared: Dict[str, Any], anomaly_method: str) -> ExpenseAnalysisResponse:
+    """analyze_expenses from the shared aggregates"""
+    totals = shared['totals']
+    # analyze_expenses lists categories in sorted order, the spending pattern in first-seen order
+    category_stats = shared['categoryStats'].sort_index()
+
+    with stage('anomalies'):
+        anomalies = flag_anomalies(shared['expenses'], anomaly_method)[1]
+
+    return expense_analysis_from_stats(
+        zip(category_stats.index, category_stats['sum'].tolist(), category_stats['count'].tolist()),
+        totals['expenses'], totals['income'], anomalies, shared['trends']['trend'].to_dict()
+    )
+
+
+def _spending_pattern_section(shared: Dict[str, Any]) -> dict:
+    """analyze_spending_pattern from the shared aggregates"""
+    dated = dated_months(shared['categoryMonths'][0])['sum']
+    result = spending_pattern_from_stats(shared['categoryStats'][['sum', 'count']], dated, shared['trends'])
+    result['monthlySpending'] = monthly_spending(dated)
+    return result
+
+
+def build_dashboard(
+    transactions_df: pd.DataFrame,
+    sections: Sequence[str] = SECTIONS,
+    anomaly_method: str = 'median',
+    annual_income: Optional[float] = None,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+    monthly_investment_capacity: Optional[float] = None,
+) -> Dict[str, Any]:
+    """The requested sections, keyed by name; each equals its endpoint's response for the same transactions"""
+    shared: Dict[str, Any] = {}
+    for name in plan(sections):
+        with stage(name):
+            shared[name] = STAGES[name][1](transactions_df, shared)
+
+    result: Dict[str, Any] = {}
+    if 'expenses' in sections:
+        if transactions_df.empty:
+            result['expenses'] = ExpenseAnalysisResponse(
+                insights=[], totalMonthlySpending=0, savingsRate=0, budgetRecommendations={}, anomalies=[]
+            )
+        else:
+            result['expenses'] = _expense_section(shared, anomaly_method)
+    if 'spendingPattern' in sections:
+        result['spendingPattern'] = _spending_pattern_section(shared)
+    if 'taxSavings' in sections:
+        result['taxSavings'] = tax_savings_from_deductions(
+            shared['totals']['taxDeductible'], annual_income, tax_regime, assessment_year
+        )
+    if 'investmentPerformance' in sections:
+        is_expense = shared['isExpense']
+        result['investmentPerformance'] = investment_performance(
+            shared['investmentClasses'][is_expense], transactions_df['amount'].to_numpy(dtype=float)[is_expense],
+            len(transactions_df), monthly_investment_capacity
+        )
+    return result
@@ -0,0 +1,150 @@
+"""
+Executor subsystem for CPU-bound analysis.
+
+Pandas work never runs on the event loop. Small payloads go to a thread pool,
+large ones to a process pool so they cannot hold the GIL against the rest of
+the worker. Every task gets a timeout.
+
+Configuration (environment variables):
+    ML_PROCESS_WORKERS      process pool size, 0 disables it (default: available cores / ML_WORKERS)
+    ML_WORKERS              uvicorn worker processes on the host sharing the cores (default: WEB_CONCURRENCY or 1)
+    ML_THREAD_WORKERS       thread pool size (default: available cores + 4, max 32)
+    ML_HEAVY_ROWS           payload rows at which work moves to the process pool (default: 20000)
+    ML_TASK_TIMEOUT         per-task timeout in seconds (default: 30)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+from metrics import collect_stages, current_trace
+
+
+class AnalysisTimeout(Exception):
+    """Raised when an analysis task exceeds its time budget"""
+
+
+def available_cores() -> int:
+    """Cores this process may run on (respects CPU affinity / container pinning)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def worker_processes() -> int:
+    """uvicorn worker processes on this host, each with its own pools (set by run.py; uvicorn reads WEB_CONCURRENCY)"""
+    return max(1, int(os.environ.get('ML_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1))
+
+
+class AnalysisExecutor:
+    """Routes analysis callables to a thread or process pool by payload size"""
+
+    def __init__(
+        self,
+        process_workers: Optional[int] = None,
+        thread_workers: Optional[int] = None,
+        heavy_rows: int = 20000,
+        timeout: float = 30.0,
+        workers: int = 1,
+    ):
+        cores = available_cores()
+        # Every uvicorn worker has its own process pool, so they split the cores between them
+        self.process_workers = max(1, cores // workers) if process_workers is None else process_workers
+        self.thread_workers = thread_workers or min(32, cores + 4)
+        self.heavy_rows = heavy_rows
+        self.timeout = timeout
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'AnalysisExecutor':
+        process_workers = os.environ.get('ML_PROCESS_WORKERS')
+        thread_workers = os.environ.get('ML_THREAD_WORKERS')
+        return cls(
+            process_workers=int(process_workers) if process_workers else None,
+            thread_workers=int(thread_workers) if thread_workers else None,
+            heavy_rows=int(os.environ.get('ML_HEAVY_ROWS', 20000)),
+            timeout=float(os.environ.get('ML_TASK_TIMEOUT', 30)),
+            workers=worker_processes(),
+        )
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(
+                    max_workers=self.thread_workers, thread_name_prefix='analysis'
+                )
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # forkserver avoids forking a process that already runs the event loop and pool threads
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers, mp_context=context)
+            return self._processes
+
+    def _reset_process_pool(self) -> None:
+        with self._lock:
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = None
+
+    def pool_for(self, rows: int, local: bool = False) -> Executor:
+        """Executor a task of the given payload size should run on; local tasks never leave the process"""
+        if not local and self.process_workers > 0 and rows >= self.heavy_rows:
+            return self._process_pool()
+        return self._thread_pool()
+
+    def start(self) -> None:
+        """Create the pools eagerly so the first heavy request does not pay for worker startup"""
+        self._thread_pool()
+        if self.process_workers > 0:
+            self._process_pool()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._threads is not None:
+                self._threads.shutdown(wait=False, cancel_futures=True)
+                self._threads = None
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = None
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        rows: int = 0,
+        timeout: Optional[float] = None,
+        local: bool = False,
+    ) -> Any:
+        """Run fn(*args) off the event loop, raising AnalysisTimeout past the budget"""
+        loop = asyncio.get_running_loop()
+        pool = self.pool_for(rows, local)
+        budget = self.timeout if timeout is None else timeout
+        trace = current_trace()
+        try:
+            if trace is None:
+                return await asyncio.wait_for(loop.run_in_executor(pool, partial(fn, *args)), budget)
+            # Stages recorded inside the worker come back with the result
+            result, stages = await asyncio.wait_for(
+                loop.run_in_executor(pool, partial(collect_stages, fn, time.time(), *args)), budget
+            )
+            trace.stages.extend(stages)
+            return result
+        except asyncio.TimeoutError:
+            # The request is released; a task already running in a pool finishes and its result is dropped
+            raise AnalysisTimeout(f"Analysis did not finish within {budget:g}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool so later requests recover
+            self._reset_process_pool()
+            raise
@@ -0,0 +1,241 @@
+"""
+Monthly time-series engine for spending trends and forecasts.
+
+Monthly sums are laid out as a (series x month) matrix with zero-filled
+months, one row per category (or per user and category), and every statistic
+is computed for all rows at once:
+
+- trend: least-squares slope per row with its t statistic, significant at
+  the two-sided 95% level;
+- forecast: next-month simple exponential smoothing, with the smoothing
+  constant picked per row from a grid by one-step-ahead squared error, and
+  an interval from the spread of those one-step errors.
+
+The only Python loop is over months; each step is one array operation
+across every series and every candidate smoothing constant.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Smoothing constants tried for every series
+ALPHA_GRID = np.linspace(0.1, 0.9, 9)
+
+# z for the forecast interval (95%)
+INTERVAL_Z = 1.96
+
+# Two-sided 95% critical values of Student's t for 1..30 degrees of freedom; the normal value beyond
+_T_CRITICAL = np.array([
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+])
+_Z_CRITICAL = 1.96
+
+# Unparsed dates whose format is guessed; each format found is then tried on all of them in one exact pass
+FORMAT_GUESSES = 20
+
+# Trailing UTC offset (or Z) after a time of day; dropped so the wall-clock time is kept
+_UTC_OFFSET = r'(\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?)\s*(?:Z|UTC|GMT|[+-]\d{2}(?::?\d{2})?)$'
+
+
+def _factorize(index: pd.Index, levels: Optional[int] = None):
+    """(codes, uniques) in first-seen order; MultiIndex keys are combined from level codes without building tuples"""
+    if not isinstance(index, pd.MultiIndex):
+        return pd.factorize(index, sort=False)
+    levels = index.nlevels if levels is None else levels
+    combined = np.ravel_multi_index(
+        [np.asarray(codes) + 1 for codes in index.codes[:levels]],  # -1 (missing) becomes 0
+        [len(level) + 1 for level in index.levels[:levels]],
+    )
+    codes, _ = pd.factorize(combined, sort=False)
+    first_rows = np.unique(codes, return_index=True)[1]
+    return codes, index[first_rows].droplevel(list(range(levels, index.nlevels))) if levels < index.nlevels else index[first_rows]
+
+
+def monthly_matrix(monthly: pd.Series, owner_levels: int = 0):
+    """
+    (keys, values, observed) from sums indexed by (*keys, month).
+
+    Months are anything NumPy reads as datetime64[M] ('YYYY-MM' strings,
+    timestamps); undated entries are dropped. Columns run from the earliest
+    to the latest month overall. The first `owner_levels` key levels name the
+    owner of a series (the user): a series is observed from its owner's first
+    month to its owner's last, so a user who joined recently is not read as
+    having spent nothing before, nor a user whose history ends earlier as
+    having spent nothing since. Each owner's series are then exactly what
+    they would be for that owner alone.
+    """
+    months = np.asarray(monthly.index.get_level_values(-1), dtype='datetime64[M]')
+    dated = ~np.isnat(months)
+    monthly, months = monthly[dated], months[dated]
+    if monthly.empty:
+        return monthly.index.droplevel(-1).unique(), np.zeros((0, 0)), np.zeros((0, 0), dtype=bool)
+
+    first = months.min()
+    columns = (months - first).astype(np.int64)
+    n_months = int(columns.max()) + 1
+
+    key_index = monthly.index.droplevel(-1)
+    rows, keys = _factorize(key_index)
+    values = np.zeros((len(keys), n_months))
+    np.add.at(values, (rows, columns), monthly.to_numpy(dtype=float))
+
+    if owner_levels:
+        owners = _factorize(key_index, owner_levels)[0] if key_index.nlevels > owner_levels else rows
+        owner_months = pd.Series(columns).groupby(owners).agg(['min', 'max'])
+        row_owner = np.zeros(len(keys), dtype=np.int64)
+        row_owner[rows] = owners
+        starts = owner_months['min'].to_numpy()[row_owner]
+        ends = owner_months['max'].to_numpy()[row_owner]
+    else:
+        starts = np.zeros(len(keys), dtype=np.int64)
+        ends = np.full(len(keys), n_months - 1, dtype=np.int64)
+    month = np.arange(n_months)
+    observed = (month >= starts[:, None]) & (month <= ends[:, None])
+    return keys, values, observed
+
+
+def trend_stats(values: np.ndarray, observed: np.ndarray) -> dict:
+    """Least-squares slope per row (amount per month), its t statistic and 95% significance"""
+    weights = observed.astype(float)
+    n = weights.sum(axis=1)
+    t = np.arange(values.shape[1], dtype=float)
+    safe_n = np.maximum(n, 1.0)
+
+    t_centered = (t - (weights * t).sum(axis=1, keepdims=True) / safe_n[:, None]) * weights
+    y_centered = (values - (weights * values).sum(axis=1, keepdims=True) / safe_n[:, None]) * weights
+    sxx = (t_centered ** 2).sum(axis=1)
+    sxy = (t_centered * y_centered).sum(axis=1)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+
+    dof = n - 2
+    sse = ((y_centered - slope[:, None] * t_centered) ** 2).sum(axis=1)
+    variance = np.divide(sse, dof * sxx, out=np.zeros_like(sse), where=(dof > 0) & (sxx > 0))
+    se = np.sqrt(variance)
+    # A perfectly linear series has no residual error: any non-zero slope is significant
+    t_stat = np.divide(slope, se, out=np.where(slope != 0, np.copysign(np.inf, slope), 0.0), where=se > 0)
+    t_stat[dof <= 0] = 0.0
+
+    critical = np.where(dof > len(_T_CRITICAL), _Z_CRITICAL, _T_CRITICAL[np.clip(dof, 1, len(_T_CRITICAL)).astype(int) - 1])
+    return {
+        'slope': slope,
+        't_stat': t_stat,
+        'significant': (dof > 0) & (np.abs(t_stat) > critical),
+        'months': n.astype(np.int64),
+    }
+
+
+def exponential_smoothing(values: np.ndarray, observed: np.ndarray, alphas: np.ndarray = ALPHA_GRID) -> dict:
+    """Next-month forecast per row with a 95% interval, smoothing constant chosen per row from `alphas`"""
+    n_series, n_months = values.shape
+    alpha = np.asarray(alphas, dtype=float)[:, None]
+    level = np.zeros((alpha.shape[0], n_series))
+    sse = np.zeros_like(level)
+    errors = np.zeros(n_series)
+    started = np.zeros(n_series, dtype=bool)
+
+    for month in range(n_months):
+        y = values[:, month]
+        valid = observed[:, month]
+        ongoing = started & valid
+        error = y - level
+        sse += np.where(ongoing, error ** 2, 0.0)
+        errors += ongoing
+        level = np.where(ongoing, level + alpha * error, np.where(valid & ~started, y, level))
+        started |= valid
+
+    best = np.argmin(sse, axis=0)
+    rows = np.arange(n_series)
+    forecast = level[best, rows]
+    # A single observed month gives no error estimate; its interval is as wide as the value itself
+    sigma = np.where(errors > 0, np.sqrt(sse[best, rows] / np.maximum(errors, 1.0)), np.abs(forecast))
+    return {
+        'forecast': forecast,
+        'lower': np.maximum(0.0, forecast - INTERVAL_Z * sigma),
+        'upper': forecast + INTERVAL_Z * sigma,
+        'alpha': np.asarray(alphas, dtype=float)[best],
+    }
+
+
+def spending_trends(monthly: pd.Series, owner_levels: int = 0) -> pd.DataFrame:
+    """
+    Trend and forecast for every series in sums indexed by (*keys, month).
+
+    One row per key with slope, tStat, significant, trend ('INCREASING',
+    'DECREASING' or 'STABLE'), forecast, lower, upper and months observed.
+    """
+    keys, values, observed = monthly_matrix(monthly, owner_levels)
+    trend = trend_stats(values, observed)
+    smoothed = exponential_smoothing(values, observed)
+    direction = np.where(
+        trend['significant'],
+        np.where(trend['slope'] > 0, 'INCREASING', 'DECREASING'),
+        'STABLE',
+    )
+    return pd.DataFrame(
+        {
+            'slope': trend['slope'],
+            'tStat': trend['t_stat'],
+            'significant': trend['significant'],
+            'trend': direction,
+            'forecast': smoothed['forecast'],
+            'lower': smoothed['lower'],
+            'upper': smoothed['upper'],
+            'months': trend['months'],
+        },
+        index=keys,
+    )
+
+
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """
+    Transaction dates as naive wall-clock datetimes, NaT where unparseable.
+
+    Each distinct string is parsed once. A UTC offset is dropped rather than
+    applied, so a transaction falls in the month its owner saw on the clock.
+    ISO 8601 is parsed in one vectorized pass. For the rest, day-first
+    formats are guessed from a few of them and each is tried on all of them
+    in one exact pass; whatever is left gets one format='mixed' pass.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.tz_localize(None) if dates.dt.tz is not None else dates
+
+    codes, uniques = pd.factorize(dates)
+    text = pd.Series(uniques, dtype=object).astype(str).str.replace(_UTC_OFFSET, r'\1', regex=True)
+    parsed = pd.to_datetime(text, errors='coerce', format='ISO8601')
+    failed = parsed.isna().to_numpy()
+    if failed.any():
+        guesses = (guess_datetime_format(value, dayfirst=True) for value in text[failed].iloc[:FORMAT_GUESSES])
+        for date_format in [*dict.fromkeys(filter(None, guesses)), 'mixed']:
+            parsed[failed] = _parse_naive(text[failed], date_format)
+            failed = parsed.isna().to_numpy()
+            if not failed.any():
+                break
+
+    # Code -1 (missing) takes the NaT appended at the end
+    values = np.append(parsed.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(values[codes], index=dates.index)
+
+
+def _parse_naive(text: pd.Series, date_format: str) -> pd.Series:
+    """One to_datetime pass, day first; values that still carry a time zone are read as wall-clock time"""
+    try:
+        parsed = pd.to_datetime(text, errors='coerce', format=date_format, dayfirst=True)
+    except ValueError:
+        # Mixed time-zone names in one pass; rare enough to take one at a time
+        parsed = pd.Series([pd.to_datetime(value, errors='coerce', dayfirst=True) for value in text], index=text.index)
+        return parsed.map(lambda value: value.tz_localize(None) if value is not pd.NaT and value.tzinfo else value)
+    return parsed.dt.tz_localize(None) if getattr(parsed.dt, 'tz', None) is not None else parsed
+
+
+def expense_months(expenses_df: pd.DataFrame) -> Optional[np.ndarray]:
+    """Month of every expense: the precomputed 'month' column of streamed uploads, else parsed from 'date'"""
+    if 'month' in expenses_df:
+        return expenses_df['month'].to_numpy().astype('datetime64[M]')
+    if 'date' in expenses_df:
+        return parse_dates(expenses_df['date']).to_numpy().astype('datetime64[M]')
+    return None
@@ -0,0 +1,457 @@
+"""
+Columnar transaction ingestion.
+
+Request bodies are decoded once and turned straight into a typed DataFrame,
+skipping the per-row Transaction model and dict round-trip. With pyarrow
+installed, JSON bodies are decoded directly into typed columns (no Python
+object per row); bodies that do not fit the transaction schema take the
+row-wise path, where validation runs on whole columns and reports errors in
+the same shape FastAPI uses for 422s. Large bodies, and every chunk of a
+streamed upload, are decoded and parsed in a thread rather than on the event
+loop.
+"""
+
+import asyncio
+import json
+import tempfile
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from pandas.api.types import union_categoricals
+from pydantic import BaseModel, ValidationError
+
+from metrics import add_rows, stage
+
+# Column name -> (required, kind); mirrors the Transaction model in schemas.py
+TRANSACTION_FIELDS: Dict[str, Tuple[bool, str]] = {
+    'id': (False, 'str'),
+    'amount': (True, 'float'),
+    'category': (True, 'category'),
+    'type': (True, 'category'),
+    'description': (True, 'str'),
+    'date': (True, 'str'),
+    'isTaxDeductible': (False, 'bool'),
+    'taxSection': (False, 'str'),
+}
+
+# Batch payloads carry one flat list of transactions tagged with their owner
+BATCH_TRANSACTION_FIELDS: Dict[str, Tuple[bool, str]] = {
+    'userId': (True, 'category'),
+    **TRANSACTION_FIELDS,
+}
+
+# Rows decoded per frame when reading NDJSON or Arrow streams
+NDJSON_CHUNK_ROWS = 50000
+
+# Streaming upload formats by content type
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+ARROW_STREAM_CONTENT_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Arrow bodies are spooled before reading; past this size the spool moves to disk
+ARROW_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Bodies from this size on are decoded and parsed in a thread, so the event loop keeps serving other requests
+OFFLOAD_BYTES = 256 * 1024
+
+# Arrow type names of the columnar JSON decode, by field kind
+_ARROW_KINDS = {'float': 'float64', 'bool': 'bool_', 'category': 'string', 'str': 'string'}
+
+# Cap on reported errors so a bad 100k-row payload does not produce a 100k-entry response
+MAX_REPORTED_ERRORS = 50
+
+# Inferred dtypes that can be converted without a per-row check
+_NUMERIC_KINDS = ('floating', 'integer', 'mixed-integer-float', 'empty')
+
+
+class TransactionValidationError(ValueError):
+    """Raised when a transaction payload fails bulk validation"""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} validation error(s) in transactions")
+        self.errors = errors
+
+
+def _column_errors(rows: np.ndarray, loc: tuple, field: str, msg: str, error_type: str, start: int = 0) -> List[Dict[str, Any]]:
+    return [
+        {'loc': [*loc, start + int(row), field], 'msg': msg, 'type': error_type}
+        for row in rows[:MAX_REPORTED_ERRORS]
+    ]
+
+
+def _of_type(values: pd.Series, python_type: type) -> np.ndarray:
+    return values.map(type).to_numpy() == python_type
+
+
+def empty_transactions_frame() -> pd.DataFrame:
+    """Zero-row frame with the same columns and dtypes as transactions_frame"""
+    return transactions_frame([])
+
+
+def transactions_frame(
+    records: Any,
+    loc: tuple = ('body',),
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    start: int = 0,
+) -> pd.DataFrame:
+    """Build a validated, typed transaction frame from decoded JSON records"""
+    if not isinstance(records, list):
+        raise TransactionValidationError([{'loc': list(loc), 'msg': 'Input should be a valid list', 'type': 'list_type'}])
+
+    bad_rows = [i for i, record in enumerate(records) if type(record) is not dict]
+    if bad_rows:
+        raise TransactionValidationError([
+            {'loc': [*loc, start + i], 'msg': 'Input should be a valid dictionary', 'type': 'dict_type'}
+            for i in bad_rows[:MAX_REPORTED_ERRORS]
+        ])
+
+    raw = pd.DataFrame.from_records(records, columns=list(fields))
+
+    errors: List[Dict[str, Any]] = []
+    columns: Dict[str, Any] = {}
+    for field, (required, kind) in fields.items():
+        values = raw[field]
+        missing = values.isna().to_numpy()
+        if required and missing.any():
+            errors.extend(_column_errors(np.flatnonzero(missing), loc, field, 'Field required', 'missing', start))
+
+        # Whole-column type inference first; per-row checks only run for bad columns
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        if kind == 'float':
+            if inferred in _NUMERIC_KINDS:
+                numeric = values.astype(float)
+            else:
+                numeric = pd.to_numeric(values.where(~_of_type(values, bool)), errors='coerce')
+                invalid = numeric.isna().to_numpy() & ~missing
+                if invalid.any():
+                    errors.extend(_column_errors(np.flatnonzero(invalid), loc, field, 'Input should be a valid number', 'float_parsing', start))
+            columns[field] = numeric.to_numpy(dtype=float)
+        elif kind == 'bool':
+            if inferred not in ('boolean', 'empty'):
+                invalid = ~missing & ~_of_type(values, bool)
+                if invalid.any():
+                    errors.extend(_column_errors(np.flatnonzero(invalid), loc, field, 'Input should be a valid boolean', 'bool_type', start))
+            columns[field] = values.fillna(False).to_numpy(dtype=bool)
+        else:
+            if inferred not in ('string', 'empty'):
+                invalid = ~missing & ~_of_type(values, str)
+                if invalid.any():
+                    errors.extend(_column_errors(np.flatnonzero(invalid), loc, field, 'Input should be a valid string', 'string_type', start))
+            columns[field] = pd.Categorical(values) if kind == 'category' else values.to_numpy(dtype=object)
+
+    if errors:
+        raise TransactionValidationError(errors[:MAX_REPORTED_ERRORS])
+
+    return pd.DataFrame(columns)
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate ingested chunks, keeping categorical columns categorical"""
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            columns[column] = union_categoricals([frame[column] for frame in frames], sort_categories=True)
+        else:
+            columns[column] = np.concatenate([frame[column].to_numpy() for frame in frames])
+    return pd.DataFrame(columns)
+
+
+def _has_object_list(arrow_type: Any) -> bool:
+    """Lists of objects decode with every key of every element, so they do not round-trip exactly"""
+    import pyarrow as pa
+
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        return pa.types.is_struct(arrow_type.value_type) or _has_object_list(arrow_type.value_type)
+    if pa.types.is_struct(arrow_type):
+        return any(_has_object_list(field.type) for field in arrow_type)
+    return False
+
+
+def decode_columnar(
+    body: bytes,
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    envelope: bool = True,
+) -> Optional[Tuple[Dict[str, Any], pd.DataFrame]]:
+    """
+    (other envelope fields, transaction frame) decoded straight into columns by pyarrow's JSON reader.
+
+    The body is a {..., transactions: [...]} envelope, or a bare list of
+    transactions when `envelope` is false. None when pyarrow is missing or the
+    body does not decode cleanly against the transaction schema (invalid JSON,
+    a value of the wrong type, a missing required field, ...): those bodies go
+    through decode_json and transactions_frame, which produce the 422 details.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.json as pa_json
+    except ImportError:
+        return None
+
+    if not envelope:
+        body = b'{"transactions":' + body + b'}'
+    record_type = pa.struct([(field, getattr(pa, _ARROW_KINDS[kind])()) for field, (_, kind) in fields.items()])
+    try:
+        table = pa_json.read_json(
+            pa.BufferReader(body),
+            read_options=pa_json.ReadOptions(use_threads=False, block_size=len(body) + 1),
+            parse_options=pa_json.ParseOptions(
+                explicit_schema=pa.schema([('transactions', pa.list_(record_type))]),
+                unexpected_field_behavior='infer',
+                newlines_in_values=True,
+            ),
+        )
+    except pa.ArrowException:
+        return None
+
+    others = [name for name in table.column_names if name != 'transactions']
+    if table.num_rows != 1 or (others and not envelope) or any(_has_object_list(table.schema.field(name).type) for name in others):
+        return None
+    transactions = table.column('transactions').combine_chunks()
+    if transactions.null_count:
+        return None
+    records = transactions.flatten()
+    if records.null_count:
+        return None
+
+    columns: Dict[str, Any] = {}
+    for (field, (required, kind)), values in zip(fields.items(), records.flatten()):
+        if required and values.null_count:
+            return None
+        if kind == 'float':
+            columns[field] = values.to_numpy(zero_copy_only=False)
+        elif kind == 'bool':
+            columns[field] = values.fill_null(False).to_numpy(zero_copy_only=False)
+        else:
+            objects = values.to_numpy(zero_copy_only=False)
+            columns[field] = pd.Categorical(objects) if kind == 'category' else objects
+    return table.select(others).to_pylist()[0], pd.DataFrame(columns)
+
+
+def decode_json(body: bytes) -> Any:
+    """Decode a raw request body"""
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=[{'loc': ['body'], 'msg': f'JSON decode error: {e}', 'type': 'json_invalid'}]
+        )
+
+
+def parse_transactions(
+    payload: Any,
+    loc: tuple = ('body',),
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    start: int = 0,
+) -> pd.DataFrame:
+    """Columnar frame for a payload of transactions, or a 422"""
+    try:
+        with stage('frame'):
+            frame = transactions_frame(payload, loc, fields, start)
+    except TransactionValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
+    add_rows(len(frame))
+    return frame
+
+
+def validate_params(envelope: Dict[str, Any], params_model: Type[BaseModel], loc: tuple = ('body',)) -> BaseModel:
+    """The non-transaction fields of an envelope as params_model, or a 422"""
+    try:
+        with stage('validate'):
+            return params_model.model_validate(envelope)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=jsonable_encoder([{**error, 'loc': [*loc, *error['loc']]} for error in e.errors(include_url=False)])
+        )
+
+
+def parse_envelope(
+    payload: Any,
+    params_model: Type[BaseModel],
+    loc: tuple = ('body',),
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+) -> Tuple[BaseModel, pd.DataFrame]:
+    """Split a {..., transactions: [...]} body into validated params and a columnar frame"""
+    if not isinstance(payload, dict):
+        raise HTTPException(
+            status_code=422,
+            detail=[{'loc': list(loc), 'msg': 'Input should be a valid dictionary', 'type': 'dict_type'}]
+        )
+
+    params = validate_params({key: value for key, value in payload.items() if key != 'transactions'}, params_model, loc)
+
+    if 'transactions' not in payload:
+        raise HTTPException(
+            status_code=422,
+            detail=[{'loc': [*loc, 'transactions'], 'msg': 'Field required', 'type': 'missing'}]
+        )
+
+    return params, parse_transactions(payload['transactions'], (*loc, 'transactions'), fields)
+
+
+def _decoded(body: bytes) -> Any:
+    with stage('decode'):
+        return decode_json(body)
+
+
+def _envelope(body: bytes, params_model: Type[BaseModel], fields: Dict[str, Tuple[bool, str]]) -> Tuple[BaseModel, pd.DataFrame]:
+    with stage('decode'):
+        decoded = decode_columnar(body, fields)
+    if decoded is None:
+        return parse_envelope(_decoded(body), params_model, fields=fields)
+    envelope, frame = decoded
+    params = validate_params(envelope, params_model)
+    add_rows(len(frame))
+    return params, frame
+
+
+def _transactions(body: bytes) -> pd.DataFrame:
+    with stage('decode'):
+        decoded = decode_columnar(body, envelope=False)
+    if decoded is None:
+        return parse_transactions(_decoded(body))
+    add_rows(len(decoded[1]))
+    return decoded[1]
+
+
+async def _read_body(request: Request) -> bytes:
+    with stage('read'):
+        return await request.body()
+
+
+async def _off_loop(body: bytes, fn: Callable[[], Any]) -> Any:
+    """fn() in a thread when the body is large enough to stall the event loop for other requests"""
+    if len(body) < OFFLOAD_BYTES:
+        return fn()
+    return await asyncio.to_thread(fn)
+
+
+async def read_json(request: Request) -> Any:
+    """Read and decode the request body without building per-row models"""
+    body = await _read_body(request)
+    return await _off_loop(body, lambda: _decoded(body))
+
+
+async def read_envelope(
+    request: Request,
+    params_model: Type[BaseModel],
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+) -> Tuple[BaseModel, pd.DataFrame]:
+    """Read a {..., transactions: [...]} body into validated params and a columnar frame (see parse_envelope)"""
+    body = await _read_body(request)
+    return await _off_loop(body, lambda: _envelope(body, params_model, fields))
+
+
+async def transactions_body(request: Request) -> pd.DataFrame:
+    """FastAPI dependency: request body is a bare list of transactions"""
+    body = await _read_body(request)
+    return await _off_loop(body, lambda: _transactions(body))
+
+
+def stream_format(request: Request) -> Optional[str]:
+    """'ndjson' or 'arrow' for streaming uploads, None for a plain JSON body"""
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith(NDJSON_CONTENT_TYPE):
+        return 'ndjson'
+    if content_type.startswith(ARROW_STREAM_CONTENT_TYPE):
+        return 'arrow'
+    return None
+
+
+def _ndjson_frame(lines: List[bytes], fields: Dict[str, Tuple[bool, str]], start: int) -> pd.DataFrame:
+    with stage('decode'):
+        records = [decode_json(line) for line in lines]
+    return parse_transactions(records, ('body',), fields, start)
+
+
+def _arrow_frame(batch: Any, offset: int, chunk_rows: int, fields: Dict[str, Tuple[bool, str]], start: int) -> pd.DataFrame:
+    with stage('decode'):
+        records = batch.slice(offset, chunk_rows).to_pylist()
+    return parse_transactions(records, ('body',), fields, start)
+
+
+def _next_batch(reader: Any) -> Any:
+    """The reader's next record batch, None at the end of the stream"""
+    try:
+        return reader.read_next_batch()
+    except StopIteration:
+        return None
+
+
+async def iter_ndjson_frames(
+    request: Request,
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    chunk_rows: int = NDJSON_CHUNK_ROWS,
+) -> AsyncIterator[pd.DataFrame]:
+    """Validated frames of at most chunk_rows records from a newline-delimited JSON stream, decoded in a thread"""
+    lines: List[bytes] = []
+    buffer = b''
+    start = 0
+    emitted = False
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b'\n')
+        lines.extend(line for line in complete if line.strip())
+        while len(lines) >= chunk_rows:
+            yield await asyncio.to_thread(_ndjson_frame, lines[:chunk_rows], fields, start)
+            start += chunk_rows
+            lines = lines[chunk_rows:]
+            emitted = True
+
+    if buffer.strip():
+        lines.append(buffer)
+    if lines or not emitted:
+        yield await asyncio.to_thread(_ndjson_frame, lines, fields, start)
+
+
+async def iter_arrow_frames(
+    request: Request,
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    chunk_rows: int = NDJSON_CHUNK_ROWS,
+) -> AsyncIterator[pd.DataFrame]:
+    """Validated frames of at most chunk_rows records from an Arrow IPC stream, decoded in a thread"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow IPC uploads need pyarrow installed on the server")
+
+    with tempfile.SpooledTemporaryFile(max_size=ARROW_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+
+        try:
+            reader = await asyncio.to_thread(pa.ipc.open_stream, spool)
+        except pa.ArrowInvalid as e:
+            raise HTTPException(
+                status_code=422,
+                detail=[{'loc': ['body'], 'msg': f'Arrow IPC decode error: {e}', 'type': 'arrow_invalid'}]
+            )
+
+        start = 0
+        emitted = False
+        while (batch := await asyncio.to_thread(_next_batch, reader)) is not None:
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield await asyncio.to_thread(_arrow_frame, batch, offset, chunk_rows, fields, start)
+                start += min(chunk_rows, batch.num_rows - offset)
+                emitted = True
+        if not emitted:
+            yield parse_transactions([], ('body',), fields)
+
+
+def iter_transaction_frames(
+    request: Request,
+    fields: Dict[str, Tuple[bool, str]] = TRANSACTION_FIELDS,
+    chunk_rows: int = NDJSON_CHUNK_ROWS,
+) -> AsyncIterator[pd.DataFrame]:
+    """Chunked frames from an NDJSON or Arrow IPC upload"""
+    if stream_format(request) == 'arrow':
+        return iter_arrow_frames(request, fields, chunk_rows)
+    return iter_ndjson_frames(request, fields, chunk_rows)
+
@@ -1,21 +1,62 @@
-from fastapi import FastAPI, HTTPException, Depends, Security
+from fastapi import FastAPI, HTTPException, Depends, Header, Security, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-import numpy as np
+from fastapi.responses import Response
 import pandas as pd
-from datetime import datetime, timedelta
-import json
-import os
-import joblib
-from sklearn.ensemble import RandomForestRegressor, IsolationForest
-from sklearn.preprocessing import LabelEncoder
+from typing import Callable, Optional
+from datetime import datetime
+import logging
 import warnings
 warnings.filterwarnings('ignore')
 
+import analysis
+from admission import AdmissionController, AdmissionMiddleware
+from aggregates import INCREMENTAL_ANOMALY_METHODS, AggregateStore
+from anomalies import ANOMALY_METHODS
+from anomaly_model import ANOMALY_MODEL_NAME, AnomalyRetrainer
+from auth import AuthNotConfiguredError, InvalidTokenError, TokenVerifier
+from cache import ResultCache
+from dashboard import SECTIONS as DASHBOARD_SECTIONS, build_dashboard
+from executors import AnalysisExecutor, AnalysisTimeout
+from ingestion import (
+    BATCH_TRANSACTION_FIELDS,
+    iter_transaction_frames,
+    read_envelope,
+    stream_format,
+    transactions_body,
+)
+from metrics import PROMETHEUS_CONTENT_TYPE, LoopMonitor, MetricsMiddleware, registry as metrics_registry, stage
+from model_registry import InvalidVersionError, ModelNotFoundError, default_registry
+from profiling import SamplingProfiler
+from responses import respond
+from schemas import (
+    AggregateUpdateParams,
+    BatchExpenseAnalysisParams,
+    BatchExpenseAnalysisResponse,
+    DashboardParams,
+    ExpenseAnalysisParams,
+    ExpenseAnalysisResponse,
+    InvestmentSuggestionParams,
+    InvestmentSuggestionResponse,
+    PulledInvestmentSuggestionRequest,
+    TaxBatchRequest,
+    TaxBatchResponse,
+    TaxOptimizationRequest,
+    TaxOptimizationResponse,
+)
+from sources import DataSourceError, TransactionSource
+from streaming import EXPENSE_COLUMNS, StreamedTransactions
+from tax_engine import LATEST_ASSESSMENT_YEAR, compute_tax_batch, tax_table
+from tax_optimizer import DEDUCTION_LIMITS, GridTooLargeError, InvalidGridError, optimize_tax, scenario_axes
+
 app = FastAPI(title="TaxBae ML Backend", version="1.0.0")
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
+
+# Per-worker concurrency and memory budgets; excess requests queue briefly or are shed with 429/503.
+# Registered before CORS so CORS wraps it and the frontend can read the status and Retry-After of a shed request
+admission = AdmissionController.from_env()
+app.add_middleware(AdmissionMiddleware, router=app.router, controller=admission)
 
 # Configure CORS
 app.add_middleware(
@@ -24,78 +65,220 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-# Models (in production, these would be loaded from files)
-expense_model = None
-investment_model = None
-anomaly_detector = None
-
-# Data models
-class Transaction(BaseModel):
-    amount: float
-    category: str
-    type: str  # 'INCOME' or 'EXPENSE'
-    description: str
-    date: str
-    isTaxDeductible: Optional[bool] = False
-    taxSection: Optional[str] = None
-
-class InvestmentProfile(BaseModel):
-    age: int
-    income: float
-    riskTolerance: str  # 'LOW', 'MEDIUM', 'HIGH'
-    investmentGoals: List[str]
-    timeHorizon: int  # years
-    currentSavings: float
-    monthlyInvestmentCapacity: float
-
-class ExpenseAnalysisRequest(BaseModel):
-    transactions: List[Transaction]
-    userId: str
-    
-class InvestmentSuggestionRequest(BaseModel):
-    profile: InvestmentProfile
-    transactions: List[Transaction]
-    userId: str
-
-# Response models
-class ExpenseInsight(BaseModel):
-    category: str
-    averageSpending: float
-    trend: str  # 'INCREASING', 'DECREASING', 'STABLE'
-    recommendation: str
-    potentialSavings: float
-
-class InvestmentSuggestion(BaseModel):
-    instrument: str
-    allocation: float  # percentage
-    expectedReturn: float
-    riskLevel: str
-    taxBenefits: str
-    reason: str
-
-class ExpenseAnalysisResponse(BaseModel):
-    insights: List[ExpenseInsight]
-    totalMonthlySpending: float
-    savingsRate: float
-    budgetRecommendations: Dict[str, float]
-    anomalies: List[Dict[str, Any]]
+
+def admission_metrics():
+    yield "# HELP ml_admission_in_flight Requests admitted and running"
+    yield "# TYPE ml_admission_in_flight gauge"
+    yield f"ml_admission_in_flight {admission.in_flight}"
+    yield "# HELP ml_admission_queued Requests waiting for admission"
+    yield "# TYPE ml_admission_queued gauge"
+    yield f"ml_admission_queued {admission.queued}"
+    yield "# HELP ml_admission_rejected_total Requests shed by admission control"
+    yield "# TYPE ml_admission_rejected_total counter"
+    for status, count in admission.rejected.items():
+        yield f'ml_admission_rejected_total{{status="{status}"}} {count}'
+
+metrics_registry.collector(admission_metrics)
+
+# Per-endpoint / per-stage latency histograms at /metrics, and the opt-in slow-request profiler
+profiler = SamplingProfiler.from_env()
+loop_monitor = LoopMonitor.from_env()
+app.add_middleware(MetricsMiddleware, router=app.router, profiler=profiler)
+
+# Versioned joblib artifacts, memory-mapped and shared by all workers on the host
+model_registry = default_registry()
+
+# IsolationForest retraining on pooled expenses, in its own process
+anomaly_retrainer = AnomalyRetrainer.from_env(model_registry)
+
+# Thread/process pools for CPU-bound analysis
+executor = AnalysisExecutor.from_env()
+
+# Pull mode: the database that /users/{user_id}/... endpoints read transactions from (None when disabled)
+transaction_source = TransactionSource.from_env()
+
+@app.on_event("startup")
+async def start_executor():
+    executor.start()
+    loop_monitor.start()
+    if profiler is not None:
+        profiler.start()
+
+@app.on_event("startup")
+async def load_models():
+    await executor.run(model_registry.load_all, local=True, timeout=model_registry.load_timeout)
+    anomaly_retrainer.start()
+
+@app.on_event("startup")
+async def open_transaction_source():
+    if transaction_source is not None:
+        try:
+            await transaction_source.start()
+        except DataSourceError:
+            # Pull-mode requests retry the connection and answer 503 until the database is reachable
+            logger.exception("Transaction source unavailable at startup")
+
+@app.on_event("shutdown")
+async def close_transaction_source():
+    if transaction_source is not None:
+        await transaction_source.close()
+
+@app.on_event("shutdown")
+async def stop_executor():
+    anomaly_retrainer.stop()
+    loop_monitor.stop()
+    if profiler is not None:
+        profiler.stop()
+    executor.shutdown()
+
+async def run_analysis(error_message: str, fn, *args, rows: int = 0, local: bool = False):
+    """Run an analysis routine off the event loop and map failures to HTTP errors"""
+    try:
+        with stage('analysis'):
+            return await executor.run(fn, *args, rows=rows, local=local)
+    except AnalysisTimeout as e:
+        raise HTTPException(status_code=504, detail=f"{error_message}: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{error_message}: {str(e)}")
+
+# Incremental per-user aggregates (state lives in this worker process)
+aggregate_store = AggregateStore()
+
+# Content-addressed cache for repeated analyses of the same transactions
+result_cache = ResultCache.from_env()
+
+def cache_metrics():
+    for outcome in ('hits', 'misses'):
+        yield f"# HELP ml_result_cache_{outcome}_total Result cache {outcome}"
+        yield f"# TYPE ml_result_cache_{outcome}_total counter"
+        yield f"ml_result_cache_{outcome}_total {getattr(result_cache, outcome)}"
+
+metrics_registry.collector(cache_metrics)
+
+def restamp_analysis_date(result: dict) -> dict:
+    """Cached results report when they were served, not when they were computed"""
+    if 'analysisDate' in result:
+        return {**result, 'analysisDate': datetime.now().isoformat()}
+    return result
+
+async def run_cached_analysis(
+    error_message: str,
+    endpoint: str,
+    fn,
+    transactions_df: pd.DataFrame,
+    *args,
+    refresh: Optional[Callable] = None,
+    cache_parts: tuple = ()
+):
+    """run_analysis behind the result cache, keyed on the ingested frame, parameters and cache_parts"""
+    if not result_cache.enabled:
+        return await run_analysis(error_message, fn, transactions_df, *args, rows=len(transactions_df))
     
-class InvestmentSuggestionResponse(BaseModel):
-    suggestions: List[InvestmentSuggestion]
-    portfolioAllocation: Dict[str, float]
-    expectedAnnualReturn: float
-    taxSavings: float
+    # Hashing is vectorized but still O(rows), so it stays off the event loop too
+    with stage('cache'):
+        key = await executor.run(ResultCache.key, endpoint, transactions_df, *args, *cache_parts, local=True)
+        result = result_cache.get(key)
+    if result is None:
+        result = await run_analysis(error_message, fn, transactions_df, *args, rows=len(transactions_df))
+        result_cache.set(key, result)
+    elif refresh is not None:
+        result = refresh(result)
+    return result
+
+def restamp_dashboard(result: dict) -> dict:
+    """restamp_analysis_date for the spending-pattern section of a cached dashboard"""
+    if 'spendingPattern' in result:
+        return {**result, 'spendingPattern': restamp_analysis_date(result['spendingPattern'])}
+    return result
+
+def anomaly_model_version(anomaly_method: str) -> tuple:
+    """Extra cache key parts: model-based results change when a new model version is served"""
+    if anomaly_method == 'isolation_forest':
+        return (model_registry.version(ANOMALY_MODEL_NAME),)
+    return ()
+
+def validate_tax_table(regime: str, assessment_year: Optional[str]):
+    try:
+        tax_table(regime, assessment_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def dashboard_sections(
+    sections: Optional[list],
+    anomaly_method: str,
+    annual_income: Optional[float],
+    tax_regime: str,
+    assessment_year: Optional[str]
+) -> tuple:
+    """Validated dashboard sections in canonical order; all of them by default (taxSavings only with an income)"""
+    if sections is None:
+        sections = [section for section in DASHBOARD_SECTIONS if section != 'taxSavings' or annual_income is not None]
+    unknown = sorted(set(sections) - set(DASHBOARD_SECTIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown dashboard sections {unknown}. Use any of: {', '.join(DASHBOARD_SECTIONS)}"
+        )
+    if 'expenses' in sections and anomaly_method not in ANOMALY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {anomaly_method}")
+    if 'taxSavings' in sections:
+        if annual_income is None:
+            raise HTTPException(status_code=400, detail="The taxSavings section needs an annual income")
+        validate_tax_table(tax_regime, assessment_year)
+    return tuple(section for section in DASHBOARD_SECTIONS if section in sections)
+
+# Authentication: JWTs signed by the Node.js backend, verified claims cached until the token expires
+token_verifier = TokenVerifier.from_env()
+
+def auth_metrics():
+    for outcome in ('hits', 'misses', 'failures'):
+        yield f"# HELP ml_auth_token_{outcome}_total Bearer token verification {outcome}"
+        yield f"# TYPE ml_auth_token_{outcome}_total counter"
+        yield f"ml_auth_token_{outcome}_total {getattr(token_verifier, outcome)}"
+
+metrics_registry.collector(auth_metrics)
 
-# Authentication (verify JWT token from Node.js backend)
 async def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """Claims of the bearer token; `userId` is the authenticated user (None with ML_AUTH_DISABLED=1)"""
+    try:
+        return token_verifier.verify(credentials.credentials)
+    except InvalidTokenError:
+        raise HTTPException(
+            status_code=401, detail="Invalid authentication credentials", headers={"WWW-Authenticate": "Bearer"}
+        )
+    except AuthNotConfiguredError as e:
+        raise HTTPException(status_code=500, detail=f"Authentication failed: {str(e)}")
+
+async def verify_admin(
+    current_user: dict = Depends(verify_token),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Claims of a bearer token with admin rights (admin role or scope, or the X-Admin-Token shared secret)"""
+    if not token_verifier.is_admin(current_user, x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin rights required")
+    return current_user
+
+def authorize_user(user_id: str, current_user: dict):
+    """Per-user state and data are only served to that user"""
+    if current_user["userId"] is not None and current_user["userId"] != user_id:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
+
+async def source_transactions(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(verify_token)
+) -> pd.DataFrame:
+    """FastAPI dependency: the user's transactions dated in [start, end), read from the configured database (pull mode)"""
+    authorize_user(user_id, current_user)
+    if transaction_source is None:
+        raise HTTPException(status_code=501, detail="Pull mode is not enabled (set ML_DATA_SOURCE)")
     try:
-        # In a real implementation, verify JWT token with same secret as Node.js backend
-        # For now, we'll accept any token for development
-        return {"userId": "user_id_from_jwt"}
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        return await transaction_source.fetch(user_id, start, end)
+    except DataSourceError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.get("/")
 async def root():
@@ -103,470 +286,453 @@ async def root():
 
 @app.post("/analyze/expenses", response_model=ExpenseAnalysisResponse)
 async def analyze_expenses(
-    request: ExpenseAnalysisRequest,
+    request: Request,
+    anomaly_method: Optional[str] = None,
     current_user: dict = Depends(verify_token)
 ):
-    """Analyze user expenses and provide insights"""
-    try:
-        transactions_df = pd.DataFrame([t.dict() for t in request.transactions])
-        
-        if transactions_df.empty:
-            return ExpenseAnalysisResponse(
-                insights=[],
-                totalMonthlySpending=0,
-                savingsRate=0,
-                budgetRecommendations={},
-                anomalies=[]
+    """Analyze user expenses and provide insights, from a JSON body or an NDJSON / Arrow IPC stream"""
+    if stream_format(request):
+        anomaly_method = anomaly_method or 'median'
+        if anomaly_method not in ANOMALY_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {anomaly_method}")
+        with StreamedTransactions() as streamed:
+            await streamed.consume(iter_transaction_frames(request))
+            transactions_df = streamed.frame()
+            anomaly_retrainer.pool.offer(transactions_df)
+            result = await run_analysis(
+                "Error analyzing expenses",
+                analysis.analyze_expenses, transactions_df, anomaly_method, streamed.details(),
+                rows=len(streamed)
             )
-        
-        # Filter expenses only
-        expenses_df = transactions_df[transactions_df['type'] == 'EXPENSE'].copy()
-        income_df = transactions_df[transactions_df['type'] == 'INCOME'].copy()
-        
-        # Calculate basic metrics
-        total_expenses = expenses_df['amount'].sum() if not expenses_df.empty else 0
-        total_income = income_df['amount'].sum() if not income_df.empty else 0
-        savings_rate = max(0, (total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
-        
-        # Category-wise analysis
-        insights = []
-        budget_recommendations = {}
-        
-        if not expenses_df.empty:
-            category_spending = expenses_df.groupby('category')['amount'].agg(['sum', 'mean', 'count']).reset_index()
-            
-            for _, row in category_spending.iterrows():
-                category = row['category']
-                avg_spending = row['mean']
-                total_spending = row['sum']
-                
-                # Simple trend analysis (would be more sophisticated with historical data)
-                trend = 'STABLE'  # Default
-                
-                # Generate recommendations
-                if category in ['🍕 Food & Dining', '🎬 Entertainment']:
-                    recommendation = f"Consider reducing {category} spending by 15-20% to optimize savings"
-                    potential_savings = total_spending * 0.15
-                elif category in ['🏠 Housing & Rent', '⚡ Utilities']:
-                    recommendation = f"Essential category. Look for energy-efficient alternatives"
-                    potential_savings = total_spending * 0.05
-                elif category in ['📈 Investments', '🛡️ Insurance']:
-                    recommendation = f"Great! Keep investing in {category} for tax benefits"
-                    potential_savings = 0
-                else:
-                    recommendation = f"Monitor {category} spending and look for optimization opportunities"
-                    potential_savings = total_spending * 0.10
-                
-                insights.append(ExpenseInsight(
-                    category=category,
-                    averageSpending=avg_spending,
-                    trend=trend,
-                    recommendation=recommendation,
-                    potentialSavings=potential_savings
-                ))
-                
-                # Budget recommendations (50% of average as recommended budget)
-                budget_recommendations[category] = avg_spending * 1.2
-        
-        # Anomaly detection (simple threshold-based)
-        anomalies = []
-        if not expenses_df.empty:
-            category_medians = expenses_df.groupby('category')['amount'].median()
-            for _, transaction in expenses_df.iterrows():
-                median_for_category = category_medians.get(transaction['category'], 0)
-                if transaction['amount'] > median_for_category * 3:  # 3x median threshold
-                    anomalies.append({
-                        'transaction_id': getattr(transaction, 'id', 'unknown'),
-                        'amount': transaction['amount'],
-                        'category': transaction['category'],
-                        'description': transaction['description'],
-                        'date': transaction['date'],
-                        'reason': f"Amount is {transaction['amount'] / median_for_category:.1f}x higher than usual for this category",
-                        'severity': 'HIGH' if transaction['amount'] > median_for_category * 5 else 'MEDIUM'
-                    })
-        
-        return ExpenseAnalysisResponse(
-            insights=insights,
-            totalMonthlySpending=total_expenses,
-            savingsRate=savings_rate,
-            budgetRecommendations=budget_recommendations,
-            anomalies=anomalies
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analyzing expenses: {str(e)}")
+        return respond(request, result)
+    
+    params, transactions_df = await read_envelope(request, ExpenseAnalysisParams)
+    if params.anomalyMethod not in ANOMALY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {params.anomalyMethod}")
+    
+    anomaly_retrainer.pool.offer(transactions_df, current_user["userId"] or params.userId or '')
+    
+    result = await run_cached_analysis(
+        "Error analyzing expenses", "/analyze/expenses",
+        analysis.analyze_expenses, transactions_df, params.anomalyMethod,
+        cache_parts=anomaly_model_version(params.anomalyMethod)
+    )
+    return respond(request, result)
+
+@app.post("/analyze/expenses/batch", response_model=BatchExpenseAnalysisResponse)
+async def analyze_expenses_batch(
+    request: Request,
+    anomaly_method: Optional[str] = None,
+    current_user: dict = Depends(verify_token)
+):
+    """Analyze expenses for many users at once, from a JSON body or an NDJSON / Arrow IPC stream of transactions"""
+    if stream_format(request):
+        params = BatchExpenseAnalysisParams(anomalyMethod=anomaly_method or 'median')
+        if params.anomalyMethod not in ANOMALY_METHODS:
+            raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {params.anomalyMethod}")
+        with StreamedTransactions(('userId', *EXPENSE_COLUMNS)) as streamed:
+            await streamed.consume(iter_transaction_frames(request, BATCH_TRANSACTION_FIELDS))
+            transactions_df = streamed.frame()
+            anomaly_retrainer.pool.offer(transactions_df)
+            results = await run_analysis(
+                "Error analyzing expenses",
+                analysis.analyze_expenses_by_user, transactions_df, params.anomalyMethod, 'userId', streamed.details(),
+                rows=len(streamed)
+            )
+        return respond(request, BatchExpenseAnalysisResponse(results=results, userCount=len(results)))
+    
+    params, transactions_df = await read_envelope(
+        request, BatchExpenseAnalysisParams, fields=BATCH_TRANSACTION_FIELDS
+    )
+    if params.anomalyMethod not in ANOMALY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {params.anomalyMethod}")
+    anomaly_retrainer.pool.offer(transactions_df)
+    
+    results = await run_analysis(
+        "Error analyzing expenses",
+        analysis.analyze_expenses_by_user, transactions_df, params.anomalyMethod,
+        rows=len(transactions_df)
+    )
+    return respond(request, BatchExpenseAnalysisResponse(results=results, userCount=len(results)))
 
 @app.post("/suggestions/investments", response_model=InvestmentSuggestionResponse)
 async def get_investment_suggestions(
-    request: InvestmentSuggestionRequest,
+    request: Request,
     current_user: dict = Depends(verify_token)
 ):
     """Generate personalized investment suggestions"""
-    try:
-        profile = request.profile
-        transactions = request.transactions
-        
-        # Calculate available investment amount
-        monthly_expenses = sum(t.amount for t in transactions if t.type == 'EXPENSE') / max(1, len([t for t in transactions if t.type == 'EXPENSE']))
-        available_investment = profile.monthlyInvestmentCapacity
-        
-        suggestions = []
-        portfolio_allocation = {}
-        
-        # Tax-saving investments (Section 80C)
-        if available_investment > 5000:  # Minimum for ELSS
-            elss_allocation = min(30, 150000 / 12 / available_investment * 100)  # Max 1.5L per year
-            suggestions.append(InvestmentSuggestion(
-                instrument="ELSS Mutual Fund",
-                allocation=elss_allocation,
-                expectedReturn=12.0,
-                riskLevel="MEDIUM",
-                taxBenefits="Section 80C - Up to ₹1.5L deduction",
-                reason="Tax-saving equity mutual fund with 3-year lock-in"
-            ))
-            portfolio_allocation["ELSS"] = elss_allocation
-        
-        # PPF for conservative investors
-        if profile.riskTolerance in ['LOW', 'MEDIUM']:
-            ppf_allocation = min(20, 150000 / 12 / available_investment * 100)
-            suggestions.append(InvestmentSuggestion(
-                instrument="Public Provident Fund (PPF)",
-                allocation=ppf_allocation,
-                expectedReturn=7.5,
-                riskLevel="LOW",
-                taxBenefits="Section 80C + Tax-free returns",
-                reason="Conservative long-term wealth building with tax benefits"
-            ))
-            portfolio_allocation["PPF"] = ppf_allocation
-        
-        # Equity investments based on risk tolerance
-        if profile.riskTolerance == 'HIGH' and profile.age < 50:
-            equity_allocation = 50
-            suggestions.append(InvestmentSuggestion(
-                instrument="Large Cap Mutual Fund",
-                allocation=equity_allocation,
-                expectedReturn=13.0,
-                riskLevel="MEDIUM",
-                taxBenefits="LTCG tax benefits after 1 year",
-                reason="Stable large-cap equity exposure for long-term growth"
-            ))
-            portfolio_allocation["Equity"] = equity_allocation
-        elif profile.riskTolerance == 'MEDIUM':
-            equity_allocation = 30
-            suggestions.append(InvestmentSuggestion(
-                instrument="Hybrid Mutual Fund",
-                allocation=equity_allocation,
-                expectedReturn=10.5,
-                riskLevel="MEDIUM",
-                taxBenefits="Balanced taxation",
-                reason="Balanced equity-debt mix for moderate risk"
-            ))
-            portfolio_allocation["Hybrid"] = equity_allocation
-        
-        # Debt instruments
-        if profile.age > 35 or profile.riskTolerance == 'LOW':
-            debt_allocation = 25
-            suggestions.append(InvestmentSuggestion(
-                instrument="Debt Mutual Fund",
-                allocation=debt_allocation,
-                expectedReturn=7.0,
-                riskLevel="LOW",
-                taxBenefits="Indexation benefits after 3 years",
-                reason="Capital preservation with inflation beating returns"
-            ))
-            portfolio_allocation["Debt"] = debt_allocation
-        
-        # Gold for diversification
-        if available_investment > 10000:
-            gold_allocation = 10
-            suggestions.append(InvestmentSuggestion(
-                instrument="Gold ETF",
-                allocation=gold_allocation,
-                expectedReturn=8.0,
-                riskLevel="MEDIUM",
-                taxBenefits="LTCG after 3 years",
-                reason="Portfolio diversification and inflation hedge"
-            ))
-            portfolio_allocation["Gold"] = gold_allocation
-        
-        # Calculate expected returns
-        total_allocation = sum(portfolio_allocation.values())
-        if total_allocation > 0:
-            expected_annual_return = sum(
-                s.allocation * s.expectedReturn / 100 for s in suggestions
-            ) / total_allocation * 100
-        else:
-            expected_annual_return = 0
-        
-        # Calculate tax savings
-        tax_savings = 0
-        for suggestion in suggestions:
-            if "80C" in suggestion.taxBenefits:
-                tax_savings += min(available_investment * suggestion.allocation / 100, 150000) * 0.3  # 30% tax bracket
-        
-        return InvestmentSuggestionResponse(
-            suggestions=suggestions,
-            portfolioAllocation=portfolio_allocation,
-            expectedAnnualReturn=expected_annual_return,
-            taxSavings=tax_savings
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating investment suggestions: {str(e)}")
+    params, transactions_df = await read_envelope(request, InvestmentSuggestionParams)
+    validate_tax_table(params.profile.taxRegime, None)
+    
+    result = await run_analysis(
+        "Error generating investment suggestions",
+        analysis.suggest_investments, params.profile, transactions_df, params.goalTargets,
+        rows=len(transactions_df)
+    )
+    return respond(request, result)
 
 @app.post("/analyze/spending-pattern")
 async def analyze_spending_pattern(
-    transactions: List[Transaction],
+    request: Request,
+    transactions_df: pd.DataFrame = Depends(transactions_body),
     current_user: dict = Depends(verify_token)
 ):
     """Analyze spending patterns and predict future expenses"""
-    try:
-        if not transactions:
-            return {"patterns": [], "predictions": {}, "insights": []}
-        
-        transactions_df = pd.DataFrame([t.dict() for t in transactions])
-        transactions_df['date'] = pd.to_datetime(transactions_df['date'])
-        transactions_df = transactions_df[transactions_df['type'] == 'EXPENSE']
-        
-        if transactions_df.empty:
-            return {"patterns": [], "predictions": {}, "insights": []}
-        
-        # Monthly spending pattern
-        monthly_spending = transactions_df.groupby([
-            transactions_df['date'].dt.year,
-            transactions_df['date'].dt.month,
-            'category'
-        ])['amount'].sum().reset_index()
-        
-        patterns = []
-        for category in transactions_df['category'].unique():
-            category_data = transactions_df[transactions_df['category'] == category]
-            avg_amount = category_data['amount'].mean()
-            frequency = len(category_data) / max(1, len(transactions_df)) * 100
-            
-            patterns.append({
-                'category': category,
-                'averageAmount': avg_amount,
-                'frequency': frequency,
-                'totalSpent': category_data['amount'].sum(),
-                'trend': 'stable'  # Simplified for demo
-            })
-        
-        # Simple predictions (next month spending by category)
-        predictions = {}
-        for category in transactions_df['category'].unique():
-            category_spending = transactions_df[transactions_df['category'] == category]['amount']
-            predictions[category] = float(category_spending.mean()) if len(category_spending) > 0 else 0
-        
-        # Generate insights
-        insights = []
-        total_spending = transactions_df['amount'].sum()
-        
-        # Top spending categories
-        top_categories = transactions_df.groupby('category')['amount'].sum().nlargest(3)
-        for category, amount in top_categories.items():
-            percentage = (amount / total_spending) * 100
-            insights.append({
-                'type': 'HIGH_SPENDING',
-                'category': category,
-                'message': f"{category} accounts for {percentage:.1f}% of your total expenses",
-                'amount': float(amount),
-                'actionable': percentage > 30
-            })
-        
-        # Recurring expenses
-        recurring_categories = transactions_df['category'].value_counts()
-        for category, count in recurring_categories.head(5).items():
-            if count >= 3:  # At least 3 transactions
-                avg_amount = transactions_df[transactions_df['category'] == category]['amount'].mean()
-                insights.append({
-                    'type': 'RECURRING_EXPENSE',
-                    'category': category,
-                    'message': f"You spend an average of ₹{avg_amount:.0f} on {category} regularly",
-                    'frequency': int(count),
-                    'suggestion': "Consider setting up automatic investments for this recurring expense"
-                })
-        
-        return {
-            "patterns": patterns,
-            "predictions": predictions,
-            "insights": insights,
-            "totalTransactions": len(transactions_df),
-            "analysisDate": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analyzing spending pattern: {str(e)}")
+    result = await run_cached_analysis(
+        "Error analyzing spending pattern", "/analyze/spending-pattern",
+        analysis.analyze_spending_pattern, transactions_df,
+        refresh=restamp_analysis_date
+    )
+    return respond(request, result)
 
 @app.post("/predict/tax-savings")
 async def predict_tax_savings(
-    transactions: List[Transaction],
+    request: Request,
     annual_income: float,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+    transactions_df: pd.DataFrame = Depends(transactions_body),
     current_user: dict = Depends(verify_token)
 ):
     """Predict potential tax savings based on spending patterns"""
-    try:
-        # Calculate current tax-deductible investments
-        tax_deductible_amount = sum(
-            t.amount for t in transactions 
-            if t.isTaxDeductible and t.type == 'EXPENSE'
+    validate_tax_table(tax_regime, assessment_year)
+    
+    result = await run_cached_analysis(
+        "Error predicting tax savings", "/predict/tax-savings",
+        analysis.predict_tax_savings, transactions_df, annual_income, tax_regime, assessment_year
+    )
+    return respond(request, result)
+
+@app.post("/tax/calculate", response_model=TaxBatchResponse)
+async def calculate_tax_batch(
+    request: Request,
+    body: TaxBatchRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Tax for many incomes in one vectorized call (what-if analyses, nightly batch jobs)"""
+    if body.deductions is not None and len(body.deductions) != len(body.incomes):
+        raise HTTPException(status_code=422, detail="deductions must have the same length as incomes")
+    if body.regimes is not None and len(body.regimes) != len(body.incomes):
+        raise HTTPException(status_code=422, detail="regimes must have the same length as incomes")
+    for regime in set(body.regimes or [body.regime]):
+        validate_tax_table(regime, body.assessmentYear)
+    
+    breakdown = await run_analysis(
+        "Error calculating tax",
+        compute_tax_batch,
+        body.incomes,
+        body.deductions if body.deductions is not None else 0.0,
+        body.regimes if body.regimes is not None else body.regime,
+        body.assessmentYear,
+        rows=len(body.incomes)
+    )
+    # Columns go out as NumPy arrays; the encoders take them without a per-element pass
+    return respond(request, {'assessmentYear': body.assessmentYear or LATEST_ASSESSMENT_YEAR, **breakdown})
+
+@app.post("/tax/optimize", response_model=TaxOptimizationResponse)
+async def optimize_tax_scenarios(
+    request: Request,
+    body: TaxOptimizationRequest,
+    current_user: dict = Depends(verify_token)
+):
+    """Price a grid of 80C / 80D / 80CCD(1B) / HRA scenarios under both regimes and return the best allocation"""
+    validate_tax_table('OLD_REGIME', body.assessmentYear)
+    unknown = sorted({*body.currentDeductions, *body.limits, *body.steps} - set(DEDUCTION_LIMITS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown deduction sections {unknown}. Use one of: {', '.join(DEDUCTION_LIMITS)}"
         )
-        
-        # Tax calculation logic for Indian tax system (simplified)
-        def calculate_tax(income: float, deductions: float = 0) -> float:
-            taxable_income = max(0, income - deductions - 50000)  # Standard deduction
-            
-            if taxable_income <= 250000:
-                return 0
-            elif taxable_income <= 500000:
-                return (taxable_income - 250000) * 0.05
-            elif taxable_income <= 750000:
-                return 12500 + (taxable_income - 500000) * 0.10
-            elif taxable_income <= 1000000:
-                return 37500 + (taxable_income - 750000) * 0.15
-            elif taxable_income <= 1250000:
-                return 75000 + (taxable_income - 1000000) * 0.20
-            elif taxable_income <= 1500000:
-                return 125000 + (taxable_income - 1250000) * 0.25
-            else:
-                return 187500 + (taxable_income - 1500000) * 0.30
-        
-        # Current tax
-        current_tax = calculate_tax(annual_income, tax_deductible_amount)
-        
-        # Maximum possible 80C deductions
-        max_80c_deduction = 150000
-        remaining_80c_capacity = max(0, max_80c_deduction - tax_deductible_amount)
-        
-        # Tax with maximum deductions
-        optimized_tax = calculate_tax(annual_income, max_80c_deduction)
-        potential_savings = current_tax - optimized_tax
-        
-        # Investment recommendations for tax savings
-        recommendations = []
-        if remaining_80c_capacity > 0:
-            recommendations.extend([
-                {
-                    'instrument': 'ELSS Mutual Fund',
-                    'amount': min(remaining_80c_capacity, 50000),
-                    'taxSaving': min(remaining_80c_capacity, 50000) * 0.3,
-                    'expectedReturn': 12.0,
-                    'lockIn': '3 years'
-                },
-                {
-                    'instrument': 'PPF',
-                    'amount': min(remaining_80c_capacity, 150000),
-                    'taxSaving': min(remaining_80c_capacity, 150000) * 0.3,
-                    'expectedReturn': 7.5,
-                    'lockIn': '15 years'
-                },
-                {
-                    'instrument': 'Tax Saver FD',
-                    'amount': min(remaining_80c_capacity, 100000),
-                    'taxSaving': min(remaining_80c_capacity, 100000) * 0.3,
-                    'expectedReturn': 6.5,
-                    'lockIn': '5 years'
-                }
-            ])
-        
-        return {
-            'currentTaxLiability': current_tax,
-            'optimizedTaxLiability': optimized_tax,
-            'potentialTaxSavings': potential_savings,
-            'currentDeductions': tax_deductible_amount,
-            'remaining80CCapacity': remaining_80c_capacity,
-            'recommendations': recommendations,
-            'taxBracket': '30%' if annual_income > 1500000 else '20%' if annual_income > 1000000 else '10%' if annual_income > 500000 else '5%'
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error predicting tax savings: {str(e)}")
+    if body.hraExemption < 0 or (body.budget is not None and body.budget < 0) \
+            or any(limit < 0 for limit in body.limits.values()):
+        raise HTTPException(status_code=400, detail="Limits, hraExemption and budget must not be negative")
+    try:
+        scenario_axes(body.hraExemption, body.limits, body.steps)
+    except InvalidGridError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except GridTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = await run_analysis(
+        "Error optimizing tax",
+        optimize_tax,
+        body.annualIncome,
+        body.assessmentYear,
+        body.hraExemption,
+        body.currentDeductions,
+        body.budget,
+        body.limits,
+        body.steps,
+        body.includeSurface
+    )
+    return respond(request, TaxOptimizationResponse(**result))
 
 @app.post("/analyze/investment-performance")
 async def analyze_investment_performance(
-    transactions: List[Transaction],
+    request: Request,
+    monthly_investment_capacity: Optional[float] = None,
+    transactions_df: pd.DataFrame = Depends(transactions_body),
     current_user: dict = Depends(verify_token)
 ):
     """Analyze investment performance and portfolio health"""
+    result = await run_analysis(
+        "Error analyzing investment performance",
+        analysis.analyze_investment_performance, transactions_df, monthly_investment_capacity,
+        rows=len(transactions_df)
+    )
+    return respond(request, result)
+
+@app.post("/dashboard")
+async def dashboard(
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    """Expense analysis, spending pattern, tax savings and investment performance from one parse of the transactions"""
+    params, transactions_df = await read_envelope(request, DashboardParams)
+    sections = dashboard_sections(
+        params.sections, params.anomalyMethod, params.annualIncome, params.taxRegime, params.assessmentYear
+    )
+    if 'expenses' in sections:
+        anomaly_retrainer.pool.offer(transactions_df, current_user["userId"] or params.userId or '')
+    
+    result = await run_cached_analysis(
+        "Error building dashboard", "/dashboard",
+        build_dashboard, transactions_df, sections, params.anomalyMethod, params.annualIncome,
+        params.taxRegime, params.assessmentYear, params.monthlyInvestmentCapacity,
+        refresh=restamp_dashboard,
+        cache_parts=anomaly_model_version(params.anomalyMethod) if 'expenses' in sections else ()
+    )
+    return respond(request, result)
+
+@app.post("/aggregates/{user_id}/transactions")
+async def append_transactions(
+    user_id: str,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    """Fold new, changed or deleted transactions into the user's running aggregates"""
+    authorize_user(user_id, current_user)
+    params, delta_df = await read_envelope(request, AggregateUpdateParams)
+    if params.anomalyMethod not in INCREMENTAL_ANOMALY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {params.anomalyMethod}")
+    
+    # Aggregates are shared state in this process, so updates never go to the process pool
+    result = await run_analysis(
+        "Error updating aggregates",
+        aggregate_store.append, user_id, delta_df, params.deletedIds, params.anomalyMethod, params.reset,
+        local=True
+    )
+    return respond(request, result)
+
+@app.get("/aggregates/{user_id}/analyze/expenses", response_model=ExpenseAnalysisResponse)
+async def analyze_expenses_incremental(
+    user_id: str,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    """Expense analysis answered from the user's running aggregates"""
+    authorize_user(user_id, current_user)
+    # Only the snapshot of the user's aggregates holds the store lock; frames and trend fits run in a thread
+    result = await run_analysis("Error analyzing expenses", aggregate_store.expense_analysis, user_id, local=True)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No aggregates for user {user_id}")
+    return respond(request, result)
+
+@app.get("/aggregates/{user_id}/analyze/spending-pattern")
+async def analyze_spending_pattern_incremental(
+    user_id: str,
+    request: Request,
+    current_user: dict = Depends(verify_token)
+):
+    """Spending patterns answered from the user's running aggregates"""
+    authorize_user(user_id, current_user)
+    # Only the snapshot of the user's aggregates holds the store lock; frames and trend fits run in a thread
+    result = await run_analysis("Error analyzing spending pattern", aggregate_store.spending_pattern, user_id, local=True)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No aggregates for user {user_id}")
+    return respond(request, result)
+
+@app.delete("/aggregates/{user_id}")
+async def drop_aggregates(
+    user_id: str,
+    current_user: dict = Depends(verify_token)
+):
+    """Forget the user's running aggregates"""
+    authorize_user(user_id, current_user)
+    if not aggregate_store.drop(user_id):
+        raise HTTPException(status_code=404, detail=f"No aggregates for user {user_id}")
+    return {"userId": user_id, "dropped": True}
+
+@app.get("/users/{user_id}/analyze/expenses", response_model=ExpenseAnalysisResponse)
+async def analyze_expenses_pulled(
+    user_id: str,
+    request: Request,
+    anomaly_method: str = 'median',
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Expense analysis of the user's transactions read from the database"""
+    if anomaly_method not in ANOMALY_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported anomaly method: {anomaly_method}")
+    anomaly_retrainer.pool.offer(transactions_df, user_id)
+    
+    result = await run_cached_analysis(
+        "Error analyzing expenses", "/analyze/expenses",
+        analysis.analyze_expenses, transactions_df, anomaly_method,
+        cache_parts=anomaly_model_version(anomaly_method)
+    )
+    return respond(request, result)
+
+@app.post("/users/{user_id}/suggestions/investments", response_model=InvestmentSuggestionResponse)
+async def get_investment_suggestions_pulled(
+    request: Request,
+    params: PulledInvestmentSuggestionRequest,
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Investment suggestions from a profile and the user's transactions read from the database"""
+    validate_tax_table(params.profile.taxRegime, None)
+    result = await run_analysis(
+        "Error generating investment suggestions",
+        analysis.suggest_investments, params.profile, transactions_df, params.goalTargets,
+        rows=len(transactions_df)
+    )
+    return respond(request, result)
+
+@app.get("/users/{user_id}/analyze/spending-pattern")
+async def analyze_spending_pattern_pulled(
+    request: Request,
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Spending patterns of the user's transactions read from the database"""
+    result = await run_cached_analysis(
+        "Error analyzing spending pattern", "/analyze/spending-pattern",
+        analysis.analyze_spending_pattern, transactions_df,
+        refresh=restamp_analysis_date
+    )
+    return respond(request, result)
+
+@app.get("/users/{user_id}/predict/tax-savings")
+async def predict_tax_savings_pulled(
+    request: Request,
+    annual_income: float,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Tax-saving prediction from the user's transactions read from the database"""
+    validate_tax_table(tax_regime, assessment_year)
+    
+    result = await run_cached_analysis(
+        "Error predicting tax savings", "/predict/tax-savings",
+        analysis.predict_tax_savings, transactions_df, annual_income, tax_regime, assessment_year
+    )
+    return respond(request, result)
+
+@app.get("/users/{user_id}/analyze/investment-performance")
+async def analyze_investment_performance_pulled(
+    request: Request,
+    monthly_investment_capacity: Optional[float] = None,
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Investment performance of the user's transactions read from the database"""
+    result = await run_analysis(
+        "Error analyzing investment performance",
+        analysis.analyze_investment_performance, transactions_df, monthly_investment_capacity,
+        rows=len(transactions_df)
+    )
+    return respond(request, result)
+
+@app.get("/users/{user_id}/dashboard")
+async def dashboard_pulled(
+    user_id: str,
+    request: Request,
+    sections: Optional[str] = None,
+    anomaly_method: str = 'median',
+    annual_income: Optional[float] = None,
+    tax_regime: str = 'OLD_REGIME',
+    assessment_year: Optional[str] = None,
+    monthly_investment_capacity: Optional[float] = None,
+    current_user: dict = Depends(verify_token),
+    transactions_df: pd.DataFrame = Depends(source_transactions)
+):
+    """Dashboard sections (comma-separated, default all) of the user's transactions read from the database"""
+    sections = dashboard_sections(
+        sections.split(',') if sections else None, anomaly_method, annual_income, tax_regime, assessment_year
+    )
+    if 'expenses' in sections:
+        anomaly_retrainer.pool.offer(transactions_df, user_id)
+    
+    result = await run_cached_analysis(
+        "Error building dashboard", "/dashboard",
+        build_dashboard, transactions_df, sections, anomaly_method, annual_income,
+        tax_regime, assessment_year, monthly_investment_capacity,
+        refresh=restamp_dashboard,
+        cache_parts=anomaly_model_version(anomaly_method) if 'expenses' in sections else ()
+    )
+    return respond(request, result)
+
+@app.post("/models/{name}/reload")
+async def reload_model(
+    name: str,
+    version: Optional[str] = None,
+    current_user: dict = Depends(verify_admin)
+):
+    """Load a model version (CURRENT by default) and swap it in without dropping requests"""
+    # An explicit version is published so every worker process switches to it too
+    load = model_registry.publish if version else model_registry.load
     try:
-        investment_transactions = [
-            t for t in transactions 
-            if t.type == 'EXPENSE' and any(keyword in t.category.lower() for keyword in ['investment', 'mutual fund', 'sip', 'equity', 'debt'])
-        ]
-        
-        if not investment_transactions:
-            return {
-                'totalInvested': 0,
-                'portfolioHealth': 'NO_INVESTMENTS',
-                'diversification': {},
-                'recommendations': [
-                    'Start investing in ELSS for tax benefits',
-                    'Consider SIP in large-cap mutual funds',
-                    'Build emergency fund before investing'
-                ]
-            }
-        
-        total_invested = sum(t.amount for t in investment_transactions)
-        
-        # Portfolio diversification analysis
-        investment_categories = {}
-        for transaction in investment_transactions:
-            category = transaction.category
-            investment_categories[category] = investment_categories.get(category, 0) + transaction.amount
-        
-        # Portfolio health score (simplified)
-        diversification_score = min(len(investment_categories) * 20, 100)  # Max 100 for 5+ categories
-        investment_frequency = len(investment_transactions) / max(1, len(transactions)) * 100
-        
-        if diversification_score >= 80 and investment_frequency >= 15:
-            portfolio_health = 'EXCELLENT'
-        elif diversification_score >= 60 and investment_frequency >= 10:
-            portfolio_health = 'GOOD'
-        elif diversification_score >= 40 and investment_frequency >= 5:
-            portfolio_health = 'AVERAGE'
-        else:
-            portfolio_health = 'NEEDS_IMPROVEMENT'
-        
-        # Generate recommendations
-        recommendations = []
-        if len(investment_categories) < 3:
-            recommendations.append('Diversify your portfolio across more asset classes')
-        if investment_frequency < 10:
-            recommendations.append('Increase your investment frequency with SIP')
-        if total_invested < profile.monthlyInvestmentCapacity * 6:
-            recommendations.append('Consider increasing your investment amount')
-        
-        # Calculate diversification percentages
-        diversification = {
-            category: (amount / total_invested) * 100 
-            for category, amount in investment_categories.items()
-        }
-        
-        return {
-            'totalInvested': total_invested,
-            'portfolioHealth': portfolio_health,
-            'diversificationScore': diversification_score,
-            'diversification': diversification,
-            'investmentFrequency': investment_frequency,
-            'recommendations': recommendations,
-            'monthlyAverage': total_invested / max(1, len(investment_transactions))
-        }
-        
+        loaded = await executor.run(load, name, version, local=True, timeout=model_registry.load_timeout)
+    except InvalidVersionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except AnalysisTimeout as e:
+        raise HTTPException(status_code=504, detail=f"Error loading model: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analyzing investment performance: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error loading model: {str(e)}")
+    return {"name": loaded.name, "version": loaded.version, "warmupSeconds": loaded.warmup_seconds}
+
+@app.post("/models/anomaly_detector/retrain")
+async def retrain_anomaly_model(
+    current_user: dict = Depends(verify_admin)
+):
+    """Retrain the IsolationForest on pooled expenses now instead of waiting for the next period"""
+    version = await anomaly_retrainer.retrain()
+    if version is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Retraining skipped: {anomaly_retrainer.last_error or 'not enough pooled expenses or a run is in progress'}"
+        )
+    return {"name": ANOMALY_MODEL_NAME, "version": version, **anomaly_retrainer.status()}
 
 @app.get("/health")
 async def health_check():
+    models = model_registry.status()
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "models_loaded": {
-            "expense_analyzer": True,
-            "investment_advisor": True,
-            "anomaly_detector": True
-        }
+            "expense_analyzer": models["expense_model"]["loaded"],
+            "investment_advisor": models["investment_model"]["loaded"],
+            "anomaly_detector": models["anomaly_detector"]["loaded"]
+        },
+        "models": models,
+        "anomalyRetraining": anomaly_retrainer.status(),
+        "cache": result_cache.stats(),
+        "dataSource": transaction_source.stats() if transaction_source is not None else None,
+        "auth": token_verifier.stats(),
+        "admission": admission.stats()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (this worker process only)"""
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,311 @@
+"""
+Hot-path instrumentation exposed in Prometheus text format.
+
+An ASGI middleware times every request, counts request and response bytes
+and labels them with the route template (never the raw path, so user ids do
+not explode the series count). Hot-path code marks stages with
+`with stage('decode'):`; the stages of the current request are collected in a
+context variable and observed when the request finishes, so a stage outside
+a request, or with instrumentation disabled, costs one context lookup.
+Analyses that run in the thread or process pool record their stages in the
+worker and hand them back with the result (see collect_stages). A probe task
+measures event-loop lag and counts stalls long enough to be blocking.
+
+Series are per process: with several workers, each reports its own.
+
+Configuration (environment variables):
+    ML_METRICS              '0' disables request instrumentation (default: enabled)
+    ML_LOOP_CHECK_SECONDS   event-loop probe period, 0 disables it (default: 0.05)
+    ML_LOOP_BLOCK_SECONDS   lag counted as a blocked event loop (default: 0.1)
+"""
+
+import asyncio
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(float(4 ** power) for power in range(5, 16))  # 1 KiB .. 1 GiB
+ROWS_BUCKETS = (10.0, 100.0, 1000.0, 10000.0, 100000.0, 1000000.0, 10000000.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), values):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(values[-1])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterator[str]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, help, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], Iterator[str]]) -> None:
+        """Extra exposition lines (with their own HELP/TYPE) produced at scrape time"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'ml_request_duration_seconds', 'Request latency', LATENCY_BUCKETS, ('method', 'endpoint', 'status')
+)
+STAGE_SECONDS = registry.histogram(
+    'ml_stage_duration_seconds', 'Time per request spent in each hot-path stage', LATENCY_BUCKETS, ('endpoint', 'stage')
+)
+REQUEST_BYTES = registry.histogram('ml_request_size_bytes', 'Request body size', BYTES_BUCKETS, ('endpoint',))
+RESPONSE_BYTES = registry.histogram('ml_response_size_bytes', 'Response body size', BYTES_BUCKETS, ('endpoint',))
+PAYLOAD_ROWS = registry.histogram('ml_payload_rows', 'Transactions ingested per request', ROWS_BUCKETS, ('endpoint',))
+LOOP_LAG_SECONDS = registry.histogram(
+    'ml_event_loop_lag_seconds', 'How late the event-loop probe woke up', LATENCY_BUCKETS
+)
+LOOP_BLOCKED = registry.counter('ml_event_loop_blocked_total', 'Event-loop stalls of at least ML_LOOP_BLOCK_SECONDS')
+
+
+class RequestTrace:
+    """Stages and ingested rows of one request"""
+
+    __slots__ = ('stages', 'rows')
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.rows = 0
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar('ml_request_trace', default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _trace.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a stage of the current request"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages.append((name, time.perf_counter() - started))
+
+
+def add_rows(rows: int) -> None:
+    """Count ingested transactions toward the current request's payload size"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.rows += rows
+
+
+def collect_stages(fn: Callable[..., Any], submitted: float, *args: Any) -> Tuple[Any, List[Tuple[str, float]]]:
+    """Run fn(*args) in a pool worker with its own trace; (result, stages including the queue wait)"""
+    started = time.time()
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    try:
+        result = fn(*args)
+    finally:
+        _trace.reset(token)
+    return result, [('queue', max(0.0, started - submitted)), *trace.stages]
+
+
+def route_template(routes: Sequence[Any], scope: dict) -> str:
+    """Path template of the route a request will hit ('unmatched' if none)"""
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, sizes and stages per endpoint, and feeding the slow-request profiler"""
+
+    def __init__(self, app, router, profiler=None, enabled: Optional[bool] = None):
+        self.app = app
+        self.router = router
+        self.profiler = profiler
+        self.enabled = os.environ.get('ML_METRICS', '1') != '0' if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_template(self.router.routes, scope)
+        sizes = {'request': 0, 'response': 0}
+        status = {'code': 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message['type'] == 'http.request':
+                sizes['request'] += len(message.get('body', b''))
+            return message
+
+        async def counting_send(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            elif message['type'] == 'http.response.body':
+                sizes['response'] += len(message.get('body', b''))
+            await send(message)
+
+        trace = RequestTrace()
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            finished = time.perf_counter()
+            _trace.reset(token)
+            REQUEST_SECONDS.observe(finished - started, scope['method'], endpoint, str(status['code']))
+            REQUEST_BYTES.observe(sizes['request'], endpoint)
+            RESPONSE_BYTES.observe(sizes['response'], endpoint)
+            if trace.rows:
+                PAYLOAD_ROWS.observe(trace.rows, endpoint)
+            # Chunked work (streamed uploads) records a stage many times; observe the per-request total
+            totals: Dict[str, float] = {}
+            for name, seconds in trace.stages:
+                totals[name] = totals.get(name, 0.0) + seconds
+            for name, seconds in totals.items():
+                STAGE_SECONDS.observe(seconds, endpoint, name)
+            if self.profiler is not None:
+                self.profiler.request_finished(endpoint, started, finished)
+
+
+class LoopMonitor:
+    """Probe task that measures event-loop lag and counts blocking stalls"""
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> 'LoopMonitor':
+        return cls(
+            interval=float(os.environ.get('ML_LOOP_CHECK_SECONDS', 0.05)),
+            threshold=float(os.environ.get('ML_LOOP_BLOCK_SECONDS', 0.1)),
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                LOOP_BLOCKED.inc()
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
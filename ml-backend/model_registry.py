@@ -0,0 +1,249 @@
+"""
+Versioned model registry.
+
+Artifacts live under ML_MODEL_DIR as <name>/<version>.joblib. The version
+served is the one named in <name>/CURRENT, or the highest version when there
+is no pointer file. Artifacts are written uncompressed and loaded with
+mmap_mode='r', so NumPy arrays inside the model stay in the page cache and
+every uvicorn worker on the host shares the same physical pages.
+
+Loading never blocks requests: a new version is loaded and warmed with a
+dummy inference first, then swapped in with a single reference assignment.
+Requests that already hold the previous version finish with it. Publishing a
+version rewrites CURRENT, and every process (uvicorn workers, pool workers)
+follows the pointer through current().
+
+Versions are plain names ([0-9A-Za-z_-]); a requested version must already
+have an artifact, so client input never reaches a path it did not list.
+
+Configuration (environment variables):
+    ML_MODEL_DIR            artifact directory (default: models)
+    ML_MODEL_LOAD_TIMEOUT   seconds allowed for loading and warming one model (default: 300)
+    ML_MODEL_REFRESH        seconds between checks of CURRENT in current() (default: 5)
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MODEL_NAMES = ('expense_model', 'investment_model', 'anomaly_detector')
+
+CURRENT_POINTER = 'CURRENT'
+ARTIFACT_SUFFIX = '.joblib'
+VERSION_PATTERN = re.compile(r'[0-9A-Za-z_-]+')
+
+
+class ModelNotFoundError(LookupError):
+    """Raised when no artifact exists for a model name/version"""
+
+
+class InvalidVersionError(ValueError):
+    """Raised for a version name that could escape the model directory"""
+
+
+def check_version(version: str) -> str:
+    """The version unchanged when it is a plain name; raises InvalidVersionError otherwise"""
+    if not isinstance(version, str) or not VERSION_PATTERN.fullmatch(version):
+        raise InvalidVersionError(f"Invalid model version {version!r}: use letters, digits, '_' and '-' only")
+    return version
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    version: str
+    path: str
+    model: Any
+    loaded_at: float = field(default_factory=time.time)
+    warmup_seconds: float = 0.0
+
+
+def _version_key(version: str) -> List[Any]:
+    """Natural sort key so v10 sorts after v9"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+def warm_up(model: Any) -> None:
+    """One dummy inference so lazy initialisation and page faults happen before traffic"""
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is None:
+        return
+    sample = np.zeros((1, n_features))
+    for method in ('score_samples', 'predict'):
+        if hasattr(model, method):
+            getattr(model, method)(sample)
+            return
+
+
+def publish_version(directory: str, name: str, version: str) -> None:
+    """Atomically point CURRENT at a version"""
+    check_version(version)
+    model_dir = os.path.join(directory, name)
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, CURRENT_POINTER))
+
+
+def save_model(directory: str, name: str, version: str, model: Any, make_current: bool = True) -> str:
+    """Write an uncompressed (mmap-able) artifact atomically and optionally point CURRENT at it"""
+    check_version(version)
+    model_dir = os.path.join(directory, name)
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"{version}{ARTIFACT_SUFFIX}")
+
+    import joblib
+
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    os.close(fd)
+    joblib.dump(model, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+
+    if make_current:
+        publish_version(directory, name, version)
+    return path
+
+
+class ModelRegistry:
+    """Currently served version of each model, with atomic hot-swap"""
+
+    def __init__(
+        self,
+        directory: str = 'models',
+        names=MODEL_NAMES,
+        load_timeout: float = 300.0,
+        refresh_interval: float = 5.0,
+    ):
+        self.directory = directory
+        self.names = tuple(names)
+        self.load_timeout = load_timeout
+        self.refresh_interval = refresh_interval
+        self._models: Dict[str, LoadedModel] = {}
+        self._errors: Dict[str, str] = {}
+        self._checked: Dict[str, float] = {}
+        self._load_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ModelRegistry':
+        return cls(
+            os.environ.get('ML_MODEL_DIR', 'models'),
+            load_timeout=float(os.environ.get('ML_MODEL_LOAD_TIMEOUT', 300)),
+            refresh_interval=float(os.environ.get('ML_MODEL_REFRESH', 5)),
+        )
+
+    def versions(self, name: str) -> List[str]:
+        model_dir = os.path.join(self.directory, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(
+            (entry[:-len(ARTIFACT_SUFFIX)] for entry in os.listdir(model_dir) if entry.endswith(ARTIFACT_SUFFIX)),
+            key=_version_key,
+        )
+
+    def current_version(self, name: str) -> Optional[str]:
+        """Version named by the CURRENT pointer, else the highest available"""
+        try:
+            with open(os.path.join(self.directory, name, CURRENT_POINTER)) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def load(self, name: str, version: Optional[str] = None) -> LoadedModel:
+        """Load, warm and swap in a model version; the previous version keeps serving until the swap"""
+        if name not in self.names:
+            raise ModelNotFoundError(f"Unknown model '{name}'. Expected one of {', '.join(self.names)}")
+        version = version or self.current_version(name)
+        if version is None:
+            raise ModelNotFoundError(f"No artifacts for model '{name}' in {self.directory}")
+        # Checked before the version is joined into any path; CURRENT is validated the same way
+        check_version(version)
+        if version not in self.versions(name):
+            raise ModelNotFoundError(f"No artifact for model '{name}' version '{version}'")
+        path = os.path.join(self.directory, name, f"{version}{ARTIFACT_SUFFIX}")
+
+        # Imported on first use so processes that never load a model skip it
+        import joblib
+
+        # One load at a time keeps peak memory to a single extra model
+        with self._load_lock:
+            model = joblib.load(path, mmap_mode='r')
+            started = time.perf_counter()
+            warm_up(model)
+            loaded = LoadedModel(name, version, path, model, warmup_seconds=time.perf_counter() - started)
+            self._models[name] = loaded
+            self._errors.pop(name, None)
+        return loaded
+
+    def load_all(self) -> None:
+        """Load every model that has artifacts and is not already served; failures go to status()"""
+        for name in self.names:
+            version = self.current_version(name)
+            if version is None or version == self.version(name):
+                continue
+            try:
+                self.load(name)
+            except Exception as e:
+                self._errors[name] = str(e)
+
+    def publish(self, name: str, version: str) -> LoadedModel:
+        """Load a version here and point CURRENT at it so other processes follow"""
+        loaded = self.load(name, version)
+        publish_version(self.directory, name, version)
+        return loaded
+
+    def get(self, name: str) -> Optional[Any]:
+        """The model object currently served, or None"""
+        loaded = self._models.get(name)
+        return loaded.model if loaded is not None else None
+
+    def version(self, name: str) -> Optional[str]:
+        loaded = self._models.get(name)
+        return loaded.version if loaded is not None else None
+
+    def current(self, name: str) -> Optional[Any]:
+        """Served model, switching to the CURRENT version when another process has published one"""
+        now = time.monotonic()
+        if now - self._checked.get(name, -self.refresh_interval) >= self.refresh_interval:
+            self._checked[name] = now
+            version = self.current_version(name)
+            if version is not None and version != self.version(name):
+                try:
+                    self.load(name, version)
+                except Exception as e:
+                    self._errors[name] = str(e)
+        return self.get(name)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        status = {}
+        for name in self.names:
+            loaded = self._models.get(name)
+            status[name] = {
+                'loaded': loaded is not None,
+                'version': loaded.version if loaded is not None else None,
+                'loadedAt': loaded.loaded_at if loaded is not None else None,
+                'warmupSeconds': loaded.warmup_seconds if loaded is not None else None,
+                'available': self.versions(name),
+                'error': self._errors.get(name),
+            }
+        return status
+
+
+_default_registry: Optional[ModelRegistry] = None
+
+
+def default_registry() -> ModelRegistry:
+    """Process-wide registry configured from the environment (also used inside pool workers)"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ModelRegistry.from_env()
+    return _default_registry
@@ -0,0 +1,130 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+A background thread samples the Python stacks of every thread in the process
+into a ring buffer. When a request takes longer than the threshold, the
+samples taken while it ran are written as collapsed stacks, one
+"frame;frame;frame count" line per distinct stack, which flamegraph.pl,
+inferno and speedscope read directly. Samples cannot be tied to one request,
+so overlapping requests share samples, and work sent to the process pool is
+not sampled (set ML_PROCESS_WORKERS=0 to profile it in-process). Idle stacks
+(pool threads waiting for work, the event loop waiting in select) are dropped.
+
+Nothing runs unless ML_PROFILE_THRESHOLD_MS is set.
+
+Configuration (environment variables):
+    ML_PROFILE_THRESHOLD_MS   request latency that triggers a dump
+    ML_PROFILE_INTERVAL       sampling period in seconds (default: 0.005)
+    ML_PROFILE_SAMPLES        samples kept in the ring buffer (default: 100000)
+    ML_PROFILE_DIR            where dumps are written (default: .ml-profiles)
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, List, Optional, Tuple
+
+# (file name, function) of innermost frames that mean a thread is waiting, not working
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+    ('connection.py', '_recv'),
+    ('connection.py', 'wait'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _collapse(frame) -> Optional[str]:
+    """Root-first 'function (file:line);...' stack, None when the thread is idle"""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+        return None
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples thread stacks continuously and dumps the ones behind slow requests"""
+
+    def __init__(self, threshold: float, interval: float = 0.005, samples: int = 100000, directory: str = '.ml-profiles'):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self.dumps_written = 0
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=samples)
+        self._pending: Deque[Tuple[str, float, float]] = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional['SamplingProfiler']:
+        """A profiler when ML_PROFILE_THRESHOLD_MS is set, otherwise None"""
+        threshold = os.environ.get('ML_PROFILE_THRESHOLD_MS')
+        if not threshold:
+            return None
+        return cls(
+            float(threshold) / 1000,
+            interval=float(os.environ.get('ML_PROFILE_INTERVAL', 0.005)),
+            samples=int(os.environ.get('ML_PROFILE_SAMPLES', 100000)),
+            directory=os.environ.get('ML_PROFILE_DIR', '.ml-profiles'),
+        )
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        now = time.perf_counter()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = _collapse(frame)
+            if stack is not None:
+                self._samples.append((now, stack))
+
+    def _dump(self, endpoint: str, started: float, finished: float) -> None:
+        stacks = Counter(stack for at, stack in list(self._samples) if started <= at <= finished)
+        if not stacks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{slug}-{(finished - started) * 1000:.0f}ms.folded"
+        lines: List[str] = [f'{stack} {count}' for stack, count in stacks.most_common()]
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.dumps_written += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+            while self._pending:
+                try:
+                    self._dump(*self._pending.popleft())
+                except OSError:
+                    logger.exception("Could not write profile")
+
+    def request_finished(self, endpoint: str, started: float, finished: float) -> None:
+        """Queue a dump when the request was slow; writing happens on the sampler thread"""
+        if finished - started >= self.threshold:
+            self._pending.append((endpoint, started, finished))
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
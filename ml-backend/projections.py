@@ -0,0 +1,224 @@
+"""
+Monte Carlo projection of a suggested portfolio.
+
+The portfolio is rebalanced monthly to its target weights, so each month is
+a single lognormal portfolio return whose mean and variance come from the
+per-instrument assumptions below. Savings grow as
+
+    V_T = savings * G_T + monthly contribution * H_T
+
+where G_T is a path's compounded growth and H_T the compounded growth of one
+rupee contributed at the start of every month. G and H depend only on the
+weights and the horizon, so they are simulated once per profile bucket
+(weights rounded to whole percent, horizon in years) and cached; every user
+in the bucket reuses the same paths with their own savings, contribution,
+tax rate and goals applied exactly.
+
+Configuration (environment variables):
+    ML_SIMULATION_PATHS   paths per simulation (default: 20000)
+    ML_SIMULATION_SEED    random seed (default: 0)
+    ML_SIMULATION_CACHE   simulations kept per process (default: 64)
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from schemas import GoalProjection, InvestmentProfile, PortfolioProjection
+from tax_engine import compute_tax
+
+# portfolioAllocation key: (expected annual return, annual volatility, tax treatment)
+ASSET_ASSUMPTIONS = {
+    'ELSS': (0.12, 0.18, 'equity'),
+    'PPF': (0.075, 0.0, 'exempt'),
+    'Equity': (0.13, 0.16, 'equity'),
+    'Hybrid': (0.105, 0.10, 'equity'),
+    'Debt': (0.07, 0.03, 'slab'),
+    'Gold': (0.08, 0.14, 'ltcg'),
+}
+
+# Return correlations; pairs not listed are uncorrelated
+CORRELATIONS = {
+    ('ELSS', 'Equity'): 0.9,
+    ('ELSS', 'Hybrid'): 0.8,
+    ('Equity', 'Hybrid'): 0.8,
+    ('Hybrid', 'Debt'): 0.3,
+    ('ELSS', 'Gold'): -0.1,
+    ('Equity', 'Gold'): -0.1,
+    ('Debt', 'Gold'): 0.1,
+}
+
+# Capital gains tax on redemption at the horizon (before cess)
+EQUITY_LTCG_RATE = 0.125
+EQUITY_LTCG_EXEMPTION = 125000
+LTCG_RATE = 0.125
+CESS_RATE = 0.04
+
+# Goal corpus targets in multiples of annual income, for goals the request gives no amount for
+DEFAULT_GOAL_TARGETS = {
+    'RETIREMENT': 10.0,
+    'WEALTH_BUILDING': 5.0,
+    'HOUSE': 3.0,
+    'HOME': 3.0,
+    'EDUCATION': 2.0,
+    'EMERGENCY_FUND': 0.5,
+}
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Paths kept per year for the trajectory bands
+TRAJECTORY_PATHS = 2000
+
+# Paths simulated per block, bounding temporary memory to a few tens of MB
+_BLOCK_PATHS = 2500
+
+
+def _portfolio_moments(weights: Dict[str, float]) -> Tuple[float, float]:
+    """Expected annual return and volatility of the rebalanced portfolio"""
+    names = list(weights)
+    w = np.array([weights[name] for name in names])
+    mu = np.array([ASSET_ASSUMPTIONS[name][0] for name in names])
+    sigma = np.array([ASSET_ASSUMPTIONS[name][1] for name in names])
+    correlation = np.eye(len(names))
+    for i, a in enumerate(names):
+        for j, b in enumerate(names):
+            if i != j:
+                correlation[i, j] = CORRELATIONS.get((a, b), CORRELATIONS.get((b, a), 0.0))
+    covariance = correlation * np.outer(sigma, sigma)
+    return float(w @ mu), float(np.sqrt(max(w @ covariance @ w, 0.0)))
+
+
+def _simulate(bucket: Tuple[Tuple[str, int], ...], months: int, paths: int, seed: int) -> Dict[str, np.ndarray]:
+    """Growth factors G and H at the horizon for every path, and per year for the first TRAJECTORY_PATHS"""
+    mean, volatility = _portfolio_moments(bucket_weights(bucket))
+    # Lognormal monthly returns matching the annual mean and volatility
+    log_variance = np.log1p(volatility ** 2 / (1 + mean) ** 2)
+    monthly_mu = (np.log1p(mean) - log_variance / 2) / 12
+    monthly_sigma = np.sqrt(log_variance / 12)
+
+    rng = np.random.default_rng(seed)
+    year_ends = np.arange(12, months + 1, 12) - 1
+    growth = np.empty(paths)
+    contributed = np.empty(paths)
+    trajectory_paths = min(paths, TRAJECTORY_PATHS)
+    growth_by_year = np.empty((trajectory_paths, year_ends.size))
+    contributed_by_year = np.empty((trajectory_paths, year_ends.size))
+
+    for start in range(0, paths, _BLOCK_PATHS):
+        stop = min(start + _BLOCK_PATHS, paths)
+        log_growth = np.cumsum(monthly_mu + monthly_sigma * rng.standard_normal((stop - start, months)), axis=1)
+        g = np.exp(log_growth)
+        # A rupee added at the start of month j grows by G_T / G_{j-1}, with G_0 = 1
+        h = g * np.cumsum(np.exp(-np.concatenate([np.zeros((stop - start, 1)), log_growth[:, :-1]], axis=1)), axis=1)
+        growth[start:stop] = g[:, -1]
+        contributed[start:stop] = h[:, -1]
+        if start < trajectory_paths:
+            rows = slice(start, min(stop, trajectory_paths))
+            growth_by_year[rows] = g[:rows.stop - start, year_ends]
+            contributed_by_year[rows] = h[:rows.stop - start, year_ends]
+
+    return {
+        'growth': growth,
+        'contributed': contributed,
+        'growth_by_year': growth_by_year,
+        'contributed_by_year': contributed_by_year,
+        'mean': mean,
+        'volatility': volatility,
+    }
+
+
+simulate = lru_cache(maxsize=int(os.environ.get('ML_SIMULATION_CACHE', 64)))(_simulate)
+
+
+def profile_bucket(allocation: Dict[str, float]) -> Tuple[Tuple[str, int], ...]:
+    """Allocation normalized to 100% and rounded to whole percent, in a stable order"""
+    known = {name: value for name, value in allocation.items() if name in ASSET_ASSUMPTIONS and value > 0}
+    total = sum(known.values())
+    return tuple(sorted((name, int(round(value / total * 100))) for name, value in known.items())) if total else ()
+
+
+def bucket_weights(bucket: Tuple[Tuple[str, int], ...]) -> Dict[str, float]:
+    """Bucket percentages as weights summing to one (rounding can leave them a point off 100)"""
+    total = sum(percent for _, percent in bucket)
+    return {name: percent / total for name, percent in bucket}
+
+
+def _post_tax(values: np.ndarray, invested: float, weights: Dict[str, float], marginal_rate: float) -> np.ndarray:
+    """Portfolio values after tax on gains when everything is redeemed at the horizon"""
+    gains = np.maximum(values - invested, 0.0)
+    share = {treatment: 0.0 for treatment in ('equity', 'ltcg', 'slab', 'exempt')}
+    for name, weight in weights.items():
+        share[ASSET_ASSUMPTIONS[name][2]] += weight
+    tax = (
+        np.maximum(gains * share['equity'] - EQUITY_LTCG_EXEMPTION, 0.0) * EQUITY_LTCG_RATE
+        + gains * share['ltcg'] * LTCG_RATE
+        + gains * share['slab'] * marginal_rate
+    ) * (1 + CESS_RATE)
+    return values - tax
+
+
+def project_portfolio(
+    allocation: Dict[str, float],
+    profile: InvestmentProfile,
+    goal_targets: Optional[Dict[str, float]] = None,
+) -> Optional[PortfolioProjection]:
+    """Percentile outcomes, goal probabilities and post-tax values of the allocation over the profile's horizon"""
+    bucket = profile_bucket(allocation)
+    if not bucket or profile.timeHorizon <= 0:
+        return None
+
+    months = int(profile.timeHorizon) * 12
+    paths = int(os.environ.get('ML_SIMULATION_PATHS', 20000))
+    simulation = simulate(bucket, months, paths, int(os.environ.get('ML_SIMULATION_SEED', 0)))
+    weights = bucket_weights(bucket)
+
+    savings = max(profile.currentSavings, 0.0)
+    contribution = max(profile.monthlyInvestmentCapacity, 0.0)
+    invested = savings + contribution * months
+    values = savings * simulation['growth'] + contribution * simulation['contributed']
+
+    marginal_rate = float(compute_tax(profile.income, 0.0, profile.taxRegime)['marginalRate'])
+    post_tax = _post_tax(values, invested, weights, marginal_rate)
+
+    # Goals with neither a default nor a given target are still listed, with no probability
+    targets = {
+        goal: goal_targets[goal] if goal_targets and goal in goal_targets
+        else DEFAULT_GOAL_TARGETS[goal.upper()] * profile.income if goal.upper() in DEFAULT_GOAL_TARGETS
+        else None
+        for goal in profile.investmentGoals
+    }
+
+    yearly = savings * simulation['growth_by_year'] + contribution * simulation['contributed_by_year']
+    bands = np.percentile(yearly, [10, 50, 90], axis=0) if yearly.size else np.zeros((3, 0))
+
+    return PortfolioProjection(
+        horizonYears=int(profile.timeHorizon),
+        paths=paths,
+        bucket={name: float(percent) for name, percent in bucket},
+        expectedAnnualReturn=simulation['mean'] * 100,
+        annualVolatility=simulation['volatility'] * 100,
+        totalInvested=invested,
+        percentiles=dict(zip((f'p{q}' for q in PERCENTILES), np.percentile(values, PERCENTILES).tolist())),
+        postTaxPercentiles=dict(zip((f'p{q}' for q in PERCENTILES), np.percentile(post_tax, PERCENTILES).tolist())),
+        probabilityOfLoss=float(np.mean(post_tax < invested)),
+        goals=[
+            GoalProjection(
+                goal=goal, target=target, probability=None if target is None else float(np.mean(post_tax >= target))
+            )
+            for goal, target in targets.items()
+        ],
+        trajectory={
+            'year': list(range(1, bands.shape[1] + 1)),
+            'p10': bands[0].tolist(),
+            'p50': bands[1].tolist(),
+            'p90': bands[2].tolist(),
+        },
+    )
+
+
+def simulation_cache_stats() -> Dict[str, int]:
+    """Simulation cache counters of this process"""
+    info = simulate.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize, 'maxEntries': info.maxsize}
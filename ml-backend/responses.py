@@ -0,0 +1,152 @@
+"""
+Response serialization with content negotiation.
+
+Results are encoded straight from the analysis output: pydantic models are
+dumped once and NumPy/pandas values are converted by the encoder itself,
+skipping FastAPI's response-model revalidation and jsonable_encoder pass.
+
+The Accept header picks the format:
+    application/json (default)                  orjson, or the stdlib encoder without it
+    application/msgpack, application/x-msgpack  MessagePack (needs msgpack)
+    application/vnd.apache.arrow.stream         Arrow IPC stream (needs pyarrow)
+
+Payloads that are a dict of equal-length lists become one Arrow column per
+list, with scalar entries kept as JSON schema metadata; anything else is sent
+as a single-row table of nested values.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def _default(value: Any) -> Any:
+    """Fallback conversion for values the encoders do not handle natively"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Series, pd.Index, pd.Categorical)):
+        return np.asarray(value).tolist()
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _plain(content: Any) -> Any:
+    """Top-level pydantic models become dicts; nested values are left to the encoder"""
+    if isinstance(content, BaseModel):
+        return content.model_dump()
+    return content
+
+
+def encode_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            _plain(content),
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(_plain(content), default=_default, ensure_ascii=False).encode()
+
+
+def encode_msgpack(content: Any) -> bytes:
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=406, detail="MessagePack responses need msgpack installed on the server")
+    return msgpack.packb(_plain(content), default=_default, use_bin_type=True)
+
+
+def _arrow_columns(content: Any) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(columns, scalars) when the payload is a dict of equal-length lists plus scalar fields"""
+    if not isinstance(content, dict):
+        return None
+    columns = {key: value for key, value in content.items() if isinstance(value, (list, np.ndarray))}
+    scalars = {key: value for key, value in content.items() if key not in columns}
+    if not columns or len({len(value) for value in columns.values()}) != 1:
+        return None
+    if any(isinstance(value, (dict, list, tuple)) for value in scalars.values()):
+        return None
+    return columns, scalars
+
+
+def encode_arrow(content: Any) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Arrow responses need pyarrow installed on the server")
+
+    content = _plain(content)
+    columnar = _arrow_columns(content)
+    if columnar is not None:
+        columns, scalars = columnar
+        table = pa.table(columns)
+        if scalars:
+            table = table.replace_schema_metadata({key: encode_json(value) for key, value in scalars.items()})
+    else:
+        # Round-trip through JSON types so NumPy scalars and datetimes are normalized
+        table = pa.Table.from_pylist([json.loads(encode_json(content))])
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+_ENCODERS: Dict[str, Tuple[str, Callable[[Any], bytes]]] = {
+    JSON_MEDIA_TYPE: (JSON_MEDIA_TYPE, encode_json),
+    **{media_type: (media_type, encode_msgpack) for media_type in MSGPACK_MEDIA_TYPES},
+    ARROW_MEDIA_TYPE: (ARROW_MEDIA_TYPE, encode_arrow),
+}
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Supported media type with the highest q-value in an Accept header; JSON when nothing matches"""
+    best, best_q = JSON_MEDIA_TYPE, 0.0
+    for item in (accept or '').split(','):
+        media_type, *params = [part.strip() for part in item.split(';')]
+        q = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in _ENCODERS and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def respond(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Serialize content in the format the client asked for"""
+    media_type, encode = _ENCODERS[negotiate(request.headers.get('accept'))]
+    with stage('serialize'):
+        body = encode(content)
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers={'Vary': 'Accept'},
+    )
@@ -1,22 +1,143 @@
 #!/usr/bin/env python3
 """
 TaxBae ML Backend Runner
-Simple script to start the FastAPI server
+Starts the FastAPI server in development or production mode
+
+    python run.py                       development: one process, auto-reload
+    python run.py --prod --workers 4    production: preload, then fork workers sharing one socket
+
+Production mode imports the app, loads models and runs one warm-up analysis
+in the parent before forking, so workers start with everything already in
+(copy-on-write shared) memory and are ready as soon as their startup hooks
+run. Workers that die are replaced. On platforms without fork it falls back
+to uvicorn's own multi-process mode, which imports the app in every worker.
 """
 
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
 import uvicorn
-from main import app
 
-if __name__ == "__main__":
+APP = "main:app"
+
+
+def preload():
+    """Heavy imports, models and lazily initialised pandas/NumPy code paths, done once before fork"""
+    import analysis
+    import main
+    from ingestion import decode_columnar, transactions_frame
+
+    main.model_registry.load_all()
+
+    sample = transactions_frame([
+        {'amount': amount, 'category': category, 'type': kind, 'description': '', 'date': '2024-01-01'}
+        for amount, category, kind in [(100, 'Food', 'EXPENSE'), (900, 'Food', 'EXPENSE'), (50000, 'Salary', 'INCOME')]
+    ])
+    analysis.analyze_expenses(sample)
+    analysis.predict_tax_savings(sample, 1200000)
+    decode_columnar(b'{"transactions": []}')
+    return main.app
+
+
+def listen(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_worker(app, sock: socket.socket, log_level: str) -> None:
+    # Children must not inherit the parent's signal handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_production(host: str, port: int, workers: int, log_level: str) -> None:
+    # Each worker sizes its analysis process pool by its share of the cores (see executors.py)
+    os.environ['ML_WORKERS'] = str(workers)
+    if not hasattr(os, 'fork'):
+        uvicorn.run(APP, host=host, port=port, workers=workers, log_level=log_level)
+        return
+
+    started = time.perf_counter()
+    app = preload()
+    print(f"✅ Preloaded app in {time.perf_counter() - started:.2f}s; forking {workers} worker(s)")
+
+    sock = listen(host, port)
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_worker(app, sock, log_level)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited with status {status}; replacing it")
+            spawn()
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TaxBae ML Backend")
+    parser.add_argument("--prod", action="store_true", help="production mode: preload, multiple workers, no reload")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ML_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.environ.get("ML_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ML_PORT", 8001)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
     print("🚀 Starting TaxBae ML Backend...")
     print("📊 ML services for expense analysis and investment suggestions")
-    print("🔗 Available at: http://localhost:8001")
-    print("📖 API documentation: http://localhost:8001/docs")
-    
-    uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8001,
-        reload=True,
-        log_level="info"
-    )
+    print(f"🔗 Available at: http://localhost:{args.port}")
+    print(f"📖 API documentation: http://localhost:{args.port}/docs")
+
+    if args.prod:
+        serve_production(args.host, args.port, max(1, args.workers), args.log_level)
+    else:
+        uvicorn.run(
+            APP,
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level=args.log_level
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
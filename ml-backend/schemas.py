@@ -0,0 +1,172 @@
+"""
+Request and response models for the ML API.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, NonNegativeFloat
+
+# Data models
+class Transaction(BaseModel):
+    id: Optional[str] = None
+    amount: float
+    category: str
+    type: str  # 'INCOME' or 'EXPENSE'
+    description: str
+    date: str
+    isTaxDeductible: Optional[bool] = False
+    taxSection: Optional[str] = None
+
+class BatchTransaction(Transaction):
+    userId: str
+
+class InvestmentProfile(BaseModel):
+    age: int
+    income: float
+    riskTolerance: str  # 'LOW', 'MEDIUM', 'HIGH'
+    investmentGoals: List[str]
+    timeHorizon: int  # years
+    currentSavings: float
+    monthlyInvestmentCapacity: float
+    taxRegime: str = 'NEW_REGIME'  # slab regime that taxes debt gains in the projection
+
+# Request envelopes; transactions are ingested separately as a columnar frame
+class ExpenseAnalysisParams(BaseModel):
+    userId: Optional[str] = None  # ignored when auth is on: the user comes from the token
+    anomalyMethod: Optional[str] = 'median'  # 'median', 'mad', 'percentile' or 'isolation_forest'
+
+class ExpenseAnalysisRequest(ExpenseAnalysisParams):
+    transactions: List[Transaction]
+    
+class InvestmentSuggestionParams(BaseModel):
+    profile: InvestmentProfile
+    userId: Optional[str] = None  # ignored when auth is on: the user comes from the token
+    goalTargets: Dict[str, float] = {}  # goal -> corpus needed; defaults to a multiple of income for known goals
+
+class PulledInvestmentSuggestionRequest(BaseModel):
+    # Pull mode: the user comes from the path and transactions from the database
+    profile: InvestmentProfile
+    goalTargets: Dict[str, float] = {}
+
+class InvestmentSuggestionRequest(InvestmentSuggestionParams):
+    transactions: List[Transaction]
+
+class DashboardParams(BaseModel):
+    userId: Optional[str] = None  # ignored when auth is on: the user comes from the token
+    sections: Optional[List[str]] = None  # subset of dashboard.SECTIONS; default: all (taxSavings only with annualIncome)
+    anomalyMethod: Optional[str] = 'median'  # 'median', 'mad', 'percentile' or 'isolation_forest'
+    annualIncome: Optional[float] = None  # required for taxSavings
+    taxRegime: str = 'OLD_REGIME'
+    assessmentYear: Optional[str] = None  # latest by default
+    monthlyInvestmentCapacity: Optional[float] = None
+
+class DashboardRequest(DashboardParams):
+    transactions: List[Transaction]
+
+class BatchExpenseAnalysisParams(BaseModel):
+    anomalyMethod: Optional[str] = 'median'  # 'median', 'mad', 'percentile' or 'isolation_forest'
+
+class BatchExpenseAnalysisRequest(BatchExpenseAnalysisParams):
+    transactions: List[BatchTransaction]
+
+class AggregateUpdateParams(BaseModel):
+    deletedIds: List[str] = []
+    anomalyMethod: Optional[str] = 'median'  # 'median' or 'percentile'
+    reset: bool = False  # drop existing aggregates before applying
+
+class AggregateUpdateRequest(AggregateUpdateParams):
+    transactions: List[Transaction]
+
+class TaxBatchRequest(BaseModel):
+    incomes: List[float]
+    deductions: Optional[List[float]] = None  # defaults to 0 for every income
+    regimes: Optional[List[str]] = None  # per income; defaults to `regime`
+    regime: str = 'NEW_REGIME'  # 'OLD_REGIME' or 'NEW_REGIME'
+    assessmentYear: Optional[str] = None  # e.g. '2026-27'; latest by default
+
+class TaxOptimizationRequest(BaseModel):
+    annualIncome: float
+    assessmentYear: Optional[str] = None  # latest by default
+    hraExemption: float = 0  # HRA exemption the user qualifies for; 0 drops the HRA axis
+    currentDeductions: Dict[str, NonNegativeFloat] = {}  # section -> amount already claimed
+    budget: Optional[float] = None  # cash available for 80C, 80D and 80CCD(1B)
+    limits: Dict[str, float] = {}  # section -> limit override (e.g. 80D with senior parents)
+    steps: Dict[str, float] = {}  # section -> grid step override
+    includeSurface: bool = True  # return the full old-regime tax surface
+
+# Response models
+class ExpenseInsight(BaseModel):
+    category: str
+    averageSpending: float
+    trend: str  # 'INCREASING', 'DECREASING', 'STABLE'
+    recommendation: str
+    potentialSavings: float
+
+class InvestmentSuggestion(BaseModel):
+    instrument: str
+    allocation: float  # percentage
+    expectedReturn: float
+    riskLevel: str
+    taxBenefits: str
+    reason: str
+
+class ExpenseAnalysisResponse(BaseModel):
+    insights: List[ExpenseInsight]
+    totalMonthlySpending: float
+    savingsRate: float
+    budgetRecommendations: Dict[str, float]
+    anomalies: List[Dict[str, Any]]
+    
+class GoalProjection(BaseModel):
+    goal: str
+    target: Optional[float]  # None for a goal with no default target and none in goalTargets
+    probability: Optional[float]  # share of paths whose post-tax value reaches the target
+
+class PortfolioProjection(BaseModel):
+    horizonYears: int
+    paths: int
+    bucket: Dict[str, float]  # simulated allocation, whole percent
+    expectedAnnualReturn: float  # percentage
+    annualVolatility: float  # percentage
+    totalInvested: float
+    percentiles: Dict[str, float]  # 'p5' .. 'p95' -> value at the horizon
+    postTaxPercentiles: Dict[str, float]  # after capital gains tax on full redemption
+    probabilityOfLoss: float  # post-tax value below the amount invested
+    goals: List[GoalProjection]
+    trajectory: Dict[str, List[float]]  # 'year', 'p10', 'p50', 'p90'
+
+class InvestmentSuggestionResponse(BaseModel):
+    suggestions: List[InvestmentSuggestion]
+    portfolioAllocation: Dict[str, float]
+    expectedAnnualReturn: float
+    taxSavings: float
+    projection: Optional[PortfolioProjection] = None
+
+class BatchExpenseAnalysisResponse(BaseModel):
+    results: Dict[str, ExpenseAnalysisResponse]  # keyed by userId
+    userCount: int
+
+class TaxBatchResponse(BaseModel):
+    assessmentYear: str
+    taxableIncome: List[float]
+    tax: List[float]
+    cess: List[float]
+    totalTax: List[float]
+    marginalRate: List[float]
+
+class TaxAllocation(BaseModel):
+    regime: str
+    allocation: Dict[str, float]  # section -> amount
+    totalTax: float
+    outlay: float  # cash invested, excluding HRA
+    savings: float  # against the current position under its better regime
+
+class TaxOptimizationResponse(BaseModel):
+    assessmentYear: str
+    sections: List[str]  # grid axis order
+    axes: Dict[str, List[float]]
+    gridSize: int
+    oldRegimeTax: Optional[List[float]]  # row-major over `sections`
+    newRegimeTax: float
+    currentTax: Dict[str, float]  # by regime
+    optimal: TaxAllocation
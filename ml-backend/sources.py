@@ -0,0 +1,295 @@
+"""
+Pull mode: read a user's transactions straight from the database.
+
+Instead of the Node backend loading Transaction rows through Prisma, encoding
+them as JSON and posting them here, pull-mode endpoints receive only a user
+id and an optional date range and fetch the rows themselves. Each query
+aggregates every column into one array (array_agg in Postgres,
+json_group_array in SQLite), so a fetch is a single row of column arrays
+that become NumPy arrays directly, with no per-row record objects. The frame
+has the columns and dtypes of an ingested JSON payload, dates as ISO strings
+of the naive UTC timestamps Prisma stores, plus the 'month' column streamed
+uploads carry, so the analyses never parse dates.
+
+Sources are pluggable: PostgresSource reads the Prisma `transactions` table
+through an asyncpg connection pool opened per worker process at startup, and
+SQLiteSource is a stand-in with the same table for tests and benchmarks.
+
+Configuration (environment variables):
+    ML_DATA_SOURCE        'none' (default), 'postgres' or 'sqlite'
+    ML_DATABASE_URL       Postgres DSN (default: DATABASE_URL)
+    ML_DB_POOL_MIN        connections opened at startup (default: 1)
+    ML_DB_POOL_MAX        connection bound per worker process (default: 10)
+    ML_DB_TIMEOUT         query timeout in seconds (default: 30)
+    ML_SQLITE_PATH        database file for the sqlite source (default: transactions.db)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+import pandas as pd
+
+from metrics import add_rows, stage
+
+# Prisma `Transaction` model as created by its migrations (quoted camelCase columns)
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    "id" TEXT PRIMARY KEY,
+    "userId" TEXT NOT NULL,
+    "type" TEXT NOT NULL,
+    "amount" REAL NOT NULL,
+    "category" TEXT NOT NULL,
+    "description" TEXT NOT NULL,
+    "date" TEXT NOT NULL,
+    "isTaxDeductible" INTEGER NOT NULL DEFAULT 0,
+    "taxSection" TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_user_date ON transactions ("userId", "date");
+'''
+
+# Fetched columns in query order; 'date' arrives as seconds since the epoch (UTC)
+_COLUMNS = ('id', 'amount', 'category', 'type', 'description', 'date', 'isTaxDeductible', 'taxSection')
+
+_POSTGRES_QUERY = '''
+SELECT array_agg("id"), array_agg("amount"), array_agg("category"), array_agg("type"::text),
+       array_agg("description"), array_agg(extract(epoch FROM "date")::float8),
+       array_agg("isTaxDeductible"), array_agg("taxSection")
+FROM (
+    SELECT * FROM transactions
+    WHERE "userId" = $1
+      AND "date" >= coalesce($2::timestamp, '-infinity')
+      AND "date" < coalesce($3::timestamp, 'infinity')
+    ORDER BY "date", "id"
+) AS rows
+'''
+
+_SQLITE_QUERY = '''
+SELECT json_group_array("id"), json_group_array("amount"), json_group_array("category"), json_group_array("type"),
+       json_group_array("description"), json_group_array((julianday("date") - 2440587.5) * 86400.0),
+       json_group_array("isTaxDeductible"), json_group_array("taxSection")
+FROM (
+    SELECT * FROM transactions
+    WHERE "userId" = ?
+      AND (? IS NULL OR julianday("date") >= julianday(?))
+      AND (? IS NULL OR julianday("date") < julianday(?))
+    ORDER BY "date", "id"
+)
+'''
+
+
+class DataSourceError(RuntimeError):
+    """Raised when the transaction source cannot be reached or queried"""
+
+
+def columns_frame(columns: Sequence[Optional[Sequence[Any]]]) -> pd.DataFrame:
+    """Transaction frame (as ingestion builds it, plus 'month') from one fetched array per column in _COLUMNS order"""
+    arrays = dict(zip(_COLUMNS, ([] if values is None else values for values in columns)))
+    dates = np.round(np.asarray(arrays['date'], dtype=float) * 1000).astype('datetime64[ms]')
+    return pd.DataFrame({
+        'id': np.asarray(arrays['id'], dtype=object),
+        'amount': np.asarray(arrays['amount'], dtype=float),
+        'category': pd.Categorical(np.asarray(arrays['category'], dtype=object)),
+        'type': pd.Categorical(np.asarray(arrays['type'], dtype=object)),
+        'description': np.asarray(arrays['description'], dtype=object),
+        'date': np.datetime_as_string(dates, unit='ms').astype(object),
+        'isTaxDeductible': np.asarray(arrays['isTaxDeductible'], dtype=bool),
+        'taxSection': np.asarray(arrays['taxSection'], dtype=object),
+        'month': dates.astype('datetime64[M]').astype('datetime64[s]'),
+    })
+
+
+def _asyncpg_dsn(url: str) -> Tuple[str, Dict[str, str]]:
+    """Prisma's DATABASE_URL without its `schema` parameter, which asyncpg would send as a server setting"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    schema = [value for key, value in query if key == 'schema']
+    dsn = urlunsplit(parts._replace(query=urlencode([(key, value) for key, value in query if key != 'schema'])))
+    return dsn, {'search_path': schema[0]} if schema else {}
+
+
+class TransactionSource:
+    """Interface of a database that pull-mode endpoints read transactions from"""
+
+    name = 'none'
+
+    async def start(self) -> None:
+        """Open connections; called once per worker process at startup, raises DataSourceError"""
+
+    async def close(self) -> None:
+        """Release connections at shutdown"""
+
+    async def _fetch_columns(self, user_id: str, start: Optional[datetime], end: Optional[datetime]) -> Sequence[Any]:
+        raise NotImplementedError
+
+    async def fetch(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+        """The user's transactions dated in [start, end), oldest first"""
+        # Prisma stores naive UTC timestamps
+        start, end = (
+            bound.astimezone(timezone.utc).replace(tzinfo=None) if bound is not None and bound.tzinfo else bound
+            for bound in (start, end)
+        )
+        with stage('fetch'):
+            columns = await self._fetch_columns(user_id, start, end)
+        with stage('frame'):
+            frame = columns_frame(columns)
+        add_rows(len(frame))
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {'source': self.name}
+
+    @classmethod
+    def from_env(cls) -> Optional['TransactionSource']:
+        """The source named by ML_DATA_SOURCE, None when pull mode is off"""
+        kind = os.environ.get('ML_DATA_SOURCE', 'none')
+        max_size = int(os.environ.get('ML_DB_POOL_MAX', 10))
+        timeout = float(os.environ.get('ML_DB_TIMEOUT', 30))
+        if kind == 'none':
+            return None
+        if kind == 'postgres':
+            dsn = os.environ.get('ML_DATABASE_URL') or os.environ.get('DATABASE_URL')
+            if not dsn:
+                raise ValueError("ML_DATA_SOURCE=postgres needs ML_DATABASE_URL or DATABASE_URL")
+            return PostgresSource(dsn, int(os.environ.get('ML_DB_POOL_MIN', 1)), max_size, timeout)
+        if kind == 'sqlite':
+            return SQLiteSource(os.environ.get('ML_SQLITE_PATH', 'transactions.db'), max_size, timeout)
+        raise ValueError(f"Unknown ML_DATA_SOURCE '{kind}'")
+
+
+class PostgresSource(TransactionSource):
+    """The Node backend's Postgres database, through an asyncpg pool"""
+
+    name = 'postgres'
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, timeout: float = 30.0):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pool = None
+        self._errors: tuple = (OSError, asyncio.TimeoutError)
+        # Requests that find no pool (database down at startup) wait for one connect attempt, not one each
+        self._start_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        # Imported on first use so deployments without pull mode do not need the driver
+        import asyncpg
+
+        self._errors = (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError)
+        async with self._start_lock:
+            if self._pool is not None:
+                return
+            dsn, server_settings = _asyncpg_dsn(self.dsn)
+            try:
+                self._pool = await asyncpg.create_pool(
+                    dsn, min_size=self.min_size, max_size=self.max_size,
+                    command_timeout=self.timeout, server_settings=server_settings
+                )
+            except self._errors as e:
+                raise DataSourceError(f"Could not connect to Postgres: {e}") from e
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _fetch_columns(self, user_id: str, start: Optional[datetime], end: Optional[datetime]) -> Sequence[Any]:
+        try:
+            # A database that was down at startup is retried on the next request
+            if self._pool is None:
+                await self.start()
+            async with self._pool.acquire() as connection:
+                return await connection.fetchrow(_POSTGRES_QUERY, user_id, start, end)
+        except self._errors as e:
+            raise DataSourceError(f"Postgres query failed: {e}") from e
+
+    def stats(self) -> Dict[str, Any]:
+        if self._pool is None:
+            return {'source': self.name, 'open': False}
+        return {
+            'source': self.name,
+            'open': True,
+            'connections': self._pool.get_size(),
+            'idle': self._pool.get_idle_size(),
+            'maxConnections': self.max_size,
+        }
+
+
+class SQLiteSource(TransactionSource):
+    """Stand-in with the same `transactions` table in a SQLite file, for tests and benchmarks"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_size: int = 4, timeout: float = 30.0):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[sqlite3.Connection] = []
+
+    async def start(self) -> None:
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.max_size):
+            connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            connection.executescript(SQLITE_SCHEMA)
+            self._connections.append(connection)
+            self._idle.put_nowait(connection)
+
+    async def close(self) -> None:
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._idle = None
+
+    @staticmethod
+    def _query(connection: sqlite3.Connection, user_id: str, start: Optional[str], end: Optional[str]) -> List[Any]:
+        row = connection.execute(_SQLITE_QUERY, (user_id, start, start, end, end)).fetchone()
+        return [json.loads(column) for column in row]
+
+    async def _fetch_columns(self, user_id: str, start: Optional[datetime], end: Optional[datetime]) -> Sequence[Any]:
+        if self._idle is None:
+            raise DataSourceError("SQLite source is not open")
+        connection = await self._idle.get()
+        try:
+            return await asyncio.to_thread(
+                self._query, connection, user_id,
+                start.isoformat() if start else None, end.isoformat() if end else None
+            )
+        except sqlite3.Error as e:
+            raise DataSourceError(f"SQLite query failed: {e}") from e
+        finally:
+            self._idle.put_nowait(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'source': self.name,
+            'open': self._idle is not None,
+            'connections': len(self._connections),
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'maxConnections': self.max_size,
+        }
+
+
+def write_sqlite(path: str, transactions_df: pd.DataFrame) -> None:
+    """Insert a frame with userId into a SQLite stand-in database, creating the table if needed"""
+    columns = ['id', 'userId', 'type', 'amount', 'category', 'description', 'date', 'isTaxDeductible', 'taxSection']
+    frame = transactions_df[columns].astype(object).where(transactions_df[columns].notna(), None)
+    names = ', '.join(f'"{column}"' for column in columns)
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            connection.executescript(SQLITE_SCHEMA)
+            connection.executemany(
+                f'INSERT OR REPLACE INTO transactions ({names}) VALUES ({", ".join("?" * len(columns))})',
+                frame.itertuples(index=False, name=None),
+            )
+    finally:
+        connection.close()
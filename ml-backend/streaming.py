@@ -0,0 +1,125 @@
+"""
+Bounded-memory handling of streamed transaction uploads.
+
+NDJSON and Arrow IPC uploads arrive as validated chunks. Each chunk is split
+in two: the columns the analyses aggregate over (user, type, category, amount,
+plus the month of the date) are kept as a compact columnar frame of roughly
+30 bytes per row, while the text columns (id, description, date) are spooled
+to a temporary file. The
+analyses then run on the compact frame exactly as they would on a fully
+parsed body, so results are identical, and only the spooled chunks that hold
+flagged anomalies are read back.
+
+Exact medians and percentiles need every amount, so the compact columns still
+grow with the upload; everything else is bounded by the chunk size.
+"""
+
+import asyncio
+import os
+import pickle
+import tempfile
+from typing import AsyncIterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from forecasting import expense_months
+from ingestion import concat_frames, empty_transactions_frame
+
+# Columns written to the spool and read back for flagged rows
+SPOOLED_COLUMNS = ('id', 'description', 'date')
+
+# Columns kept in memory for the expense analyses
+EXPENSE_COLUMNS = ('type', 'category', 'amount')
+
+
+class SpoolReader:
+    """Reads spooled text columns back for selected rows; small enough to pickle into a worker process"""
+
+    def __init__(self, path: str, starts: List[int], offsets: List[int]):
+        self.path = path
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.offsets = offsets
+
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        columns = {column: np.empty(rows.size, dtype=object) for column in SPOOLED_COLUMNS}
+        chunk_ids = np.searchsorted(self.starts, rows, side='right') - 1
+        with open(self.path, 'rb') as f:
+            for chunk in np.unique(chunk_ids).tolist():
+                f.seek(self.offsets[chunk])
+                data = pickle.load(f)
+                mask = chunk_ids == chunk
+                local_rows = rows[mask] - self.starts[chunk]
+                for column in SPOOLED_COLUMNS:
+                    columns[column][mask] = data[column][local_rows]
+        return pd.DataFrame(columns)
+
+    def __call__(self, flagged_df: pd.DataFrame) -> pd.DataFrame:
+        """`details` hook for flag_anomalies"""
+        return self.take(flagged_df['row'].to_numpy(dtype=np.int64))
+
+
+class StreamedTransactions:
+    """Compact in-memory columns plus a disk spool for one streamed upload"""
+
+    def __init__(self, columns: Sequence[str] = EXPENSE_COLUMNS):
+        self.columns = list(columns)
+        self.rows = 0
+        self._frames: List[pd.DataFrame] = []
+        self._starts: List[int] = []
+        self._offsets: List[int] = []
+        fd, self.path = tempfile.mkstemp(prefix='ml-stream-', suffix='.spool')
+        self._spool = os.fdopen(fd, 'wb')
+
+    def __enter__(self) -> 'StreamedTransactions':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def add(self, frame: pd.DataFrame) -> None:
+        """Fold one validated chunk in"""
+        if frame.empty:
+            return
+        self._frames.append(frame[self.columns].assign(
+            month=expense_months(frame).astype('datetime64[s]'),
+            row=np.arange(self.rows, self.rows + len(frame)),
+        ))
+        self._starts.append(self.rows)
+        self._offsets.append(self._spool.tell())
+        pickle.dump(
+            {column: frame[column].to_numpy(dtype=object) for column in SPOOLED_COLUMNS},
+            self._spool,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        self.rows += len(frame)
+
+    async def consume(self, frames: AsyncIterator[pd.DataFrame]) -> None:
+        """Fold every chunk in, each in a thread so date parsing and spooling do not block the event loop"""
+        async for frame in frames:
+            await asyncio.to_thread(self.add, frame)
+
+    def frame(self) -> pd.DataFrame:
+        """Compact frame over all chunks, with the month and global row position of every transaction"""
+        if not self._frames:
+            empty = empty_transactions_frame()
+            return pd.DataFrame({
+                **{column: empty[column] if column in empty else pd.Categorical([]) for column in self.columns},
+                'month': np.empty(0, dtype='datetime64[s]'),
+                'row': np.empty(0, dtype=np.int64),
+            })
+        return concat_frames(self._frames)
+
+    def details(self) -> SpoolReader:
+        self._spool.flush()
+        return SpoolReader(self.path, self._starts, self._offsets)
+
+    def close(self) -> None:
+        self._spool.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
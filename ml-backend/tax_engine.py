@@ -0,0 +1,171 @@
+"""
+Table-driven Indian income tax engine.
+
+Slab tables are plain data keyed by (regime, assessment year), and every
+calculation works on NumPy arrays: slab lookup is a searchsorted over the
+slab thresholds followed by a piecewise-linear evaluation, so one call prices
+any number of (income, deductions) pairs.
+
+Modelled: slabs, standard deduction for salaried income, whether Chapter VI-A
+deductions are allowed, the Section 87A rebate (with marginal relief in the
+new regime) and the 4% health and education cess. Not modelled: surcharge on
+incomes above ₹50L and the higher old-regime exemption for senior citizens.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+REGIMES = ('OLD_REGIME', 'NEW_REGIME')
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+@dataclass(frozen=True)
+class SlabTable:
+    regime: str
+    assessment_year: str
+    thresholds: Tuple[float, ...]  # lower bound of each slab, starting at 0
+    rates: Tuple[float, ...]  # rate applied within each slab
+    standard_deduction: float
+    rebate_limit: float  # 87A applies when taxable income is at most this
+    rebate_max: float
+    rebate_marginal_relief: bool
+    allows_deductions: bool  # 80C, 80D, 80CCD(1B), HRA, ...
+    cess_rate: float = 0.04
+
+    def base_tax(self) -> np.ndarray:
+        """Tax accumulated at the start of each slab"""
+        thresholds = np.asarray(self.thresholds, dtype=float)
+        rates = np.asarray(self.rates, dtype=float)
+        return np.concatenate([[0.0], np.cumsum(np.diff(thresholds) * rates[:-1])])
+
+
+_OLD_REGIME_SLABS = dict(
+    thresholds=(0, 250000, 500000, 1000000),
+    rates=(0.0, 0.05, 0.20, 0.30),
+    standard_deduction=50000,
+    rebate_limit=500000,
+    rebate_max=12500,
+    rebate_marginal_relief=False,
+    allows_deductions=True,
+)
+
+TAX_TABLES: Dict[Tuple[str, str], SlabTable] = {
+    (table.regime, table.assessment_year): table
+    for table in [
+        SlabTable('OLD_REGIME', '2024-25', **_OLD_REGIME_SLABS),
+        SlabTable('OLD_REGIME', '2025-26', **_OLD_REGIME_SLABS),
+        SlabTable('OLD_REGIME', '2026-27', **_OLD_REGIME_SLABS),
+        SlabTable(
+            'NEW_REGIME', '2024-25',
+            thresholds=(0, 300000, 600000, 900000, 1200000, 1500000),
+            rates=(0.0, 0.05, 0.10, 0.15, 0.20, 0.30),
+            standard_deduction=50000,
+            rebate_limit=700000,
+            rebate_max=25000,
+            rebate_marginal_relief=True,
+            allows_deductions=False,
+        ),
+        SlabTable(
+            'NEW_REGIME', '2025-26',
+            thresholds=(0, 300000, 700000, 1000000, 1200000, 1500000),
+            rates=(0.0, 0.05, 0.10, 0.15, 0.20, 0.30),
+            standard_deduction=75000,
+            rebate_limit=700000,
+            rebate_max=25000,
+            rebate_marginal_relief=True,
+            allows_deductions=False,
+        ),
+        SlabTable(
+            'NEW_REGIME', '2026-27',
+            thresholds=(0, 400000, 800000, 1200000, 1600000, 2000000, 2400000),
+            rates=(0.0, 0.05, 0.10, 0.15, 0.20, 0.25, 0.30),
+            standard_deduction=75000,
+            rebate_limit=1200000,
+            rebate_max=60000,
+            rebate_marginal_relief=True,
+            allows_deductions=False,
+        ),
+    ]
+}
+
+ASSESSMENT_YEARS = tuple(sorted({year for _, year in TAX_TABLES}))
+LATEST_ASSESSMENT_YEAR = ASSESSMENT_YEARS[-1]
+
+
+def tax_table(regime: str = 'NEW_REGIME', assessment_year: Optional[str] = None) -> SlabTable:
+    """Slab table for a regime and assessment year (latest year by default)"""
+    key = (regime, assessment_year or LATEST_ASSESSMENT_YEAR)
+    if key not in TAX_TABLES:
+        raise ValueError(
+            f"No tax table for {key[0]} in AY {key[1]}. "
+            f"Regimes: {', '.join(REGIMES)}; assessment years: {', '.join(ASSESSMENT_YEARS)}"
+        )
+    return TAX_TABLES[key]
+
+
+def taxable_income(income: ArrayLike, deductions: ArrayLike, table: SlabTable) -> np.ndarray:
+    income = np.asarray(income, dtype=float)
+    deductions = np.asarray(deductions, dtype=float) if table.allows_deductions else 0.0
+    return np.maximum(0.0, income - table.standard_deduction - deductions)
+
+
+def slab_tax(taxable: np.ndarray, table: SlabTable) -> Tuple[np.ndarray, np.ndarray]:
+    """Tax before rebate and cess, evaluated piecewise over the slab table, and the slab rate"""
+    thresholds = np.asarray(table.thresholds, dtype=float)
+    rates = np.asarray(table.rates, dtype=float)
+    slab = np.searchsorted(thresholds, taxable, side='right') - 1
+    return table.base_tax()[slab] + (taxable - thresholds[slab]) * rates[slab], rates[slab]
+
+
+def compute_tax(
+    income: ArrayLike,
+    deductions: ArrayLike = 0.0,
+    regime: str = 'NEW_REGIME',
+    assessment_year: Optional[str] = None,
+) -> Dict[str, np.ndarray]:
+    """Tax breakdown for arrays of (income, deductions) under one slab table"""
+    table = tax_table(regime, assessment_year)
+    taxable = taxable_income(income, deductions, table)
+    tax, marginal_rate = slab_tax(taxable, table)
+
+    # Section 87A rebate, plus marginal relief just above the rebate limit
+    within_limit = taxable <= table.rebate_limit
+    tax = np.where(within_limit, np.maximum(0.0, tax - table.rebate_max), tax)
+    if table.rebate_marginal_relief:
+        tax = np.where(within_limit, tax, np.minimum(tax, taxable - table.rebate_limit))
+
+    cess = tax * table.cess_rate
+
+    return {
+        'taxableIncome': taxable,
+        'tax': tax,
+        'cess': cess,
+        'totalTax': tax + cess,
+        'marginalRate': np.where(tax > 0, marginal_rate, 0.0),
+    }
+
+
+def compute_tax_batch(
+    incomes: ArrayLike,
+    deductions: ArrayLike = 0.0,
+    regimes: Union[str, Sequence[str]] = 'NEW_REGIME',
+    assessment_year: Optional[str] = None,
+) -> Dict[str, np.ndarray]:
+    """compute_tax over many taxpayers whose regimes may differ, one vectorized pass per regime"""
+    incomes = np.asarray(incomes, dtype=float)
+    deductions = np.broadcast_to(np.asarray(deductions, dtype=float), incomes.shape)
+    regimes = np.broadcast_to(np.asarray(regimes, dtype=object), incomes.shape)
+
+    result = {
+        key: np.zeros(incomes.shape)
+        for key in ('taxableIncome', 'tax', 'cess', 'totalTax', 'marginalRate')
+    }
+    for regime in np.unique(regimes):
+        mask = regimes == regime
+        breakdown = compute_tax(incomes[mask], deductions[mask], regime, assessment_year)
+        for key, values in breakdown.items():
+            result[key][mask] = values
+    return result
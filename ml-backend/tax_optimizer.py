@@ -0,0 +1,173 @@
+"""
+What-if tax optimization over a grid of deduction scenarios.
+
+Each deductible section is one axis of the grid (0 up to its limit in fixed
+steps). The whole grid is priced with a single vectorized compute_tax call,
+which gives the old-regime tax surface; the new regime ignores these
+deductions, so it is a single number. The optimal allocation is the cheapest
+grid point (by cash outlay) that reaches the lowest tax within the budget.
+"""
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+from tax_engine import compute_tax, tax_table
+
+# Section -> statutory limit; HRA has no fixed limit, the exemption comes from the caller
+DEDUCTION_LIMITS: Dict[str, float] = {
+    '80C': 150000,
+    '80D': 25000,  # self and family below 60; callers override for senior parents
+    '80CCD(1B)': 50000,
+    'HRA': 0,
+}
+
+# Default slider step per section
+GRID_STEPS: Dict[str, float] = {
+    '80C': 5000,
+    '80D': 2500,
+    '80CCD(1B)': 5000,
+    'HRA': 10000,
+}
+
+# HRA is rent already paid, so claiming it is not an extra cash outlay
+CASH_SECTIONS = ('80C', '80D', '80CCD(1B)')
+
+# Refuse grids that would not answer within an interactive budget
+MAX_GRID_POINTS = 2_000_000
+
+
+class GridTooLargeError(ValueError):
+    """Raised when the requested grid exceeds MAX_GRID_POINTS"""
+
+
+class InvalidGridError(ValueError):
+    """Raised for a grid step that is not a positive finite number or a limit that is not finite"""
+
+
+def axis_length(limit: float, step: float) -> float:
+    """Points on the axis from 0 to `limit` in `step`s, limit included, without building it"""
+    if limit <= 0:
+        return 1
+    points = limit / step
+    # Not rounded up to an int yet: limit / step may overflow to inf
+    return points + 1 if points > MAX_GRID_POINTS else math.ceil(points) + 1
+
+
+def grid_axes(limits: Dict[str, float], steps: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Values per section from 0 to its limit; the limit itself is always on the grid"""
+    resolved = {}
+    for section, limit in limits.items():
+        step = steps.get(section)
+        if step is None:
+            step = limit or 1
+        if not math.isfinite(step) or step <= 0:
+            raise InvalidGridError(f"Grid step for {section} must be a positive finite number, got {step}")
+        if not math.isfinite(limit):
+            raise InvalidGridError(f"Limit for {section} must be finite, got {limit}")
+        resolved[section] = (limit, step)
+
+    # Size the grid before allocating any axis
+    size = math.prod(axis_length(limit, step) for limit, step in resolved.values())
+    if size > MAX_GRID_POINTS:
+        shown = f"{int(size)}" if math.isfinite(size) else "too many"
+        raise GridTooLargeError(f"Grid has {shown} points; the maximum is {MAX_GRID_POINTS}. Use larger steps")
+
+    axes = {}
+    for section, (limit, step) in resolved.items():
+        values = np.arange(0.0, limit, step)
+        axes[section] = np.append(values, float(limit)) if limit > 0 else np.zeros(1)
+    return axes
+
+
+def scenario_axes(
+    hra_exemption: float = 0.0,
+    limits: Optional[Dict[str, float]] = None,
+    steps: Optional[Dict[str, float]] = None,
+) -> Dict[str, np.ndarray]:
+    """Grid axes for the default limits and steps with caller overrides applied"""
+    return grid_axes(
+        {**DEDUCTION_LIMITS, 'HRA': hra_exemption, **(limits or {})},
+        {**GRID_STEPS, **(steps or {})},
+    )
+
+
+def _broadcast(axes: Dict[str, np.ndarray], sections) -> np.ndarray:
+    """Sum of the given axes, broadcast over the full grid"""
+    ndim = len(axes)
+    total = np.zeros((1,) * ndim)
+    for dim, (section, values) in enumerate(axes.items()):
+        if section in sections:
+            shape = [1] * ndim
+            shape[dim] = values.size
+            total = total + values.reshape(shape)
+    return np.broadcast_to(total, tuple(axis.size for axis in axes.values())).ravel()
+
+
+def optimize_tax(
+    annual_income: float,
+    assessment_year: Optional[str] = None,
+    hra_exemption: float = 0.0,
+    current_deductions: Optional[Dict[str, float]] = None,
+    budget: Optional[float] = None,
+    limits: Optional[Dict[str, float]] = None,
+    steps: Optional[Dict[str, float]] = None,
+    include_surface: bool = True,
+) -> dict:
+    """Price every deduction scenario under both regimes and pick the best allocation"""
+    old_table = tax_table('OLD_REGIME', assessment_year)
+    new_table = tax_table('NEW_REGIME', assessment_year)
+
+    axes = scenario_axes(hra_exemption, limits, steps)
+    sections = list(axes)
+
+    deductions = _broadcast(axes, sections)
+    outlay = _broadcast(axes, CASH_SECTIONS)
+    old_tax = compute_tax(annual_income, deductions, old_table.regime, old_table.assessment_year)['totalTax']
+    new_tax = float(compute_tax(annual_income, 0.0, new_table.regime, new_table.assessment_year)['totalTax'])
+
+    # Current position, each section clamped to its limit
+    current = {
+        section: min(float((current_deductions or {}).get(section, 0.0)), float(axes[section][-1]))
+        for section in sections
+    }
+    current_old_tax = float(compute_tax(
+        annual_income, sum(current.values()), old_table.regime, old_table.assessment_year
+    )['totalTax'])
+    current_tax = min(current_old_tax, new_tax)
+
+    # Lowest tax within budget, then the least cash needed to reach it
+    feasible = old_tax if budget is None else np.where(outlay <= budget, old_tax, np.inf)
+    best_tax = float(feasible.min())
+    candidates = np.flatnonzero(feasible <= best_tax + 0.5)
+    best = int(candidates[np.argmin(outlay[candidates])])
+    index = np.unravel_index(best, tuple(axis.size for axis in axes.values()))
+
+    if new_tax < best_tax:
+        optimal = {
+            'regime': new_table.regime,
+            'allocation': {section: 0.0 for section in sections},
+            'totalTax': new_tax,
+            'outlay': 0.0,
+        }
+    else:
+        optimal = {
+            'regime': old_table.regime,
+            'allocation': {section: float(axes[section][i]) for section, i in zip(sections, index)},
+            'totalTax': best_tax,
+            'outlay': float(outlay[best]),
+        }
+    optimal['savings'] = current_tax - optimal['totalTax']
+
+    return {
+        'assessmentYear': old_table.assessment_year,
+        'sections': sections,
+        'axes': {section: values.tolist() for section, values in axes.items()},
+        'gridSize': int(deductions.size),
+        'oldRegimeTax': old_tax.tolist() if include_surface else None,
+        'newRegimeTax': new_tax,
+        'currentTax': {old_table.regime: current_old_tax, new_table.regime: new_tax},
+        'optimal': optimal,
+    }
+
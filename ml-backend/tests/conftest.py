@@ -0,0 +1,65 @@
+"""
+Shared fixtures for the ML backend tests.
+
+The app is configured through the environment at import time, so the
+defaults below are set before any test module imports main: a known JWT
+secret, a throwaway model directory, no process pool and no periodic
+retraining. Tests build transactions with the seeded generator the
+benchmarks use.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')]
+
+TEST_JWT_SECRET = 'test-secret'
+
+os.environ.setdefault('ML_JWT_SECRET', TEST_JWT_SECRET)
+os.environ.setdefault('ML_MODEL_DIR', tempfile.mkdtemp(prefix='ml-models-'))
+os.environ.setdefault('ML_CACHE_BACKEND', 'memory')
+os.environ.setdefault('ML_PROCESS_WORKERS', '0')
+os.environ.setdefault('ML_ANOMALY_RETRAIN_SECONDS', '0')
+
+import pytest  # noqa: E402
+from jose import jwt  # noqa: E402
+
+from synthetic import generate_transactions, to_records  # noqa: E402
+
+
+def token(user_id: str = 'user-0', **claims) -> str:
+    return jwt.encode({'userId': user_id, **claims}, os.environ['ML_JWT_SECRET'], algorithm='HS256')
+
+
+def bearer(user_id: str = 'user-0', **claims) -> dict:
+    return {'Authorization': f'Bearer {token(user_id, **claims)}'}
+
+
+@pytest.fixture(scope='session')
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    """Results cached by one test must not answer another's request"""
+    yield
+    if 'main' in sys.modules:
+        sys.modules['main'].result_cache.clear()
+
+
+@pytest.fixture(scope='session')
+def transactions_df():
+    return generate_transactions(3000, seed=7)
+
+
+@pytest.fixture(scope='session')
+def records(transactions_df):
+    return to_records(transactions_df)
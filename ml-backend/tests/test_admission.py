@@ -0,0 +1,169 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import main
+from admission import BASE_ROWS, BYTES_PER_ROW, AdmissionController, AdmissionMiddleware, Rejected
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+def test_estimate_weighs_rows_by_endpoint():
+    controller = AdmissionController(concurrency=1, memory_factor=9.0)
+    cost, memory = controller.estimate('/analyze/expenses', 1000 * BYTES_PER_ROW)
+    assert (cost, memory) == (1000 + BASE_ROWS, 9 * 1000 * BYTES_PER_ROW)
+    assert controller.estimate('/tax/calculate', 1000 * BYTES_PER_ROW)[0] == pytest.approx(0.1 * cost)
+    assert controller.estimate('/analyze/expenses', None)[1] > memory
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv('ML_ADMISSION_CONCURRENCY', '3')
+    monkeypatch.setenv('ML_ADMISSION_MEMORY_MB', '64')
+    monkeypatch.setenv('ML_ADMISSION_QUEUE', '5')
+    monkeypatch.setenv('ML_ADMISSION_EXEMPT', '/health, /ready')
+    monkeypatch.setenv('ML_ADMISSION', '0')
+    controller = AdmissionController.from_env()
+    assert (controller.concurrency, controller.memory_budget, controller.queue_size) == (3, 64 * 2**20, 5)
+    assert controller.exempt == {'/health', '/ready'} and not controller.enabled
+
+
+def test_queue_is_fifo_and_bounded():
+    controller = AdmissionController(concurrency=1, queue_size=2, max_wait=5)
+
+    async def main():
+        running = await controller.acquire(1, 0)
+        first = asyncio.ensure_future(controller.acquire(1, 0))
+        second = asyncio.ensure_future(controller.acquire(1, 0))
+        await _until(lambda: controller.queued == 2)
+
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(1, 0)
+        assert rejected.value.status == 429 and rejected.value.retry_after >= 1
+
+        controller.release(running)
+        admitted = await first
+        assert not second.done() and controller.in_flight == 1
+        controller.release(admitted)
+        controller.release(await second)
+
+    asyncio.run(main())
+    assert controller.rejected == {429: 1, 503: 0}
+    assert (controller.in_flight, controller.memory_in_flight, controller.queued) == (0, 0, 0)
+    assert controller.admitted_total == 3
+
+
+def test_memory_budget_admits_an_oversized_request_alone():
+    controller = AdmissionController(concurrency=4, memory_budget=100, max_wait=5)
+
+    async def main():
+        large = await controller.acquire(1, 1000)
+        small = asyncio.ensure_future(controller.acquire(1, 10))
+        await _until(lambda: controller.queued == 1)
+        controller.release(large)
+        controller.release(await small)
+
+    asyncio.run(main())
+    assert controller.in_flight == 0
+
+
+def test_shed_before_queueing_when_the_expected_wait_is_too_long():
+    controller = AdmissionController(concurrency=1, max_wait=1)
+
+    async def main():
+        running = await controller.acquire(10000, 0)
+        controller.seconds_per_row = 0.001
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(1, 0)
+        controller.release(running, measure=False)
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status == 503 and rejected.retry_after == 10
+    assert controller.queued == 0
+
+
+def test_queued_request_times_out_and_cancelled_waiters_leave_the_queue():
+    controller = AdmissionController(concurrency=1, max_wait=0.05)
+
+    async def main():
+        running = await controller.acquire(1, 0)
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire(1, 0)
+        assert rejected.value.status == 503
+
+        waiter = asyncio.ensure_future(controller.acquire(1, 0))
+        await _until(lambda: controller.queued == 1)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued == 0
+        controller.release(running)
+
+    asyncio.run(main())
+    assert controller.rejected[503] == 1 and controller.in_flight == 0
+    assert controller.seconds_per_row is not None
+
+
+def test_middleware_answers_429_and_503_with_retry_after():
+    controller = AdmissionController(concurrency=1, queue_size=1, max_wait=0.2)
+    app = FastAPI()
+
+    async def main():
+        gate = asyncio.Event()
+
+        @app.post('/slow')
+        async def slow():
+            await gate.wait()
+            return {'ok': True}
+
+        @app.get('/health')
+        async def health():
+            return {'status': 'ok'}
+
+        asgi = AdmissionMiddleware(app, app.router, controller)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url='http://test') as client:
+            running = asyncio.ensure_future(client.post('/slow', json=[{'amount': 1}]))
+            await _until(lambda: controller.in_flight == 1)
+            queued = asyncio.ensure_future(client.post('/slow', json=[{'amount': 2}]))
+            await _until(lambda: controller.queued == 1)
+
+            full = await client.post('/slow', json=[{'amount': 3}])
+            exempt = await client.get('/health')
+            timed_out = await queued
+            gate.set()
+            return full, exempt, timed_out, await running
+
+    full, exempt, timed_out, admitted = asyncio.run(main())
+    assert full.status_code == 429 and int(full.headers['retry-after']) >= 1
+    assert 'Too many requests' in full.json()['detail']
+    assert exempt.status_code == 200
+    assert timed_out.status_code == 503 and int(timed_out.headers['retry-after']) >= 1
+    assert admitted.status_code == 200
+    assert controller.stats()['rejected'] == {'429': 1, '503': 1}
+    assert controller.in_flight == 0
+
+
+def test_app_reports_admission_stats(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.json()['admission']['inFlight'] == 0
+
+
+def test_shed_responses_carry_cors_headers(client, monkeypatch):
+    async def shed(cost, memory):
+        raise Rejected(429, 3, "Too many requests waiting for analysis capacity")
+
+    monkeypatch.setattr(main.admission, 'acquire', shed)
+    response = client.post(
+        '/analyze/expenses', json={'transactions': []}, headers={'Origin': 'http://localhost:3000'}
+    )
+
+    assert response.status_code == 429
+    assert response.headers['access-control-allow-origin'] == 'http://localhost:3000'
+    assert response.headers['retry-after'] == '3'
+    assert 'retry-after' in response.headers['access-control-expose-headers'].lower()
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+import analysis
+from aggregates import AggregateStore, QuantileSketch
+from conftest import bearer
+from ingestion import transactions_frame
+
+
+def test_sketch_quantiles_within_accuracy():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    values = list(range(1, 1001))
+    sketch.update(values)
+    assert sketch.quantile(0.5) == pytest.approx(500, rel=0.02)
+
+    sketch.update(list(range(501, 1001)), sign=-1)
+    assert sketch.count == 500
+    assert sketch.quantile(0.5) == pytest.approx(250, rel=0.02)
+
+
+def test_appended_history_matches_full_analysis(records):
+    store = AggregateStore()
+    for offset in range(0, len(records), 700):
+        store.append('u', transactions_frame(records[offset:offset + 700]), [])
+
+    full = analysis.analyze_expenses(transactions_frame(records))
+    incremental = store.expense_analysis('u')
+
+    assert incremental.totalMonthlySpending == pytest.approx(full.totalMonthlySpending)
+    assert incremental.savingsRate == pytest.approx(full.savingsRate)
+    assert [(i.category, i.trend) for i in incremental.insights] == [(i.category, i.trend) for i in full.insights]
+    for ours, theirs in zip(incremental.insights, full.insights):
+        assert ours.averageSpending == pytest.approx(theirs.averageSpending)
+
+    ours = store.spending_pattern('u')['monthlySpending']
+    theirs = analysis.analyze_spending_pattern(transactions_frame(records))['monthlySpending']
+    assert [(row['month'], row['category']) for row in ours] == [(row['month'], row['category']) for row in theirs]
+    assert [row['amount'] for row in ours] == pytest.approx([row['amount'] for row in theirs])
+
+
+def test_edits_and_deletes_are_taken_back_out(records):
+    store = AggregateStore()
+    store.append('u', transactions_frame(records[:100]), [])
+    expenses = [r for r in records[:100] if r['type'] == 'EXPENSE']
+    edited = {**expenses[0], 'amount': expenses[0]['amount'] + 1000}
+    store.append('u', transactions_frame([edited]), [expenses[1]['id']])
+
+    expected = [edited if r['id'] == edited['id'] else r for r in records[:100] if r['id'] != expenses[1]['id']]
+    assert store.expense_analysis('u').totalMonthlySpending == pytest.approx(
+        analysis.analyze_expenses(transactions_frame(expected)).totalMonthlySpending
+    )
+
+
+def test_analyses_run_outside_the_store_lock(records, monkeypatch):
+    store = AggregateStore()
+    store.append('u', transactions_frame(records[:200]), [])
+    lock_held = []
+
+    original = analysis.spending_pattern_from_stats
+
+    def spy(*args, **kwargs):
+        lock_held.append(store._lock.locked())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr('aggregates.spending_pattern_from_stats', spy)
+    store.spending_pattern('u')
+    assert lock_held == [False]
+
+
+def test_unknown_user_is_none():
+    store = AggregateStore()
+    assert store.expense_analysis('nobody') is None
+    assert store.spending_pattern('nobody') is None
+
+
+def test_aggregate_endpoints(client, records):
+    headers = bearer('agg-user')
+    appended = client.post('/aggregates/agg-user/transactions', json={'transactions': records[:500]}, headers=headers)
+    assert appended.status_code == 200
+    assert appended.json()['transactionCount'] == 500
+
+    main_thread = threading.get_ident()
+    import main
+    threads = []
+    original = main.aggregate_store.expense_analysis
+    main.aggregate_store.expense_analysis = lambda user_id: threads.append(threading.get_ident()) or original(user_id)
+    try:
+        response = client.get('/aggregates/agg-user/analyze/expenses', headers=headers)
+    finally:
+        del main.aggregate_store.expense_analysis
+    assert response.status_code == 200
+    assert threads and threads[0] != main_thread
+
+    assert client.get('/aggregates/agg-user/analyze/spending-pattern', headers=headers).status_code == 200
+    assert client.get('/aggregates/agg-user/analyze/expenses', headers=bearer('someone-else')).status_code == 403
+    assert client.delete('/aggregates/agg-user', headers=headers).status_code == 200
+    assert client.get('/aggregates/agg-user/analyze/expenses', headers=headers).status_code == 404
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import flag_anomalies
+
+
+def _expenses(amounts_by_category):
+    rows = [
+        (category, amount)
+        for category, amounts in amounts_by_category.items()
+        for amount in amounts
+    ]
+    return pd.DataFrame({
+        'id': [f'txn-{i}' for i in range(len(rows))],
+        'amount': [amount for _, amount in rows],
+        'category': [category for category, _ in rows],
+        'description': ['d'] * len(rows),
+        'date': ['2024-01-01'] * len(rows),
+    })
+
+
+def _iterrows_median_rule(expenses_df):
+    """The original per-row loop of /analyze/expenses"""
+    anomalies = []
+    medians = expenses_df.groupby('category')['amount'].median()
+    for _, transaction in expenses_df.iterrows():
+        median = medians.get(transaction['category'], 0)
+        if transaction['amount'] > median * 3:
+            anomalies.append({
+                'transaction_id': transaction['id'],
+                'amount': transaction['amount'],
+                'category': transaction['category'],
+                'description': transaction['description'],
+                'date': transaction['date'],
+                'reason': f"Amount is {transaction['amount'] / median:.1f}x higher than usual for this category",
+                'severity': 'HIGH' if transaction['amount'] > median * 5 else 'MEDIUM'
+            })
+    return anomalies
+
+
+def test_median_rule_matches_row_loop(transactions_df):
+    expenses_df = transactions_df[transactions_df['type'] == 'EXPENSE'].reset_index(drop=True)
+    assert flag_anomalies(expenses_df, 'median')[1] == _iterrows_median_rule(expenses_df)
+
+
+def test_mad_rule_constant_category_with_spike():
+    expenses_df = _expenses({'⚡ Utilities': [1500.0] * 11 + [9000.0], '🍕 Food & Dining': [400.0, 420.0, 380.0]})
+
+    rows, anomalies = flag_anomalies(expenses_df, 'mad')
+
+    assert rows.tolist() == [11]
+    assert anomalies[0]['amount'] == 9000.0
+    assert anomalies[0]['severity'] == 'HIGH'
+    assert 'inf' not in anomalies[0]['reason'] and 'nan' not in anomalies[0]['reason']
+    score = float(anomalies[0]['reason'].split()[2])
+    assert math.isfinite(score) and score > 5
+
+
+def test_mad_rule_all_equal_amounts_flags_nothing():
+    expenses_df = _expenses({'🏠 Housing & Rent': [25000.0] * 6})
+    rows, anomalies = flag_anomalies(expenses_df, 'mad')
+    assert rows.size == 0 and anomalies == []
+
+
+def test_mad_rule_only_flags_above_median():
+    expenses_df = _expenses({'🛒 Shopping': [1000.0] * 8 + [10.0, 12000.0]})
+    rows, _ = flag_anomalies(expenses_df, 'mad')
+    assert expenses_df['amount'].to_numpy()[rows].tolist() == [12000.0]
+
+
+def test_percentile_rule_flags_top_of_category():
+    expenses_df = _expenses({'🛒 Shopping': list(np.arange(1.0, 101.0))})
+    rows, anomalies = flag_anomalies(expenses_df, 'percentile')
+    assert expenses_df['amount'].to_numpy()[rows].tolist() == [96.0, 97.0, 98.0, 99.0, 100.0]
+    assert [a['severity'] for a in anomalies] == ['MEDIUM'] * 4 + ['HIGH']
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        flag_anomalies(_expenses({'a': [1.0]}), 'zscore')
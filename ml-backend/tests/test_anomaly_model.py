@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+from anomaly_model import ANOMALY_MODEL_NAME, AnomalyRetrainer, TrainingPool, train_anomaly_model
+from conftest import bearer
+from model_registry import VERSION_PATTERN, ModelRegistry
+
+
+def test_reservoir_keeps_every_expense_until_full(transactions_df):
+    pool = TrainingPool(capacity=100000, seed=0)
+    pool.add(transactions_df, 'user-0')
+    expenses = transactions_df[transactions_df['type'] == 'EXPENSE']
+
+    assert len(pool) == pool.seen == len(expenses)
+    assert sorted(pool.snapshot()['amount']) == sorted(expenses['amount'])
+
+    small = TrainingPool(capacity=100, seed=0)
+    small.add(transactions_df, 'user-0')
+    assert len(small) == 100 and small.seen == len(expenses)
+
+
+def test_offer_adds_on_the_drain_thread(transactions_df, monkeypatch):
+    pool = TrainingPool(seed=0)
+    threads = []
+    add = pool.add
+    monkeypatch.setattr(pool, 'add', lambda *args: (threads.append(threading.current_thread().name), add(*args)))
+
+    pool.offer(transactions_df, 'user-0')
+    pool.offer(transactions_df, 'user-1')
+    pool.flush()
+
+    assert threads == ['anomaly-pool', 'anomaly-pool']
+    assert pool.seen == 2 * int((transactions_df['type'] == 'EXPENSE').sum())
+
+
+def test_offer_skips_frames_when_the_queue_is_full(transactions_df):
+    pool = TrainingPool(seed=0, queue_size=1)
+    with pool._lock:
+        pool.offer(transactions_df)
+        # The drain thread takes the first frame and waits for the lock
+        deadline = time.monotonic() + 5
+        while pool._pending.qsize() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.offer(transactions_df)
+        pool.offer(transactions_df)
+    pool.flush()
+
+    assert pool.skipped == 1
+    assert pool.seen == 2 * int((transactions_df['type'] == 'EXPENSE').sum())
+
+
+def test_requests_offer_frames_to_the_pool(client, records):
+    pool = main.anomaly_retrainer.pool
+    pool.flush()
+    seen = pool.seen
+
+    client.post('/analyze/expenses', json={'transactions': records}, headers=bearer())
+    pool.flush()
+
+    assert pool.seen - seen == sum(record['type'] == 'EXPENSE' for record in records)
+
+
+def test_version_ids_are_unique_and_valid():
+    versions = {AnomalyRetrainer.new_version() for _ in range(100)}
+    assert len(versions) == 100
+    assert all(VERSION_PATTERN.fullmatch(version) for version in versions)
+
+
+def test_only_one_retrainer_per_model_directory(tmp_path, transactions_df):
+    registry = ModelRegistry(str(tmp_path))
+    first = AnomalyRetrainer(registry, TrainingPool(), min_rows=10**9)
+    second = AnomalyRetrainer(registry, TrainingPool(), min_rows=0)
+    second.pool.add(transactions_df, 'user-0')
+    try:
+        assert first.acquire_leadership()
+        assert not second.acquire_leadership()
+        assert asyncio.run(second.retrain()) is None
+        assert second.last_error == 'another worker process is retraining this model'
+        assert second.status()['leader'] is False
+
+        first.stop()
+        assert second.acquire_leadership()
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_training_publishes_a_loadable_version(tmp_path, transactions_df):
+    pool = TrainingPool(seed=0)
+    pool.add(transactions_df.assign(userId='user-0'))
+    version = AnomalyRetrainer.new_version()
+
+    train_anomaly_model(pool.snapshot(), str(tmp_path), version, n_estimators=10)
+
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.current_version(ANOMALY_MODEL_NAME) == version
+    assert registry.load(ANOMALY_MODEL_NAME).model.n_features_in_ == 5
+
+
+def test_retrain_needs_admin_rights(client):
+    assert client.post('/models/anomaly_detector/retrain', headers=bearer()).status_code == 403
+
+
+@pytest.mark.parametrize('headers', [{'role': 'admin'}, {'roles': ['admin']}])
+def test_retrain_with_admin_rights(client, monkeypatch, headers):
+    monkeypatch.setattr(main.anomaly_retrainer, 'min_rows', 10**9)
+    response = client.post('/models/anomaly_detector/retrain', headers=bearer(**headers))
+    assert response.status_code == 409
+    assert main.anomaly_retrainer.is_leader
@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from auth import AuthNotConfiguredError, InvalidTokenError, KeyStore, TokenVerifier
+from conftest import bearer
+
+SECRET = 'unit-secret'
+
+
+def _verifier(**options):
+    return TokenVerifier(KeyStore(secret=SECRET), **options)
+
+
+def _hs256(claims, secret=SECRET, **headers):
+    return jwt.encode(claims, secret, algorithm='HS256', headers=headers or None)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _forged_hs256(claims, secret: str) -> str:
+    """HS256 token signed with any string, which jose itself refuses to do with a PEM key"""
+    signing_input = f"{_b64(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())}.{_b64(json.dumps(claims).encode())}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f'{signing_input}.{_b64(signature)}'
+
+
+@pytest.fixture(scope='module')
+def rsa_pem():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private, public
+
+
+def test_node_backend_tokens_verify():
+    now = int(time.time())
+    claims = _verifier().verify(_hs256({'userId': 'u1', 'email': 'u1@example.com', 'iat': now, 'exp': now + 60}))
+    assert claims['userId'] == 'u1' and claims['email'] == 'u1@example.com'
+    assert _verifier().verify(_hs256({'sub': 'u2'}))['userId'] == 'u2'
+
+
+@pytest.mark.parametrize('token', [
+    _hs256({'userId': 'u1'}, secret='wrong'),
+    _hs256({'userId': 'u1', 'exp': int(time.time()) - 10}),
+    _hs256({'email': 'no-user@example.com'}),
+    _hs256({'userId': ''}),
+    'not.a.jwt',
+])
+def test_invalid_tokens_are_rejected_and_not_cached(token):
+    verifier = _verifier()
+    for _ in range(2):
+        with pytest.raises(InvalidTokenError):
+            verifier.verify(token)
+    assert verifier.failures == 2 and verifier.stats()['cachedTokens'] == 0
+
+
+def test_leeway_allows_clock_skew():
+    token = _hs256({'userId': 'u1', 'exp': int(time.time()) - 5})
+    assert _verifier(leeway=30).verify(token)['userId'] == 'u1'
+
+
+def test_audience_and_issuer():
+    verifier = _verifier(audience='ml-backend', issuer='taxbae')
+    assert verifier.verify(_hs256({'userId': 'u1', 'aud': 'ml-backend', 'iss': 'taxbae'}))['userId'] == 'u1'
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(_hs256({'userId': 'u1', 'aud': 'other', 'iss': 'taxbae'}))
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(_hs256({'userId': 'u1', 'aud': 'ml-backend'}))
+
+
+def test_cache_hits_until_expiry(monkeypatch):
+    verifier = _verifier(cache_ttl=300)
+    now = time.time()
+    token = _hs256({'userId': 'u1', 'exp': int(now) + 60})
+
+    verifier.verify(token)
+    verifier.verify(token)
+    assert (verifier.hits, verifier.misses) == (1, 1)
+
+    # Past the token's own expiry the cached claims are dropped and the token is verified again
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    try:
+        verifier.verify(token)
+    except InvalidTokenError:
+        pass
+    assert (verifier.hits, verifier.misses) == (1, 2)
+
+
+def test_cache_is_bounded():
+    verifier = _verifier(cache_size=2)
+    for user in ('a', 'b', 'c'):
+        verifier.verify(_hs256({'userId': user}))
+    assert verifier.stats()['cachedTokens'] == 2
+
+
+def test_rs256_public_key_cannot_be_used_as_hmac_secret(tmp_path, rsa_pem):
+    private, public = rsa_pem
+    key_file = tmp_path / 'public.pem'
+    key_file.write_text(public)
+    verifier = TokenVerifier(KeyStore(public_key_file=str(key_file)))
+
+    assert verifier.verify(jwt.encode({'userId': 'u1'}, private, algorithm='RS256'))['userId'] == 'u1'
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(_forged_hs256({'userId': 'u1'}, public))
+
+
+def test_jwks_keys_are_picked_by_kid(tmp_path, rsa_pem):
+    private, public = rsa_pem
+    jwks = {'keys': [
+        {**jwk.construct(public, 'RS256').to_dict(), 'kid': 'rsa-1', 'alg': 'RS256'},
+        {**jwk.construct('shared-1', 'HS256').to_dict(), 'kid': 'hmac-1', 'alg': 'HS256'},
+    ]}
+    jwks_file = tmp_path / 'jwks.json'
+    jwks_file.write_text(json.dumps(jwks))
+    verifier = TokenVerifier(KeyStore(jwks_file=str(jwks_file)))
+
+    assert verifier.verify(jwt.encode({'userId': 'u1'}, private, algorithm='RS256', headers={'kid': 'rsa-1'}))['userId'] == 'u1'
+    assert verifier.verify(_hs256({'userId': 'u2'}, secret='shared-1', kid='hmac-1'))['userId'] == 'u2'
+    with pytest.raises(InvalidTokenError):
+        # Right kid, wrong algorithm for that key
+        verifier.verify(_hs256({'userId': 'u3'}, secret='shared-1', kid='rsa-1'))
+
+
+def test_rotated_secret_file_drops_cached_tokens(tmp_path):
+    secret_file = tmp_path / 'secret'
+    secret_file.write_text('first')
+    verifier = TokenVerifier(KeyStore(secret_file=str(secret_file), check_seconds=0))
+    old = _hs256({'userId': 'u1'}, secret='first')
+    verifier.verify(old)
+
+    secret_file.write_text('second')
+    os.utime(secret_file, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(old)
+    assert verifier.verify(_hs256({'userId': 'u1'}, secret='second'))['userId'] == 'u1'
+    assert verifier.keys.reloads == 1
+
+
+def test_missing_keys_and_disabled_auth():
+    with pytest.raises(AuthNotConfiguredError):
+        TokenVerifier(KeyStore()).verify(_hs256({'userId': 'u1'}))
+    assert TokenVerifier(KeyStore(), enabled=False).verify('anything') == {'userId': None}
+
+
+@pytest.mark.parametrize('claims, admin_token, expected', [
+    ({'userId': 'u1'}, None, False),
+    ({'userId': 'u1', 'role': 'admin'}, None, True),
+    ({'userId': 'u1', 'roles': ['user', 'admin']}, None, True),
+    ({'userId': 'u1', 'scope': 'read admin'}, None, True),
+    ({'userId': 'u1', 'scope': 'administrator'}, None, False),
+    ({'userId': 'u1'}, 'ops', True),
+    ({'userId': 'u1'}, 'nope', False),
+])
+def test_admin_rights(claims, admin_token, expected):
+    assert _verifier(admin_token='ops').is_admin(claims, admin_token) is expected
+    assert _verifier().is_admin(claims, admin_token) is (expected and admin_token is None)
+
+
+def test_disabled_auth_grants_admin_only_when_configured(monkeypatch):
+    disabled = TokenVerifier(KeyStore(), enabled=False)
+    assert not disabled.is_admin(disabled.verify('anything'))
+    assert TokenVerifier(KeyStore(), enabled=False, admin_token='ops').is_admin({'userId': None}, 'ops')
+    assert TokenVerifier(KeyStore(), enabled=False, admin_when_disabled=True).is_admin({'userId': None})
+
+    monkeypatch.setenv('ML_AUTH_DISABLED', '1')
+    monkeypatch.setenv('ML_AUTH_DISABLED_ADMIN', '1')
+    assert TokenVerifier.from_env().is_admin({'userId': None})
+    monkeypatch.delenv('ML_AUTH_DISABLED_ADMIN')
+    assert not TokenVerifier.from_env().is_admin({'userId': None})
+
+
+def test_failures_are_counted_across_threads():
+    verifier = _verifier()
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: pytest.raises(InvalidTokenError, verifier.verify, _hs256({'userId': 'u1'}, 'x')),
+                      range(200)))
+    assert verifier.stats()['failures'] == 200
+
+
+def test_endpoint_rejects_bad_tokens(client):
+    assert client.post('/analyze/spending-pattern', json=[], headers={'Authorization': 'Bearer nope'}).status_code == 401
+    # 403 or 401 for a missing header, depending on the FastAPI version
+    assert client.post('/analyze/spending-pattern', json=[]).status_code in (401, 403)
+    assert client.post('/analyze/spending-pattern', json=[], headers=bearer()).status_code == 200
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from conftest import bearer
+from synthetic import generate_transactions, to_records
+
+
+@pytest.fixture(scope='module')
+def users_df():
+    # Users start and stop at different times, so their monthly series cover different windows
+    frames = [generate_transactions(1500, seed=seed, users=1, years=years, start=start) for seed, years, start in (
+        (1, 3, '2021-04-01'), (2, 1, '2023-04-01'), (3, 2, '2022-01-01'),
+    )]
+    for user, frame in enumerate(frames):
+        frame['userId'] = f'user-{user}'
+        frame['id'] = f'u{user}-' + frame['id']
+    return pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('method', ['median', 'mad', 'percentile'])
+def test_batch_matches_single_user_endpoint(client, users_df, method):
+    batch = client.post(
+        '/analyze/expenses/batch',
+        json={'anomalyMethod': method, 'transactions': to_records(users_df, user_id=True)},
+        headers=bearer(),
+    )
+    assert batch.status_code == 200
+    results = batch.json()['results']
+    assert batch.json()['userCount'] == 3
+
+    for user, user_df in users_df.groupby('userId'):
+        single = client.post(
+            '/analyze/expenses', json={'anomalyMethod': method, 'transactions': to_records(user_df)}, headers=bearer(user)
+        )
+        assert single.status_code == 200
+        assert results[user] == single.json()
+
+
+def test_batch_rejects_unknown_anomaly_method(client, users_df):
+    response = client.post(
+        '/analyze/expenses/batch',
+        json={'anomalyMethod': 'zscore', 'transactions': to_records(users_df.head(10), user_id=True)},
+        headers=bearer(),
+    )
+    assert response.status_code == 400
+
+
+def test_batch_requires_user_ids(client, records):
+    response = client.post('/analyze/expenses/batch', json={'transactions': records[:5]}, headers=bearer())
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 'transactions', 0, 'userId']
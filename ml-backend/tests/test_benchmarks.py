@@ -0,0 +1,68 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import endpoints
+from synthetic import EXPENSE_CATEGORIES, INCOME_CATEGORIES, generate_transactions, to_records
+
+
+def test_generator_is_deterministic():
+    first = generate_transactions(5000, seed=3, users=4)
+    pd.testing.assert_frame_equal(first, generate_transactions(5000, seed=3, users=4))
+    assert not first['amount'].equals(generate_transactions(5000, seed=4, users=4)['amount'])
+
+
+def test_generator_shape():
+    transactions_df = generate_transactions(5000, seed=1, users=4)
+
+    assert len(transactions_df) == 5000 and transactions_df['id'].is_unique
+    assert set(transactions_df['userId']) == {f'user-{i}' for i in range(4)}
+    assert transactions_df['date'].is_monotonic_increasing
+    assert '2022-04-01' <= transactions_df['date'].min() and transactions_df['date'].max() < '2025-04-01'
+    expenses = transactions_df['type'] == 'EXPENSE'
+    assert set(transactions_df.loc[expenses, 'category']) <= set(EXPENSE_CATEGORIES)
+    assert set(transactions_df.loc[~expenses, 'category']) <= set(INCOME_CATEGORIES)
+    assert (transactions_df['amount'] > 0).all()
+    assert (transactions_df['isTaxDeductible'] == transactions_df['taxSection'].notna()).all()
+
+
+def test_records_drop_user_id_unless_batch():
+    transactions_df = generate_transactions(10, seed=0)
+    assert 'userId' not in to_records(transactions_df)[0]
+    assert to_records(transactions_df, user_id=True)[0]['userId'] == 'user-0'
+
+
+def test_percentile_interpolates():
+    assert endpoints.percentile([4, 1, 3, 2], 50) == 2.5
+    assert endpoints.percentile([1, 2, 3, 4], 0) == 1
+    assert endpoints.percentile([1, 2, 3, 4], 100) == 4
+    assert endpoints.percentile([7], 99) == 7
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {
+        'a@1000': {'status': 200, 'p50_ms': 100.0, 'p95_ms': 200.0, 'peak_rss_mb': 500.0},
+        'b@1000': {'status': 200, 'p50_ms': 100.0, 'p95_ms': 200.0, 'peak_rss_mb': 500.0},
+        'c@1000': {'status': 200, 'p50_ms': 100.0, 'p95_ms': 200.0, 'peak_rss_mb': 500.0},
+    }
+    results = {
+        'a@1000': {'status': 200, 'p50_ms': 105.0, 'p95_ms': 150.0, 'peak_rss_mb': 500.0},
+        'b@1000': {'status': 200, 'p50_ms': 130.0, 'p95_ms': 200.0, 'peak_rss_mb': 500.0},
+        'c@1000': {'status': 500},
+        'new@1000': {'status': 200, 'p50_ms': 1.0, 'p95_ms': 1.0, 'peak_rss_mb': 1.0},
+    }
+    assert endpoints.compare(results, baseline, tolerance=0.1) == [
+        'b@1000 p50_ms 100.0 -> 130.0 (+30%)',
+        'c@1000 now fails with HTTP 500',
+    ]
+
+
+@pytest.mark.parametrize('case', [case for case in endpoints._cases() if not case.name.startswith('pull/')],
+                         ids=lambda case: case.name)
+def test_cases_succeed_through_asgi(client, case):
+    import main
+
+    transactions_df = generate_transactions(300, seed=5)
+    statuses = [asyncio.run(endpoints.call(main.app, payload))[0] for payload in case.build(transactions_df, 300)]
+    assert statuses == [200] * len(statuses)
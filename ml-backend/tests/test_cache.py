@@ -0,0 +1,106 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import cache
+from cache import DiskBackend, MemoryBackend, ResultCache
+from conftest import bearer
+from ingestion import transactions_frame
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return ResultCache(DiskBackend(str(tmp_path)), ttl=60)
+
+
+def _only_entry(directory):
+    (name,) = [name for name in os.listdir(directory) if name.endswith('.pkl')]
+    return os.path.join(directory, name)
+
+
+def test_key_ignores_json_formatting_and_key_order(records):
+    reordered = [dict(reversed(list(record.items()))) for record in records[:100]]
+    assert ResultCache.key('/x', transactions_frame(records[:100]), 'median') == \
+        ResultCache.key('/x', transactions_frame(reordered), 'median')
+    assert ResultCache.key('/x', transactions_frame(records[:100]), 'median') != \
+        ResultCache.key('/x', transactions_frame(records[:100]), 'mad')
+    assert ResultCache.key('/x', transactions_frame(records[:100])) != ResultCache.key('/y', transactions_frame(records[:100]))
+
+
+def test_key_changes_with_cache_version(monkeypatch):
+    frame = pd.DataFrame({'amount': [1.0]})
+    before = ResultCache.key('/x', frame)
+    monkeypatch.setattr(cache, 'CACHE_VERSION', cache.CACHE_VERSION + '-next')
+    assert ResultCache.key('/x', frame) != before
+
+
+def test_memory_backend_lru_and_ttl():
+    result_cache = ResultCache(MemoryBackend(max_entries=2), ttl=60)
+    for key in 'abc':
+        result_cache.set(key, {'key': key})
+    assert result_cache.get('a') is None
+    assert result_cache.get('c') == {'key': 'c'}
+
+    result_cache.backend.set('d', b'', time.time() - 1)
+    assert result_cache.backend.get('d') is None
+
+
+def test_disk_round_trip_and_expiry(disk_cache, tmp_path):
+    disk_cache.set('k', {'value': 1})
+    assert disk_cache.get('k') == {'value': 1}
+
+    disk_cache.backend.set('old', b'x', time.time() - 1)
+    assert disk_cache.backend.get('old') is None
+    assert not os.path.exists(tmp_path / 'old.pkl')
+
+
+@pytest.mark.parametrize('truncate_to', [0, 4, 12])
+def test_truncated_disk_entry_is_a_miss(disk_cache, tmp_path, truncate_to):
+    disk_cache.set('k', {'value': list(range(100))})
+    path = _only_entry(tmp_path)
+    with open(path, 'r+b') as f:
+        f.truncate(truncate_to)
+
+    assert disk_cache.get('k') is None
+    assert disk_cache.misses == 1
+    assert not os.path.exists(path)
+
+
+def test_corrupt_pickle_is_a_miss(disk_cache, tmp_path):
+    disk_cache.backend.set('k', b'not a pickle', time.time() + 60)
+    assert disk_cache.get('k') is None
+    assert not os.listdir(tmp_path)
+
+
+def test_entry_evicted_during_read_is_a_miss(disk_cache, monkeypatch):
+    disk_cache.set('k', {'value': 1})
+
+    def evicted(path, *args):
+        os.unlink(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(cache.os, 'utime', evicted)
+    assert disk_cache.get('k') is None
+
+
+def test_disk_write_failure_is_not_an_error(disk_cache, monkeypatch):
+    def full(*args):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(cache.os, 'replace', full)
+    disk_cache.set('k', {'value': 1})
+    assert disk_cache.get('k') is None
+
+
+def test_endpoint_serves_repeats_from_cache(client, records):
+    import main
+
+    hits = main.result_cache.hits
+    first = client.post('/analyze/spending-pattern', json=records, headers=bearer())
+    second = client.post('/analyze/spending-pattern', json=records, headers=bearer())
+
+    assert first.status_code == second.status_code == 200
+    assert main.result_cache.hits == hits + 1
+    assert {**first.json(), 'analysisDate': None} == {**second.json(), 'analysisDate': None}
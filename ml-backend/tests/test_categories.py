@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from categories import (
+    CATEGORIES, INVESTMENT_CLASSES, OTHER_INVESTMENTS, canonical_category, category_code, category_codes,
+    classifier_cache_stats, investment_code, investment_codes, normalize,
+)
+from synthetic import EXPENSE_CATEGORIES
+
+
+def test_normalize_drops_emoji_and_punctuation():
+    assert normalize('🍕 Food & Dining') == 'food dining'
+    assert normalize('  EMI/Loans!! ') == 'emi loans'
+
+
+@pytest.mark.parametrize('raw, category', [
+    ('Food', '🍕 Food & Dining'),
+    ('groceries', '🍕 Food & Dining'),
+    ('Mutual Fund SIP', '📈 Investments'),
+    ('LIC premium', '🛡️ Insurance'),
+    ('Car loan EMI', '🏦 EMI & Loans'),
+    # Both insurance and health match: the class listed first wins
+    ('Health insurance', '🛡️ Insurance'),
+    ('Movies', '🎬 Entertainment'),
+    # Whole words only: 'sip' is not a keyword inside 'gossip'
+    ('gossip', None),
+    # Splitting a bill is not buying equity, and a prefix of a keyword is not the keyword
+    ('Cab share', '🚗 Transportation'),
+    ('Share of rent', '🏠 Housing & Rent'),
+    ('Shared ride', None),
+    ('Golden Temple trip', '✈️ Travel'),
+    ('Goldsmith', None),
+    ('Shares', '📈 Investments'),
+    ('', None),
+])
+def test_raw_categories(raw, category):
+    assert canonical_category(raw) == category
+
+
+def test_app_categories_map_to_themselves():
+    for name in EXPENSE_CATEGORIES:
+        if name != '💰 Other':
+            assert canonical_category(name) == name
+
+
+def test_columns_are_classified_per_distinct_value():
+    category_code.cache_clear()
+    values = pd.Series(['Food', 'Rent', None, 'Food', 'unknown'] * 1000)
+
+    codes = category_codes(values)
+
+    assert codes[:5].tolist() == [
+        CATEGORIES.index('🍕 Food & Dining'), CATEGORIES.index('🏠 Housing & Rent'), -1,
+        CATEGORIES.index('🍕 Food & Dining'), -1,
+    ]
+    assert codes.size == 5000
+    stats = classifier_cache_stats()['categories']
+    assert stats['misses'] == 3 and stats['entries'] == 3
+
+    category_codes(values)
+    assert classifier_cache_stats()['categories']['hits'] == 3
+
+
+@pytest.mark.parametrize('raw', ['Cab share', 'Share of rent', 'Shared ride', 'Golden Temple trip', 'Debtor payment'])
+def test_everyday_words_name_no_investment(raw):
+    assert investment_code(raw) == -1
+
+
+@pytest.mark.parametrize('raw, investment', [
+    ('Gold ETF', 'Gold'), ('Sovereign gold bonds', 'Gold'), ('Shares', 'Equity'), ('Share market', 'Equity'),
+])
+def test_instruments_name_their_class(raw, investment):
+    assert INVESTMENT_CLASSES[investment_code(raw)] == investment
+
+
+def test_investment_classes_from_category_then_description():
+    transactions_df = pd.DataFrame({
+        'category': ['📈 Investments', '📈 Investments', 'PPF', 'Gold ETF', '🍕 Food & Dining', '📈 Investments'],
+        'description': ['ELSS SIP', 'NPS contribution', 'anything', 'x', 'ELSS SIP', 'misc'],
+    })
+    classes = [INVESTMENT_CLASSES[code] if code >= 0 else None for code in investment_codes(transactions_df)]
+    assert classes == ['ELSS', 'NPS', 'PPF', 'Gold', None, OTHER_INVESTMENTS]
+
+
+def test_investment_codes_without_descriptions():
+    codes = investment_codes(pd.DataFrame({'category': ['📈 Investments', 'Debt fund']}))
+    assert codes.tolist() == [INVESTMENT_CLASSES.index(OTHER_INVESTMENTS), INVESTMENT_CLASSES.index('Debt')]
+    assert investment_code('nothing here') == -1
+    assert isinstance(codes, np.ndarray)
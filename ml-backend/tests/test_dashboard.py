@@ -0,0 +1,79 @@
+import pytest
+
+import analysis
+from analysis import BUDGET_HEADROOM, expense_analysis_from_stats
+from conftest import bearer
+from dashboard import build_dashboard
+
+
+def _without_dates(body):
+    return {key: value for key, value in body.items() if key != 'analysisDate'}
+
+
+def _approx(value):
+    """JSON-shaped copy with every float wrapped in pytest.approx"""
+    if hasattr(value, 'model_dump'):
+        value = value.model_dump()
+    if isinstance(value, dict):
+        return {key: _approx(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_approx(item) for item in value]
+    return pytest.approx(value) if isinstance(value, float) else value
+
+
+def test_builder():
+    result = expense_analysis_from_stats(
+        [('🍕 Food & Dining', 900.0, 3), ('Misc', 100.0, 2)], 1000.0, 4000.0, [], {'Misc': 'INCREASING'}
+    )
+    assert result.budgetRecommendations == {'🍕 Food & Dining': 300.0 * BUDGET_HEADROOM, 'Misc': 50.0 * BUDGET_HEADROOM}
+    assert [insight.trend for insight in result.insights] == ['STABLE', 'INCREASING']
+    assert result.insights[0].potentialSavings == pytest.approx(135.0)
+    assert result.savingsRate == 75.0
+    assert expense_analysis_from_stats([], 500.0, 100.0, []).savingsRate == 0
+    assert expense_analysis_from_stats([], 500.0, 0.0, []).savingsRate == 0
+
+
+@pytest.mark.parametrize('method', ['median', 'mad', 'percentile'])
+def test_sections_equal_the_analyses(transactions_df, method):
+    dashboard = build_dashboard(transactions_df, anomaly_method=method, annual_income=1800000)
+
+    # Category totals come from the monthly groups, so they match the single pass to rounding
+    assert dashboard['expenses'].model_dump() == _approx(analysis.analyze_expenses(transactions_df, method))
+    assert _without_dates(dashboard['spendingPattern']) == _approx(_without_dates(analysis.analyze_spending_pattern(transactions_df)))
+    assert dashboard['taxSavings'] == _approx(analysis.predict_tax_savings(transactions_df, 1800000))
+    assert _without_dates(dashboard['investmentPerformance']) == _approx(
+        _without_dates(analysis.analyze_investment_performance(transactions_df))
+    )
+
+
+def test_dashboard_endpoint_equals_the_endpoints(client, records):
+    headers = bearer()
+    dashboard = client.post(
+        '/dashboard', json={'annualIncome': 1800000, 'anomalyMethod': 'mad', 'transactions': records}, headers=headers
+    ).json()
+
+    expenses = client.post('/analyze/expenses', json={'anomalyMethod': 'mad', 'transactions': records}, headers=headers)
+    pattern = client.post('/analyze/spending-pattern', json=records, headers=headers)
+    tax = client.post('/predict/tax-savings', params={'annual_income': 1800000}, json=records, headers=headers)
+
+    assert dashboard['expenses'] == _approx(expenses.json())
+    assert _without_dates(dashboard['spendingPattern']) == _approx(_without_dates(pattern.json()))
+    assert _without_dates(dashboard['taxSavings']) == _approx(_without_dates(tax.json()))
+
+
+def test_aggregates_store_uses_the_same_builder(client, records):
+    headers = bearer()
+    client.post('/aggregates/user-0/transactions', json={'reset': True, 'transactions': records}, headers=headers)
+    stored = client.get('/aggregates/user-0/analyze/expenses', headers=headers).json()
+    pushed = client.post('/analyze/expenses', json={'transactions': records}, headers=headers).json()
+
+    # The store flags anomalies incrementally from sketches; everything else comes from the shared builder
+    del stored['anomalies'], pushed['anomalies']
+    assert stored == _approx(pushed)
+
+
+def test_sections_subset_and_empty(transactions_df):
+    assert set(build_dashboard(transactions_df, sections=('taxSavings',), annual_income=1)) == {'taxSavings'}
+    empty = build_dashboard(transactions_df.iloc[:0], sections=('expenses',))
+    assert empty['expenses'] == analysis.analyze_expenses(transactions_df.iloc[:0])
+    assert empty['expenses'].insights == []
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from executors import AnalysisExecutor, AnalysisTimeout, available_cores
+
+
+def test_process_pool_splits_cores_between_workers(monkeypatch):
+    monkeypatch.setattr('executors.available_cores', lambda: 8)
+    assert AnalysisExecutor().process_workers == 8
+    assert AnalysisExecutor(workers=4).process_workers == 2
+    assert AnalysisExecutor(workers=16).process_workers == 1
+    assert AnalysisExecutor(process_workers=0, workers=4).process_workers == 0
+
+
+def test_from_env_reads_worker_count(monkeypatch):
+    monkeypatch.setattr('executors.available_cores', lambda: 8)
+    monkeypatch.delenv('ML_PROCESS_WORKERS', raising=False)
+    monkeypatch.setenv('ML_WORKERS', '4')
+    assert AnalysisExecutor.from_env().process_workers == 2
+
+    monkeypatch.delenv('ML_WORKERS')
+    monkeypatch.setenv('WEB_CONCURRENCY', '8')
+    assert AnalysisExecutor.from_env().process_workers == 1
+
+
+def test_pool_routing_by_rows():
+    executor = AnalysisExecutor(process_workers=1, heavy_rows=100)
+    try:
+        assert isinstance(executor.pool_for(10), ThreadPoolExecutor)
+        assert isinstance(executor.pool_for(100), ProcessPoolExecutor)
+        assert isinstance(executor.pool_for(100, local=True), ThreadPoolExecutor)
+    finally:
+        executor.shutdown()
+    assert isinstance(AnalysisExecutor(process_workers=0, heavy_rows=1).pool_for(100), ThreadPoolExecutor)
+
+
+def test_run_is_off_the_event_loop():
+    executor = AnalysisExecutor(process_workers=0)
+
+    async def main():
+        return await executor.run(threading.get_ident), threading.get_ident()
+
+    try:
+        worker, loop = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert worker != loop
+
+
+def test_run_times_out():
+    executor = AnalysisExecutor(process_workers=0, timeout=0.05)
+    try:
+        with pytest.raises(AnalysisTimeout):
+            asyncio.run(executor.run(time.sleep, 0.5))
+    finally:
+        executor.shutdown()
+
+
+def test_available_cores_is_positive():
+    assert available_cores() >= 1
@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+from conftest import bearer
+from forecasting import expense_months, monthly_matrix, parse_dates, spending_trends
+from ingestion import BATCH_TRANSACTION_FIELDS, transactions_frame
+
+
+def _monthly(sums):
+    """Series indexed by (category, month) from {category: [(month, amount), ...]}"""
+    index = pd.MultiIndex.from_tuples([(category, month) for category, rows in sums.items() for month, _ in rows])
+    return pd.Series([amount for rows in sums.values() for _, amount in rows], index=index, dtype=float)
+
+
+def _months(start, values):
+    return [(str(month), value) for month, value in zip(pd.period_range(start, periods=len(values), freq='M'), values)]
+
+
+def test_trend_directions():
+    trends = spending_trends(_monthly({
+        'up': _months('2024-01', [100, 200, 300, 400, 500, 600]),
+        'down': _months('2024-01', [600, 500, 400, 300, 200, 100]),
+        'flat': _months('2024-01', [300, 320, 290, 310, 300, 305]),
+    }))
+    assert trends['trend'].to_dict() == {'up': 'INCREASING', 'down': 'DECREASING', 'flat': 'STABLE'}
+    assert trends.loc['up', 'slope'] == pytest.approx(100.0)
+    assert (trends['lower'] <= trends['forecast']).all() and (trends['forecast'] <= trends['upper']).all()
+
+
+def test_owner_series_are_observed_between_their_own_first_and_last_month():
+    monthly = pd.Series(
+        [1.0, 2.0, 3.0, 4.0],
+        index=pd.MultiIndex.from_tuples([('a', 'x', '2022-01'), ('a', 'x', '2022-03'), ('b', 'y', '2024-01'), ('b', 'y', '2024-02')]),
+    )
+    keys, values, observed = monthly_matrix(monthly, owner_levels=1)
+
+    assert list(keys) == [('a', 'x'), ('b', 'y')]
+    assert observed[0].sum() == 3 and observed[0, :3].all()
+    assert observed[1].sum() == 2 and observed[1, -2:].all()
+
+
+def _transactions(user, start, amounts, category='🛒 Shopping'):
+    dates = pd.date_range(start, periods=len(amounts), freq='MS').strftime('%Y-%m-%d')
+    return [
+        {'userId': user, 'id': f'{user}-{i}', 'amount': amount, 'category': category, 'type': 'EXPENSE',
+         'description': 'd', 'date': date}
+        for i, (amount, date) in enumerate(zip(amounts, dates))
+    ]
+
+
+def test_batch_matches_single_user_with_disjoint_date_ranges():
+    records = [
+        *_transactions('a', '2024-01-01', [100, 140, 180, 220, 260, 300]),
+        *_transactions('b', '2022-01-01', [500, 510, 490, 505, 495, 500]),
+        *_transactions('b', '2022-01-01', [40, 80, 120, 160, 200, 240], '🍕 Food & Dining'),
+    ]
+    batch = analysis.analyze_expenses_by_user(transactions_frame(records, fields=BATCH_TRANSACTION_FIELDS))
+
+    for user in ('a', 'b'):
+        single = analysis.analyze_expenses(transactions_frame(
+            [{k: v for k, v in record.items() if k != 'userId'} for record in records if record['userId'] == user]
+        ))
+        assert batch[user] == single
+
+    assert {insight.category: insight.trend for insight in batch['b'].insights} == {
+        '🛒 Shopping': 'STABLE', '🍕 Food & Dining': 'INCREASING'
+    }
+
+
+def test_parse_dates_mixed_offsets_and_formats():
+    dates = pd.Series([
+        '2024-01-15T10:00:00+05:30', '2024-01-16T10:00:00Z', '2024-02-01', '15/03/2024', 'Apr 5, 2024', 'garbage', None,
+    ], dtype=object)
+
+    parsed = parse_dates(dates)
+
+    assert parsed.tolist()[:5] == [
+        pd.Timestamp('2024-01-15 10:00'), pd.Timestamp('2024-01-16 10:00'), pd.Timestamp('2024-02-01'),
+        pd.Timestamp('2024-03-15'), pd.Timestamp('2024-04-05'),
+    ]
+    assert parsed.iloc[5:].isna().all()
+    assert expense_months(pd.DataFrame({'date': dates})).tolist()[:5] == [
+        np.datetime64('2024-01', 'M'), np.datetime64('2024-01', 'M'), np.datetime64('2024-02', 'M'),
+        np.datetime64('2024-03', 'M'), np.datetime64('2024-04', 'M'),
+    ]
+
+
+def test_offsets_keep_the_wall_clock_month():
+    dates = pd.Series(['2024-02-01T00:30:00+05:30', '2024-01-31T23:30:00-05:00', '2024-01-31T23:30:00.000Z'], dtype=object)
+    assert expense_months(pd.DataFrame({'date': dates})).tolist() == [
+        np.datetime64('2024-02', 'M'), np.datetime64('2024-01', 'M'), np.datetime64('2024-01', 'M'),
+    ]
+    assert parse_dates(dates).iloc[0] == pd.Timestamp('2024-02-01 00:30')
+
+
+def test_non_iso_dates_parse_in_vectorized_passes():
+    stamps = pd.date_range('2000-01-01', periods=100000, freq='h')
+    dates = pd.Series(stamps.strftime('%d/%m/%Y %H:%M'), dtype=object)
+    dates[::7] = stamps[::7].strftime('%b %d, %Y')
+
+    started = time.perf_counter()
+    parsed = parse_dates(dates)
+    elapsed = time.perf_counter() - started
+
+    assert parsed.notna().all()
+    assert parsed.iloc[1] == stamps[1] and parsed.iloc[7] == stamps[7].normalize()
+    # Parsing one value at a time takes tens of seconds here
+    assert elapsed < 5
+
+
+def test_repeated_dates_are_parsed_once(monkeypatch):
+    calls = []
+    to_datetime = pd.to_datetime
+    monkeypatch.setattr(pd, 'to_datetime', lambda values, **options: calls.append(len(values)) or to_datetime(values, **options))
+    parse_dates(pd.Series(['15/03/2024', '16/03/2024'] * 5000, dtype=object))
+    assert calls and max(calls) == 2
+
+
+MIXED_DATES = [
+    '2024-01-15T10:00:00+05:30', '2024-01-20T08:00:00Z', '2024-02-15', '2024-02-20T09:00:00.000Z',
+    '15/03/2024', '2024-03-20T10:00:00-04:00', '2024-04-15', '2024-04-18T12:00:00+05:30',
+]
+
+
+@pytest.fixture
+def mixed_date_records():
+    return [
+        {'id': f't{i}', 'amount': 100.0 * (i + 1), 'category': '🛒 Shopping', 'type': 'EXPENSE',
+         'description': 'd', 'date': date}
+        for i, date in enumerate(MIXED_DATES)
+    ]
+
+
+def test_endpoints_accept_mixed_offsets_and_formats(client, mixed_date_records):
+    headers = bearer()
+
+    expenses = client.post('/analyze/expenses', json={'transactions': mixed_date_records}, headers=headers)
+    pattern = client.post('/analyze/spending-pattern', json=mixed_date_records, headers=headers)
+    dashboard = client.post('/dashboard', json={'transactions': mixed_date_records}, headers=headers)
+
+    assert expenses.status_code == pattern.status_code == dashboard.status_code == 200
+    assert expenses.json()['insights'][0]['trend'] == 'INCREASING'
+    assert [row['month'] for row in pattern.json()['monthlySpending']] == ['2024-01', '2024-02', '2024-03', '2024-04']
+    assert sum(row['amount'] for row in pattern.json()['monthlySpending']) == 3600.0
+    assert dashboard.json()['expenses'] == expenses.json()
@@ -0,0 +1,91 @@
+import json
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from conftest import bearer
+from ingestion import BATCH_TRANSACTION_FIELDS, decode_columnar, parse_envelope, transactions_frame
+from schemas import ExpenseAnalysisParams, InvestmentSuggestionParams
+from synthetic import PROFILE, generate_transactions, to_json, to_records
+
+
+def test_columnar_decode_matches_row_path(records):
+    records = [dict(record) for record in records]
+    del records[3]['id']
+    del records[5]['isTaxDeductible']
+    records[7]['amount'] = 12
+    body = to_json(records)
+
+    envelope, frame = decode_columnar(body, envelope=False)
+
+    assert envelope == {}
+    pd.testing.assert_frame_equal(frame, transactions_frame(json.loads(body)))
+
+
+def test_columnar_decode_of_batch_envelope():
+    transactions_df = generate_transactions(2000, seed=3, users=4)
+    body = to_json({'anomalyMethod': 'mad', 'transactions': to_records(transactions_df, user_id=True)})
+
+    envelope, frame = decode_columnar(body, BATCH_TRANSACTION_FIELDS)
+
+    assert envelope == {'anomalyMethod': 'mad'}
+    expected = transactions_frame(json.loads(body)['transactions'], fields=BATCH_TRANSACTION_FIELDS)
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+@pytest.mark.parametrize('body', [
+    b'[{"amount": "12", "category": "a", "type": "EXPENSE", "description": "d", "date": "2024-01-01"}]',
+    b'[{"amount": true, "category": "a", "type": "EXPENSE", "description": "d", "date": "2024-01-01"}]',
+    b'[{"amount": 1, "type": "EXPENSE", "description": "d", "date": "2024-01-01"}]',
+    b'[1]',
+    b'{"transactions": []}',
+    b'[], "x": 1',
+    b'not json',
+])
+def test_columnar_decode_leaves_other_bodies_to_the_row_path(body):
+    assert decode_columnar(body, envelope=False) is None
+
+
+def test_envelope_with_object_lists_falls_back():
+    body = b'{"profile": {"items": [{"a": 1}, {"b": 2}]}, "transactions": []}'
+    assert decode_columnar(body) is None
+
+
+def test_envelope_params_match_row_path(records):
+    payload = {'profile': PROFILE, 'goalTargets': {'RETIREMENT': 25000000}, 'transactions': records[:50]}
+    envelope, frame = decode_columnar(to_json(payload))
+    params, expected = parse_envelope(payload, InvestmentSuggestionParams)
+
+    assert InvestmentSuggestionParams.model_validate(envelope) == params
+    pd.testing.assert_frame_equal(frame, expected)
+
+
+def test_row_path_reports_validation_errors(client, records):
+    bad = [dict(record) for record in records[:3]]
+    bad[1]['amount'] = 'lots'
+    del bad[2]['category']
+
+    response = client.post('/analyze/spending-pattern', json=bad, headers=bearer())
+
+    assert response.status_code == 422
+    assert response.json()['detail'] == [
+        {'loc': ['body', 1, 'amount'], 'msg': 'Input should be a valid number', 'type': 'float_parsing'},
+        {'loc': ['body', 2, 'category'], 'msg': 'Field required', 'type': 'missing'},
+    ]
+
+
+def test_numeric_strings_are_accepted(client, records):
+    lax = [{**record, 'amount': str(record['amount'])} for record in records[:200]]
+    strict = client.post('/analyze/spending-pattern', json=records[:200], headers=bearer()).json()
+    response = client.post('/analyze/spending-pattern', json=lax, headers=bearer())
+
+    assert response.status_code == 200
+    assert {**response.json(), 'analysisDate': None} == {**strict, 'analysisDate': None}
+
+
+def test_parse_envelope_requires_transactions():
+    with pytest.raises(HTTPException) as error:
+        parse_envelope({'anomalyMethod': 'median'}, ExpenseAnalysisParams)
+    assert error.value.status_code == 422
+    assert error.value.detail[0]['loc'] == ['body', 'transactions']
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from conftest import bearer
+from metrics import MetricsRegistry, RequestTrace, _trace, collect_stages, current_trace, stage
+
+
+def _scrape(client):
+    """{sample name with labels: value} from /metrics"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('t_seconds', 'Test latency', (0.1, 1.0), ('endpoint',))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, '/a')
+    registry.counter('t_total', 'Test count').inc(amount=2)
+
+    assert registry.render().splitlines() == [
+        '# HELP t_seconds Test latency',
+        '# TYPE t_seconds histogram',
+        't_seconds_bucket{endpoint="/a",le="0.1"} 2',
+        't_seconds_bucket{endpoint="/a",le="1"} 3',
+        't_seconds_bucket{endpoint="/a",le="+Inf"} 4',
+        't_seconds_sum{endpoint="/a"} 3.65',
+        't_seconds_count{endpoint="/a"} 4',
+        '# HELP t_total Test count',
+        '# TYPE t_total counter',
+        't_total 2',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('t_total', 'Test', ('path',)).inc('a"b\\c\nd')
+    assert 't_total{path="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_stage_outside_a_request_is_a_no_op():
+    assert current_trace() is None
+    with stage('decode'):
+        pass
+    assert current_trace() is None
+
+
+def test_stages_are_recorded_in_the_current_trace():
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    try:
+        with stage('decode'):
+            time.sleep(0.01)
+    finally:
+        _trace.reset(token)
+    assert [name for name, _ in trace.stages] == ['decode']
+    assert trace.stages[0][1] >= 0.01
+
+
+def test_worker_stages_come_back_with_the_queue_wait():
+    def work(x):
+        with stage('analysis'):
+            return x * 2
+
+    result, stages = collect_stages(work, time.time() - 0.5, 21)
+    assert result == 42
+    assert [name for name, _ in stages] == ['queue', 'analysis']
+    assert stages[0][1] == pytest.approx(0.5, abs=0.1)
+
+
+def test_requests_are_labelled_with_route_templates(client, records):
+    client.post('/analyze/expenses', json={'transactions': records[:300]}, headers=bearer())
+    client.get('/users/user-0/analyze/expenses', headers=bearer())
+
+    samples = _scrape(client)
+
+    assert samples['ml_request_duration_seconds_count{method="POST",endpoint="/analyze/expenses",status="200"}'] >= 1
+    assert any('endpoint="/users/{user_id}/analyze/expenses"' in name for name in samples)
+    assert not any('user-0' in name for name in samples)
+    for stage_name in ('decode', 'analysis', 'serialize'):
+        assert samples[f'ml_stage_duration_seconds_count{{endpoint="/analyze/expenses",stage="{stage_name}"}}'] >= 1
+    assert samples['ml_payload_rows_count{endpoint="/analyze/expenses"}'] >= 1
+    assert samples['ml_request_size_bytes_sum{endpoint="/analyze/expenses"}'] > 0
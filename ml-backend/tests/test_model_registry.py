@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import main
+from conftest import bearer
+from model_registry import (
+    CURRENT_POINTER, InvalidVersionError, ModelNotFoundError, ModelRegistry, publish_version, save_model,
+)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    save_model(str(tmp_path), 'expense_model', 'v1', {'weights': [1, 2]})
+    save_model(str(tmp_path), 'expense_model', 'v10', {'weights': [3, 4]}, make_current=False)
+    return ModelRegistry(str(tmp_path))
+
+
+def test_load_follows_current_and_publish_moves_it(registry):
+    assert registry.versions('expense_model') == ['v1', 'v10']
+    assert registry.load('expense_model').version == 'v1'
+
+    registry.publish('expense_model', 'v10')
+
+    assert registry.current_version('expense_model') == 'v10'
+    assert registry.get('expense_model') == {'weights': [3, 4]}
+
+
+@pytest.mark.parametrize('version', ['../../etc/passwd', '..', 'v1/../v10', 'v1\n', 'v1.joblib', ''])
+def test_path_like_versions_are_rejected(registry, version):
+    with pytest.raises((InvalidVersionError, ModelNotFoundError)):
+        registry.publish('expense_model', version)
+    with pytest.raises(InvalidVersionError):
+        save_model(registry.directory, 'expense_model', version, {})
+    assert registry.current_version('expense_model') == 'v1'
+
+
+def test_version_must_have_an_artifact(registry, tmp_path):
+    (tmp_path / 'outside.joblib').write_bytes(b'')
+    with pytest.raises(ModelNotFoundError):
+        registry.load('expense_model', 'v2')
+    with pytest.raises(InvalidVersionError):
+        publish_version(registry.directory, 'expense_model', '../outside')
+
+
+def test_tampered_pointer_is_reported_not_loaded(registry):
+    with open(os.path.join(registry.directory, 'expense_model', CURRENT_POINTER), 'w') as f:
+        f.write('../../outside')
+    registry.load_all()
+    assert registry.get('expense_model') is None
+    assert 'Invalid model version' in registry.status()['expense_model']['error']
+
+
+def test_reload_needs_admin_rights(client, monkeypatch):
+    monkeypatch.setattr(main.token_verifier, 'admin_token', 'ops-secret')
+
+    assert client.post('/models/expense_model/reload', headers=bearer()).status_code == 403
+    assert client.post(
+        '/models/expense_model/reload', headers={**bearer(), 'X-Admin-Token': 'wrong'}
+    ).status_code == 403
+    assert client.post('/models/expense_model/reload', headers=bearer(role='admin')).status_code == 404
+    assert client.post('/models/expense_model/reload', headers=bearer(scope='read admin')).status_code == 404
+    assert client.post(
+        '/models/expense_model/reload', headers={**bearer(), 'X-Admin-Token': 'ops-secret'}
+    ).status_code == 404
+
+
+def test_reload_rejects_path_versions(client):
+    response = client.post(
+        '/models/expense_model/reload', params={'version': '../../x'}, headers=bearer(role='admin')
+    )
+    assert response.status_code == 422
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from conftest import bearer
+from projections import (
+    ASSET_ASSUMPTIONS, CESS_RATE, _portfolio_moments, _post_tax, _simulate, bucket_weights, profile_bucket,
+    project_portfolio, simulate, simulation_cache_stats,
+)
+from schemas import InvestmentProfile
+
+PROFILE = InvestmentProfile(
+    age=34, income=1800000, riskTolerance='MEDIUM', investmentGoals=['RETIREMENT', 'EMERGENCY_FUND'],
+    timeHorizon=10, currentSavings=600000, monthlyInvestmentCapacity=30000,
+)
+
+
+def test_profile_bucket_normalizes_and_drops_unknown_instruments():
+    assert profile_bucket({'Equity': 30, 'Debt': 10, 'Crypto': 50, 'Gold': 0}) == (('Debt', 25), ('Equity', 75))
+    assert profile_bucket({'Crypto': 100}) == ()
+    assert bucket_weights((('Debt', 33), ('Equity', 66))) == pytest.approx({'Debt': 1 / 3, 'Equity': 2 / 3})
+
+
+def test_riskless_portfolio_has_a_closed_form():
+    projection = project_portfolio({'PPF': 100}, PROFILE)
+
+    monthly = 1.075 ** (1 / 12)
+    expected = 600000 * 1.075 ** 10 + 30000 * sum(monthly ** k for k in range(1, 121))
+    assert list(projection.percentiles.values()) == pytest.approx([expected] * 7)
+    # PPF is tax exempt
+    assert projection.postTaxPercentiles == projection.percentiles
+    assert projection.probabilityOfLoss == 0.0
+    assert projection.totalInvested == 600000 + 30000 * 120
+    assert projection.trajectory['year'] == list(range(1, 11))
+    assert projection.trajectory['p50'][-1] == pytest.approx(expected)
+
+
+def test_growth_factors_match_month_by_month_paths():
+    bucket = (('Equity', 60), ('Gold', 40))
+    simulation = _simulate(bucket, 24, 50, seed=3)
+
+    mean, volatility = _portfolio_moments(bucket_weights(bucket))
+    log_variance = np.log1p(volatility ** 2 / (1 + mean) ** 2)
+    mu, sigma = (np.log1p(mean) - log_variance / 2) / 12, np.sqrt(log_variance / 12)
+    returns = np.exp(mu + sigma * np.random.default_rng(3).standard_normal((50, 24)))
+
+    # One rupee of savings, and one rupee contributed at the start of every month
+    savings = np.ones(50)
+    contributed = np.zeros(50)
+    for month in range(24):
+        savings *= returns[:, month]
+        contributed = (contributed + 1) * returns[:, month]
+
+    assert simulation['growth'] == pytest.approx(savings)
+    assert simulation['contributed'] == pytest.approx(contributed)
+    assert simulation['growth_by_year'][:, -1] == pytest.approx(savings)
+
+
+def test_simulated_returns_match_the_assumptions():
+    bucket = (('Equity', 100),)
+    simulation = _simulate(bucket, 12, 20000, seed=0)
+    mean, volatility = ASSET_ASSUMPTIONS['Equity'][:2]
+
+    assert simulation['growth'].mean() == pytest.approx(1 + mean, abs=0.01)
+    assert simulation['growth'].std() == pytest.approx(volatility, abs=0.01)
+
+
+def test_slab_taxed_gains():
+    values = np.array([90.0, 150.0])
+    post_tax = _post_tax(values, 100.0, {'Debt': 1.0}, marginal_rate=0.3)
+    assert post_tax.tolist() == pytest.approx([90.0, 150.0 - 50.0 * 0.3 * (1 + CESS_RATE)])
+
+
+def test_goals_and_percentiles_are_ordered():
+    projection = project_portfolio({'Equity': 50, 'Debt': 30, 'Gold': 20}, PROFILE, {'HOUSE': 5000000})
+
+    values = list(projection.percentiles.values())
+    assert values == sorted(values)
+    assert [goal.goal for goal in projection.goals] == ['RETIREMENT', 'EMERGENCY_FUND']
+    goals = {goal.goal: goal for goal in projection.goals}
+    assert goals['RETIREMENT'].target == 10 * PROFILE.income
+    assert goals['EMERGENCY_FUND'].probability >= goals['RETIREMENT'].probability
+
+
+def test_profiles_in_one_bucket_share_a_simulation():
+    simulate.cache_clear()
+    project_portfolio({'Equity': 70, 'Debt': 30}, PROFILE)
+    project_portfolio({'Equity': 70.2, 'Debt': 29.8}, PROFILE.model_copy(update={'currentSavings': 1}))
+
+    assert simulation_cache_stats()['misses'] == 1
+    assert simulation_cache_stats()['hits'] == 1
+
+
+def test_no_projection_without_a_known_allocation_or_horizon():
+    assert project_portfolio({'Crypto': 100}, PROFILE) is None
+    assert project_portfolio({'Equity': 100}, PROFILE.model_copy(update={'timeHorizon': 0})) is None
+
+
+def test_goals_without_a_target_are_listed_without_a_probability():
+    profile = PROFILE.model_copy(update={'investmentGoals': ['RETIREMENT', 'Vacation', 'Sabbatical']})
+    projection = project_portfolio({'Equity': 100}, profile, {'Sabbatical': 2000000})
+
+    goals = {goal.goal: goal for goal in projection.goals}
+    assert list(goals) == ['RETIREMENT', 'Vacation', 'Sabbatical']
+    assert goals['Vacation'].target is None and goals['Vacation'].probability is None
+    assert goals['Sabbatical'].target == 2000000 and 0 <= goals['Sabbatical'].probability <= 1
+
+
+def test_debt_gains_are_taxed_in_the_chosen_regime():
+    # 18L: 30% marginal rate in the old regime, 20% in the new one
+    new = project_portfolio({'Debt': 100}, PROFILE)
+    old = project_portfolio({'Debt': 100}, PROFILE.model_copy(update={'taxRegime': 'OLD_REGIME'}))
+
+    assert old.percentiles == new.percentiles
+    assert old.postTaxPercentiles['p50'] < new.postTaxPercentiles['p50']
+
+
+def test_endpoint_rejects_an_unknown_regime(client, records):
+    profile = {**PROFILE.model_dump(), 'taxRegime': 'FLAT_TAX'}
+    response = client.post('/suggestions/investments', json={'profile': profile, 'transactions': records[:50]},
+                           headers=bearer())
+    assert response.status_code == 400
+
+    response = client.post('/suggestions/investments', json={
+        'profile': {**PROFILE.model_dump(), 'investmentGoals': ['Vacation']}, 'transactions': records[:50],
+    }, headers=bearer())
+    assert response.status_code == 200
+    assert response.json()['projection']['goals'] == [{'goal': 'Vacation', 'target': None, 'probability': None}]
@@ -0,0 +1,71 @@
+import json
+
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import responses
+from conftest import bearer
+from responses import ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE, encode_arrow, encode_json, negotiate
+
+CONTENT = {
+    'count': np.int64(3),
+    'mean': np.float32(1.5),
+    'values': np.arange(3),
+    'series': pd.Series([1.0, 2.0]),
+    'when': pd.Timestamp('2024-05-01 10:30'),
+    'missing': pd.NaT,
+    'nested': [{'a': np.float64(0.25)}],
+}
+
+
+@pytest.mark.parametrize('accept, media_type', [
+    (None, JSON_MEDIA_TYPE),
+    ('*/*', JSON_MEDIA_TYPE),
+    ('text/html', JSON_MEDIA_TYPE),
+    ('application/x-msgpack', 'application/x-msgpack'),
+    ('application/json;q=0.5, application/msgpack', 'application/msgpack'),
+    ('application/msgpack;q=0.2, application/vnd.apache.arrow.stream;q=0.9', ARROW_MEDIA_TYPE),
+    ('application/msgpack;q=bad', JSON_MEDIA_TYPE),
+])
+def test_negotiate(accept, media_type):
+    assert negotiate(accept) == media_type
+
+
+def test_stdlib_fallback_matches_orjson(monkeypatch):
+    fast = json.loads(encode_json(CONTENT))
+    monkeypatch.setattr(responses, 'orjson', None)
+    assert json.loads(encode_json(CONTENT)) == fast
+    assert fast['when'] == '2024-05-01T10:30:00' and fast['missing'] is None and fast['values'] == [0, 1, 2]
+
+
+def test_nested_payload_is_a_single_arrow_row():
+    table = pa.ipc.open_stream(encode_arrow(CONTENT)).read_all()
+    assert table.num_rows == 1
+    assert table.to_pylist()[0] == json.loads(encode_json(CONTENT))
+
+
+@pytest.mark.parametrize('accept', ['application/msgpack', 'application/x-msgpack'])
+def test_msgpack_response_matches_json(client, records, accept):
+    body = {'transactions': records[:500]}
+    expected = client.post('/analyze/expenses', json=body, headers=bearer())
+    packed = client.post('/analyze/expenses', json=body, headers={**bearer(), 'Accept': accept})
+
+    assert packed.headers['content-type'] == accept
+    assert 'Accept' in packed.headers['vary']
+    assert msgpack.unpackb(packed.content) == expected.json()
+
+
+def test_arrow_response_is_columnar(client):
+    body = {'incomes': [600000, 1200000, 2400000], 'regimes': ['OLD_REGIME', 'NEW_REGIME', 'NEW_REGIME']}
+    expected = client.post('/tax/calculate', json=body, headers=bearer()).json()
+    response = client.post('/tax/calculate', json=body, headers={**bearer(), 'Accept': ARROW_MEDIA_TYPE})
+
+    assert response.headers['content-type'] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    columns = {key: value for key, value in expected.items() if isinstance(value, list)}
+    assert table.to_pydict() == columns
+    scalars = {key.decode(): json.loads(value) for key, value in (table.schema.metadata or {}).items()}
+    assert scalars == {key: value for key, value in expected.items() if key not in columns}
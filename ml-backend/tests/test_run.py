@@ -0,0 +1,21 @@
+import os
+
+import run
+
+
+def test_preload_returns_warmed_app():
+    import main
+
+    assert run.preload() is main.app
+
+
+def test_production_passes_worker_count_down(monkeypatch):
+    calls = []
+    monkeypatch.delattr(os, 'fork')
+    monkeypatch.setattr(run.uvicorn, 'run', lambda app, **options: calls.append((app, options)))
+    monkeypatch.delenv('ML_WORKERS', raising=False)
+
+    run.serve_production('127.0.0.1', 0, 4, 'warning')
+
+    assert os.environ['ML_WORKERS'] == '4'
+    assert calls == [(run.APP, {'host': '127.0.0.1', 'port': 0, 'workers': 4, 'log_level': 'warning'})]
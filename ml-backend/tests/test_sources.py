@@ -0,0 +1,137 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+import main
+from conftest import bearer
+from sources import DataSourceError, PostgresSource, SQLiteSource, write_sqlite
+from synthetic import PROFILE, generate_transactions, to_records
+
+USER = 'pull-user'
+
+
+class _Pool:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def acquire(self):
+        pool = self
+
+        class _Connection:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def fetchrow(self, query, *args):
+                return pool.columns
+
+        return _Connection()
+
+
+@pytest.fixture
+def fake_asyncpg(monkeypatch):
+    """Stand-in driver module: create_pool takes a while, so concurrent first requests overlap"""
+    module = types.ModuleType('asyncpg')
+    module.PostgresError = type('PostgresError', (Exception,), {})
+    module.InterfaceError = type('InterfaceError', (Exception,), {})
+    module.calls = 0
+    module.fail = False
+
+    async def create_pool(dsn, **options):
+        module.calls += 1
+        await asyncio.sleep(0.05)
+        if module.fail:
+            raise OSError('connection refused')
+        return _Pool([['t1'], [12.5], ['Food'], ['EXPENSE'], ['lunch'], [1704067200.0], [False], [None]])
+
+    module.create_pool = create_pool
+    monkeypatch.setitem(sys.modules, 'asyncpg', module)
+    return module
+
+
+def test_concurrent_first_requests_open_one_pool(fake_asyncpg):
+    source = PostgresSource('postgresql://db/app?schema=public')
+
+    async def main_():
+        return await asyncio.gather(*[source.fetch(f'user-{i}') for i in range(20)])
+
+    frames = asyncio.run(main_())
+
+    assert fake_asyncpg.calls == 1
+    assert all(frame['date'].tolist() == ['2024-01-01T00:00:00.000'] for frame in frames)
+
+
+def test_unreachable_database_is_a_data_source_error(fake_asyncpg):
+    fake_asyncpg.fail = True
+    source = PostgresSource('postgresql://db/app')
+
+    with pytest.raises(DataSourceError):
+        asyncio.run(source.fetch('user-0'))
+    assert source.stats() == {'source': 'postgres', 'open': False}
+
+
+@pytest.fixture
+def pulled(tmp_path, monkeypatch):
+    """The app reading USER's transactions from a seeded SQLite stand-in; yields the same rows as push records"""
+    transactions_df = generate_transactions(2000, seed=9)
+    transactions_df = transactions_df.assign(userId=USER, date=transactions_df['date'] + 'T00:00:00.000')
+    path = str(tmp_path / 'transactions.db')
+    write_sqlite(path, transactions_df)
+
+    source = SQLiteSource(path)
+    asyncio.run(source.start())
+    monkeypatch.setattr(main, 'transaction_source', source)
+    yield to_records(transactions_df.sort_values(['date', 'id'], kind='stable'))
+    asyncio.run(source.close())
+
+
+def _without_dates(body):
+    return {key: value for key, value in body.items() if key != 'analysisDate'}
+
+
+@pytest.mark.parametrize('pull, push, body', [
+    ('/analyze/expenses', '/analyze/expenses', lambda records: {'transactions': records}),
+    ('/analyze/spending-pattern', '/analyze/spending-pattern', lambda records: records),
+    ('/predict/tax-savings?annual_income=1800000', '/predict/tax-savings?annual_income=1800000', lambda records: records),
+    ('/analyze/investment-performance', '/analyze/investment-performance', lambda records: records),
+])
+def test_pull_matches_push(client, pulled, pull, push, body):
+    headers = bearer(USER)
+    expected = client.post(push, json=body(pulled), headers=headers)
+    main.result_cache.clear()
+    response = client.get(f'/users/{USER}{pull}', headers=headers)
+
+    assert response.status_code == expected.status_code == 200
+    assert _without_dates(response.json()) == _without_dates(expected.json())
+
+
+def test_pulled_dashboard_matches_push(client, pulled):
+    headers = bearer(USER)
+    expected = client.post('/dashboard', json={'annualIncome': 1800000, 'transactions': pulled}, headers=headers).json()
+    main.result_cache.clear()
+    response = client.get(f'/users/{USER}/dashboard', params={'annual_income': 1800000}, headers=headers).json()
+
+    for section in ('expenses', 'spendingPattern', 'taxSavings', 'investmentPerformance'):
+        assert _without_dates(response[section]) == _without_dates(expected[section])
+
+
+def test_pulled_date_range_and_suggestions(client, pulled):
+    headers = bearer(USER)
+    in_2023 = [record for record in pulled if record['date'].startswith('2023')]
+    expected = client.post('/analyze/spending-pattern', json=in_2023, headers=headers).json()
+    main.result_cache.clear()
+    response = client.get(
+        f'/users/{USER}/analyze/spending-pattern', params={'start': '2023-01-01', 'end': '2024-01-01'}, headers=headers
+    ).json()
+    assert _without_dates(response) == _without_dates(expected)
+
+    suggestions = client.post(f'/users/{USER}/suggestions/investments', json={'profile': PROFILE}, headers=headers)
+    assert suggestions.status_code == 200
+
+
+def test_pull_mode_serves_only_the_tokens_user(client, pulled):
+    assert client.get(f'/users/{USER}/analyze/expenses', headers=bearer('someone-else')).status_code == 403
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+import analysis
+from conftest import bearer
+from ingestion import transactions_frame
+
+
+def _reference(transactions_df):
+    """Per-category loops of the original implementation (patterns and insights)"""
+    expenses = transactions_df[transactions_df['type'] == 'EXPENSE']
+    patterns = []
+    for category in expenses['category'].unique():
+        category_data = expenses[expenses['category'] == category]
+        patterns.append({
+            'category': category,
+            'averageAmount': category_data['amount'].mean(),
+            'frequency': len(category_data) / max(1, len(expenses)) * 100,
+            'totalSpent': category_data['amount'].sum(),
+        })
+
+    insights = []
+    total_spending = expenses['amount'].sum()
+    for category, amount in expenses.groupby('category', sort=False)['amount'].sum().nlargest(3).items():
+        percentage = amount / total_spending * 100
+        insights.append(('HIGH_SPENDING', category, f"{category} accounts for {percentage:.1f}% of your total expenses"))
+    for category, count in expenses['category'].value_counts(sort=True).head(5).items():
+        if count >= 3:
+            average = expenses.loc[expenses['category'] == category, 'amount'].mean()
+            insights.append(('RECURRING_EXPENSE', category, f"You spend an average of ₹{average:.0f} on {category} regularly"))
+    return patterns, insights
+
+
+def test_matches_per_category_reference(transactions_df):
+    result = analysis.analyze_spending_pattern(transactions_df)
+    patterns, insights = _reference(transactions_df)
+
+    assert [pattern['category'] for pattern in result['patterns']] == [pattern['category'] for pattern in patterns]
+    for got, expected in zip(result['patterns'], patterns):
+        for key in ('averageAmount', 'frequency', 'totalSpent'):
+            assert got[key] == pytest.approx(expected[key])
+    assert {(i['type'], i['category'], i['message']) for i in result['insights']} == set(insights)
+    assert result['totalTransactions'] == int((transactions_df['type'] == 'EXPENSE').sum())
+
+
+def test_monthly_spending_sums(transactions_df):
+    result = analysis.analyze_spending_pattern(transactions_df)
+    expenses = transactions_df[transactions_df['type'] == 'EXPENSE']
+    expected = expenses.groupby([expenses['date'].str[:7], 'category'])['amount'].sum()
+
+    got = {(row['month'], row['category']): row['amount'] for row in result['monthlySpending']}
+    assert got == pytest.approx(expected.to_dict())
+    assert [(row['month'], row['category']) for row in result['monthlySpending']] == sorted(got)
+
+
+def test_undated_rows_count_toward_their_category():
+    records = [
+        {'amount': 100.0, 'category': 'a', 'type': 'EXPENSE', 'description': 'd', 'date': '2024-01-05'},
+        {'amount': 300.0, 'category': 'a', 'type': 'EXPENSE', 'description': 'd', 'date': 'someday'},
+        {'amount': 50.0, 'category': 'b', 'type': 'EXPENSE', 'description': 'd', 'date': 'someday'},
+        {'amount': 999.0, 'category': 'salary', 'type': 'INCOME', 'description': 'd', 'date': '2024-01-01'},
+    ]
+    result = analysis.analyze_spending_pattern(transactions_frame(records))
+
+    assert {p['category']: p['totalSpent'] for p in result['patterns']} == {'a': 400.0, 'b': 50.0}
+    assert result['predictions']['b'] == 50.0
+    assert result['monthlySpending'] == [{'month': '2024-01', 'category': 'a', 'amount': 100.0}]
+
+
+def test_no_expenses():
+    income = pd.DataFrame({
+        'amount': [1.0], 'category': ['salary'], 'type': ['INCOME'], 'description': ['d'], 'date': ['2024-01-01'],
+    })
+    result = analysis.analyze_spending_pattern(income)
+    assert result['patterns'] == [] and result['monthlySpending'] == []
+
+
+def test_endpoint_matches_aggregates_store(client, records):
+    pushed = client.post('/analyze/spending-pattern', json=records, headers=bearer()).json()
+    client.post('/aggregates/user-0/transactions', json={'reset': True, 'transactions': records}, headers=bearer())
+    stored = client.get('/aggregates/user-0/analyze/spending-pattern', headers=bearer()).json()
+
+    assert [p['category'] for p in stored['patterns']] == [p['category'] for p in pushed['patterns']]
+    keys = [(row['month'], row['category']) for row in pushed['monthlySpending']]
+    assert [(row['month'], row['category']) for row in stored['monthlySpending']] == keys
+    assert [row['amount'] for row in stored['monthlySpending']] == pytest.approx(
+        [row['amount'] for row in pushed['monthlySpending']]
+    )
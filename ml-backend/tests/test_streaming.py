@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import json
+
+import pytest
+
+import ingestion
+import main
+from conftest import bearer
+from ingestion import ARROW_STREAM_CONTENT_TYPE, NDJSON_CONTENT_TYPE, iter_transaction_frames
+from streaming import StreamedTransactions
+from synthetic import generate_transactions, to_arrow, to_ndjson, to_records
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Chunks far smaller than the upload, so results span several spooled chunks"""
+    monkeypatch.setattr(main, 'iter_transaction_frames', functools.partial(iter_transaction_frames, chunk_rows=700))
+
+
+def _streamed(body, fmt):
+    content_type = NDJSON_CONTENT_TYPE if fmt == 'ndjson' else ARROW_STREAM_CONTENT_TYPE
+    return {'content': body, 'headers': {**bearer(), 'Content-Type': content_type}}
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'arrow'])
+@pytest.mark.parametrize('method', ['median', 'mad'])
+def test_stream_matches_json(client, transactions_df, records, small_chunks, fmt, method):
+    body = b''.join(to_ndjson(transactions_df, chunk_rows=500)) if fmt == 'ndjson' \
+        else to_arrow(transactions_df, batch_rows=1000)
+
+    expected = client.post('/analyze/expenses', json={'transactions': records, 'anomalyMethod': method}, headers=bearer())
+    streamed = client.post(f'/analyze/expenses?anomaly_method={method}', **_streamed(body, fmt))
+
+    assert streamed.status_code == expected.status_code == 200
+    assert streamed.json() == expected.json()
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'arrow'])
+def test_batch_stream_matches_json(client, small_chunks, fmt):
+    transactions_df = generate_transactions(3000, seed=11, users=5)
+    body = b''.join(to_ndjson(transactions_df, user_id=True)) if fmt == 'ndjson' \
+        else to_arrow(transactions_df, user_id=True, batch_rows=900)
+
+    expected = client.post(
+        '/analyze/expenses/batch', json={'transactions': to_records(transactions_df, user_id=True)}, headers=bearer()
+    )
+    streamed = client.post('/analyze/expenses/batch', **_streamed(body, fmt))
+
+    assert streamed.status_code == expected.status_code == 200
+    assert streamed.json() == expected.json()
+    assert streamed.json()['userCount'] == 5
+
+
+def test_ndjson_stream_split_mid_record(client):
+    transactions_df = generate_transactions(200, seed=2)
+    body = b''.join(to_ndjson(transactions_df))
+
+    def pieces():
+        for offset in range(0, len(body), 997):
+            yield body[offset:offset + 997]
+
+    expected = client.post('/analyze/expenses', json={'transactions': to_records(transactions_df)}, headers=bearer())
+    streamed = client.post('/analyze/expenses', **_streamed(pieces(), 'ndjson'))
+    assert streamed.json() == expected.json()
+
+
+def test_stream_validation_errors_carry_row_offsets(client, records, small_chunks):
+    bad = [dict(record) for record in records[:1500]]
+    del bad[1234]['category']
+    body = ''.join(json.dumps(record) + '\n' for record in bad).encode()
+
+    response = client.post('/analyze/expenses', **_streamed(body, 'ndjson'))
+
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'] == ['body', 1234, 'category']
+
+
+def test_invalid_arrow_stream(client):
+    response = client.post('/analyze/expenses', **_streamed(b'not arrow', 'arrow'))
+    assert response.status_code == 422
+
+
+def _on_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'arrow'])
+def test_chunks_are_decoded_and_folded_in_off_the_event_loop(client, transactions_df, small_chunks, monkeypatch, fmt):
+    calls = []
+
+    def recorded(fn):
+        def wrapper(*args, **kwargs):
+            calls.append((fn.__name__, _on_loop()))
+            return fn(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(ingestion, 'parse_transactions', recorded(ingestion.parse_transactions))
+    monkeypatch.setattr(StreamedTransactions, 'add', recorded(StreamedTransactions.add))
+    body = b''.join(to_ndjson(transactions_df)) if fmt == 'ndjson' else to_arrow(transactions_df, batch_rows=1000)
+
+    assert client.post('/analyze/expenses', **_streamed(body, fmt)).status_code == 200
+    assert {name for name, _ in calls} == {'parse_transactions', 'add'}
+    assert len(calls) > 2 * 4 and not any(on_loop for _, on_loop in calls)
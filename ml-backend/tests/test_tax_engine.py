@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from conftest import bearer
+from tax_engine import LATEST_ASSESSMENT_YEAR, compute_tax, compute_tax_batch, tax_table
+
+
+@pytest.mark.parametrize('regime, year, income, deductions, taxable, total_tax', [
+    # Old regime: 5% on 2.5-5L, 20% on 5-8L, plus 4% cess
+    ('OLD_REGIME', '2026-27', 1000000, 150000, 800000, 75400),
+    # Taxable income at the 87A limit: the rebate cancels the tax
+    ('OLD_REGIME', '2026-27', 550000, 0, 500000, 0),
+    ('OLD_REGIME', '2024-25', 2050000, 0, 2000000, 429000),
+    # New regime 2024-25: 5/10/15/20% slabs of 3L, then cess
+    ('NEW_REGIME', '2024-25', 1550000, 0, 1500000, 156000),
+    ('NEW_REGIME', '2025-26', 1075000, 0, 1000000, 52000),
+    # Deductions do not apply in the new regime
+    ('NEW_REGIME', '2025-26', 1075000, 150000, 1000000, 52000),
+    # New regime 2026-27: full rebate up to 12L taxable
+    ('NEW_REGIME', '2026-27', 1275000, 0, 1200000, 0),
+    # Marginal relief: tax above the rebate limit never exceeds the income above it
+    ('NEW_REGIME', '2026-27', 1285000, 0, 1210000, 10400),
+    ('NEW_REGIME', '2026-27', 2475000, 0, 2400000, 312000),
+])
+def test_slab_spot_values(regime, year, income, deductions, taxable, total_tax):
+    breakdown = compute_tax(income, deductions, regime, year)
+    assert float(breakdown['taxableIncome']) == taxable
+    assert float(breakdown['totalTax']) == pytest.approx(total_tax)
+    assert float(breakdown['cess']) == pytest.approx(float(breakdown['tax']) * 0.04)
+
+
+def test_vectorized_matches_scalar_calls():
+    incomes = np.linspace(0, 5000000, 101)
+    for regime in ('OLD_REGIME', 'NEW_REGIME'):
+        vectorized = compute_tax(incomes, 100000, regime)['totalTax']
+        assert vectorized.tolist() == [float(compute_tax(income, 100000, regime)['totalTax']) for income in incomes]
+
+
+def test_tax_never_decreases_with_income():
+    incomes = np.arange(0, 3000000, 1000.0)
+    for regime in ('OLD_REGIME', 'NEW_REGIME'):
+        assert (np.diff(compute_tax(incomes, 0, regime)['totalTax']) >= -1e-9).all()
+
+
+def test_batch_with_mixed_regimes():
+    batch = compute_tax_batch([1000000, 1285000], [150000, 0], ['OLD_REGIME', 'NEW_REGIME'], '2026-27')
+    assert batch['totalTax'].tolist() == pytest.approx([75400, 10400])
+
+
+def test_unknown_table():
+    with pytest.raises(ValueError):
+        tax_table('NEW_REGIME', '1999-00')
+    assert tax_table('OLD_REGIME').assessment_year == LATEST_ASSESSMENT_YEAR
+
+
+def test_calculate_endpoint(client):
+    response = client.post(
+        '/tax/calculate',
+        json={'incomes': [1000000, 1285000], 'deductions': [150000, 0], 'regimes': ['OLD_REGIME', 'NEW_REGIME'],
+              'assessmentYear': '2026-27'},
+        headers=bearer(),
+    )
+    assert response.status_code == 200
+    assert response.json()['totalTax'] == pytest.approx([75400, 10400])
+
+    mismatched = client.post('/tax/calculate', json={'incomes': [1, 2], 'deductions': [0]}, headers=bearer())
+    assert mismatched.status_code == 422
+    unknown = client.post('/tax/calculate', json={'incomes': [1], 'assessmentYear': '1999-00'}, headers=bearer())
+    assert unknown.status_code == 400
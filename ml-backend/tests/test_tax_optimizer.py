@@ -0,0 +1,73 @@
+import math
+
+import numpy as np
+import pytest
+
+from conftest import bearer
+from tax_optimizer import MAX_GRID_POINTS, GridTooLargeError, InvalidGridError, grid_axes, optimize_tax
+
+
+def test_axes_end_at_the_limit():
+    axes = grid_axes({'80C': 150000, '80D': 25000, 'HRA': 0}, {'80C': 50000, '80D': 10000})
+    assert axes['80C'].tolist() == [0, 50000, 100000, 150000]
+    assert axes['80D'].tolist() == [0, 10000, 20000, 25000]
+    assert axes['HRA'].tolist() == [0]
+
+
+@pytest.mark.parametrize('step', [0, -5000, math.nan, math.inf])
+def test_invalid_steps_are_rejected(step):
+    with pytest.raises(InvalidGridError):
+        grid_axes({'80C': 150000}, {'80C': step})
+
+
+def test_oversized_grid_is_rejected_before_allocating(monkeypatch):
+    def arange(*args, **kwargs):
+        raise AssertionError('axis allocated before the size check')
+
+    monkeypatch.setattr(np, 'arange', arange)
+    with pytest.raises(GridTooLargeError):
+        grid_axes({'80C': 150000, '80D': 25000}, {'80C': 1, '80D': 1})
+    with pytest.raises(GridTooLargeError):
+        grid_axes({'80C': 1e308}, {'80C': 1e-300})
+    with pytest.raises(InvalidGridError):
+        grid_axes({'80C': math.inf}, {'80C': 1})
+
+
+def test_grid_at_the_limit_is_allowed():
+    axes = grid_axes({'80C': MAX_GRID_POINTS - 1}, {'80C': 1})
+    assert axes['80C'].size == MAX_GRID_POINTS
+
+
+def test_optimal_allocation_reaches_the_lowest_tax():
+    result = optimize_tax(1500000, '2026-27', steps={'80C': 50000, '80D': 5000, '80CCD(1B)': 10000})
+    assert result['gridSize'] == 4 * 6 * 6
+    assert result['optimal']['totalTax'] == pytest.approx(min(min(result['oldRegimeTax']), result['newRegimeTax']))
+
+
+@pytest.mark.parametrize('steps, status', [
+    ({'80C': 0}, 422),
+    ({'80C': -1}, 422),
+    ({'80C': 'NaN'}, 422),
+    ({'80C': 1, '80D': 1}, 400),
+])
+def test_endpoint_rejects_bad_grids(client, steps, status):
+    response = client.post('/tax/optimize', json={'annualIncome': 1500000, 'steps': steps}, headers=bearer())
+    assert response.status_code == status
+
+
+@pytest.mark.parametrize('current', [{'80C': -50000}, {'80D': 'NaN'}])
+def test_endpoint_rejects_negative_current_deductions(client, current):
+    response = client.post(
+        '/tax/optimize', json={'annualIncome': 1500000, 'currentDeductions': current}, headers=bearer()
+    )
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'][:2] == ['body', 'currentDeductions']
+
+
+def test_current_deductions_are_accepted(client):
+    response = client.post(
+        '/tax/optimize', json={'annualIncome': 1500000, 'currentDeductions': {'80C': 50000}, 'includeSurface': False},
+        headers=bearer(),
+    )
+    assert response.status_code == 200
+    assert response.json()['optimal']['savings'] >= 0